@@ -0,0 +1,29 @@
+"""add ledger index for merchant customer aggregates
+
+Revision ID: 033
+Revises: 032
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "033"
+down_revision: Union[str, None] = "032"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_ledger_entries_merchant_customer_created",
+        "ledger_entries",
+        ["merchant_id", "customer_id", "created_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ledger_entries_merchant_customer_created", table_name="ledger_entries")
@@ -0,0 +1,95 @@
+"""add merchant_customer_summary read model
+
+Revision ID: 034
+Revises: 033
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "034"
+down_revision: Union[str, None] = "033"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "merchant_customer_summary",
+        sa.Column("merchant_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("merchants.id"), primary_key=True),
+        sa.Column("customer_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("lifetime_stamps", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("current_stamps", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("visits", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("redemptions", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_visit_at", sa.DateTime(), nullable=True),
+        sa.Column("programs", sa.JSON(), nullable=False, server_default="{}"),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        "ix_merchant_customer_summary_last_visit",
+        "merchant_customer_summary",
+        ["merchant_id", "last_visit_at"],
+    )
+    op.create_index(
+        "ix_merchant_customer_summary_lifetime",
+        "merchant_customer_summary",
+        ["merchant_id", "lifetime_stamps"],
+    )
+    # Backfill from the source tables, as rebuild_customer_summaries does, so
+    # customer lists and search are complete as soon as the migration runs
+    op.execute(
+        """
+        INSERT INTO merchant_customer_summary (
+            merchant_id, customer_id, lifetime_stamps, current_stamps,
+            visits, redemptions, last_visit_at, programs, updated_at
+        )
+        SELECT
+            m.merchant_id,
+            m.customer_user_id,
+            COALESCE(l.lifetime_stamps, 0),
+            m.current_stamps,
+            COALESCE(l.visits, 0),
+            COALESCE(r.redemptions, 0),
+            l.last_visit_at,
+            m.programs,
+            timezone('utc', now())
+        FROM (
+            SELECT
+                merchant_id,
+                customer_user_id,
+                SUM(COALESCE(current_balance, 0)) AS current_stamps,
+                json_object_agg(program_id::text, COALESCE(current_balance, 0)) AS programs
+            FROM customer_program_memberships
+            GROUP BY merchant_id, customer_user_id
+        ) m
+        LEFT JOIN (
+            SELECT
+                merchant_id,
+                customer_id,
+                SUM(CASE WHEN entry_type = 'EARN' THEN amount ELSE 0 END) AS lifetime_stamps,
+                SUM(CASE WHEN entry_type = 'EARN' THEN 1 ELSE 0 END) AS visits,
+                MAX(CASE WHEN entry_type = 'EARN' THEN created_at END) AS last_visit_at
+            FROM ledger_entries
+            GROUP BY merchant_id, customer_id
+        ) l ON l.merchant_id = m.merchant_id AND l.customer_id = m.customer_user_id
+        LEFT JOIN (
+            SELECT merchant_id, customer_id, COUNT(*) AS redemptions
+            FROM rewards
+            WHERE status = 'redeemed'
+            GROUP BY merchant_id, customer_id
+        ) r ON r.merchant_id = m.merchant_id AND r.customer_id = m.customer_user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_merchant_customer_summary_lifetime", table_name="merchant_customer_summary")
+    op.drop_index("ix_merchant_customer_summary_last_visit", table_name="merchant_customer_summary")
+    op.drop_table("merchant_customer_summary")
@@ -0,0 +1,65 @@
+"""add trigram indexes for merchant customer search
+
+Revision ID: 035
+Revises: 034
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "035"
+down_revision: Union[str, None] = "034"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ("name", "email", "phone")
+
+SQLITE_STATEMENTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customer_search_fts USING fts5("
+    "name, email, phone, content='users', content_rowid='rowid', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO customer_search_fts(rowid, name, email, phone) "
+    "VALUES (new.rowid, new.name, new.email, new.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO customer_search_fts(customer_search_fts, rowid, name, email, phone) "
+    "VALUES ('delete', old.rowid, old.name, old.email, old.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF name, email, phone ON users BEGIN "
+    "INSERT INTO customer_search_fts(customer_search_fts, rowid, name, email, phone) "
+    "VALUES ('delete', old.rowid, old.name, old.email, old.phone); "
+    "INSERT INTO customer_search_fts(rowid, name, email, phone) "
+    "VALUES (new.rowid, new.name, new.email, new.phone); END",
+    # Index the users that already exist
+    "INSERT INTO customer_search_fts(customer_search_fts) VALUES ('rebuild')",
+)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in SEARCH_COLUMNS:
+            op.create_index(
+                f"ix_users_{column}_trgm",
+                "users",
+                [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+            )
+    elif dialect == "sqlite":
+        for statement in SQLITE_STATEMENTS:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        for column in SEARCH_COLUMNS:
+            op.drop_index(f"ix_users_{column}_trgm", table_name="users")
+    elif dialect == "sqlite":
+        for trigger in ("users_search_ai", "users_search_ad", "users_search_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS customer_search_fts")
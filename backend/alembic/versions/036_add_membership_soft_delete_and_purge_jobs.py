@@ -0,0 +1,59 @@
+"""soft-delete memberships and track background purges
+
+Revision ID: 036
+Revises: 035
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "036"
+down_revision: Union[str, None] = "035"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("customer_program_memberships") as batch:
+        batch.add_column(sa.Column("deleted_at", sa.DateTime(), nullable=True))
+        batch.drop_constraint("uq_membership_customer_program", type_="unique")
+    # Live memberships stay unique; soft-deleted ones wait for their purge
+    op.create_index(
+        "uq_membership_customer_program",
+        "customer_program_memberships",
+        ["customer_user_id", "program_id"],
+        unique=True,
+        postgresql_where=sa.text("deleted_at IS NULL"),
+        sqlite_where=sa.text("deleted_at IS NULL"),
+    )
+
+    op.create_table(
+        "purge_jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("merchant_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("merchants.id"), nullable=False),
+        sa.Column("customer_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("requested_by", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("membership_ids", sa.JSON(), nullable=False, server_default="[]"),
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+        sa.Column("progress", sa.JSON(), nullable=False, server_default="{}"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_purge_jobs_status_created", "purge_jobs", ["status", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_purge_jobs_status_created", table_name="purge_jobs")
+    op.drop_table("purge_jobs")
+    op.drop_index("uq_membership_customer_program", table_name="customer_program_memberships")
+    with op.batch_alter_table("customer_program_memberships") as batch:
+        batch.create_unique_constraint("uq_membership_customer_program", ["customer_user_id", "program_id"])
+        batch.drop_column("deleted_at")
@@ -0,0 +1,29 @@
+"""add rewards index for the merchant rewards list and status counts
+
+Revision ID: 037
+Revises: 036
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "037"
+down_revision: Union[str, None] = "036"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_rewards_merchant_status_reached",
+        "rewards",
+        ["merchant_id", "status", "reached_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_rewards_merchant_status_reached", table_name="rewards")
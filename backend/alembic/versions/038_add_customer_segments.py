@@ -0,0 +1,36 @@
+"""add precomputed customer segments
+
+Revision ID: 038
+Revises: 037
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "038"
+down_revision: Union[str, None] = "037"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "customer_segments",
+        sa.Column("merchant_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("merchants.id"), primary_key=True),
+        sa.Column("name", sa.String(32), primary_key=True),
+        sa.Column("customer_ids", sa.JSON(), nullable=False, server_default="[]"),
+        sa.Column("member_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("stale", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+    )
+    # Populate with: python recompute_segments.py (schedule it nightly)
+
+
+def downgrade() -> None:
+    op.drop_table("customer_segments")
@@ -1,46 +1,126 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ...core.security import create_access_token, create_refresh_token
-from ...db.session import get_db
+from ...core.limiter import rate_limit
+from ...core.security import (
+    create_access_token,
+    create_refresh_token,
+    get_password_hash_async,
+    verify_and_update_password_async,
+)
+from ...db.session import get_async_db
 from ...schemas.auth import AuthRequest, Token
 from ...schemas.user import UserCreate, UserUpdate
 from ...schemas.merchant import MerchantCreate
-from ...services.auth import authenticate_user, create_user, get_user_by_email, _normalize_role, update_user  # type: ignore
-from ...services.merchant import create_merchant, get_merchants_by_owner
+from ...services.auth import create_user, get_user_by_email, _normalize_role, update_user  # type: ignore
+from ...services.last_login import last_login_buffer
+from ...services.merchant import ensure_merchant_profile
+from ...services.principal_cache import get_cached_principal
 from ...models.user import UserRole
 
-router = APIRouter()
+# Every auth route is rate limited per email and IP before any hashing or DB work
+router = APIRouter(dependencies=[Depends(rate_limit("auth"))])
 
+# Developer convenience: auto-provision / reset developer user on login attempt
+DEV_EMAIL = "ab2d222@gmail.com"
+DEV_PASSWORD = "mypassword101"
 
+
+def _access_token(db: Session, user) -> str:
+    """Access token carrying the user's id, role and merchant ids; warms the principal cache."""
+    principal = get_cached_principal(db, user.id)
+    return create_access_token(subject=user.email, claims=principal.claims())
+
+
+def _provision_developer(db: Session, password_hash: str) -> None:
+    user = get_user_by_email(db, DEV_EMAIL)
+    if not user:
+        create_user(
+            db,
+            UserCreate(
+                email=DEV_EMAIL,
+                password=DEV_PASSWORD,
+                role=UserRole.DEVELOPER,
+            ),
+            password_hash=password_hash,
+        )
+    else:
+        user.password_hash = password_hash
+        update_user(db, user, UserUpdate(role=UserRole.DEVELOPER, email=DEV_EMAIL))
+
+
+def _merchant_payload(user, auth_data: AuthRequest, **fields) -> MerchantCreate:
+    fallback_name = (user.name or auth_data.email.split("@")[0]).title()
+    return MerchantCreate(display_name=fallback_name, legal_name=fallback_name, **fields)
+
+
+def _create_account(db: Session, user_create: UserCreate, password_hash: str, auth_data: AuthRequest, merchant_fields: dict):
+    """Create the user and, for merchants, their merchant profile."""
+    user = create_user(db, user_create, password_hash=password_hash)
+    if getattr(user.role, "value", user.role) == UserRole.MERCHANT.value:
+        ensure_merchant_profile(db, user.id, _merchant_payload(user, auth_data, **merchant_fields))
+    return user
+
+
+async def _provision_merchant(bind, owner_user_id, merchant: MerchantCreate) -> None:
+    async with AsyncSession(bind=bind) as db:
+        await db.run_sync(ensure_merchant_profile, owner_user_id, merchant)
+
+
+def _finish_login(db: Session, user, new_hash: str | None = None) -> Token:
+    """
+    Everything after the password check: buffer the login timestamp and
+    issue tokens. Reads only, unless the password was just rehashed.
+    Runs inside the request's session via ``run_sync``.
+    """
+    # Hashing parameters changed since this hash was made
+    if new_hash:
+        user.password_hash = new_hash
+        db.commit()
+
+    # Written in batches by the last-login flusher
+    last_login_buffer.record(user.id)
+
+    # Create tokens
+    access_token = _access_token(db, user)
+    refresh_token = create_refresh_token(subject=user.email)
+
+    return Token(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        user={
+            "id": user.id,
+            "email": user.email,
+            "role": getattr(user.role, "value", user.role),
+            "name": user.name,
+            "avatar_url": getattr(user, "avatar_url", None),
+        }
+    )
+
+
+async def _schedule_merchant_provisioning(db: AsyncSession, user, auth_data: AuthRequest, background_tasks: BackgroundTasks) -> None:
+    # Merchant accounts made before registration provisioned a merchant get
+    # one after the response; create_merchant drops the cached principal.
+    principal = await db.run_sync(get_cached_principal, user.id)
+    if principal.role == UserRole.MERCHANT.value and principal.merchant_id is None:
+        background_tasks.add_task(_provision_merchant, db.bind, user.id, _merchant_payload(user, auth_data))
+
+
 @router.post("/login", response_model=Token)
-def login(auth_data: AuthRequest, db: Session = Depends(get_db)):
+async def login(auth_data: AuthRequest, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    """
+    Async so the password hash, which runs in the hashing process pool,
+    never holds a request thread; the ORM work runs via ``run_sync``.
+    """
     try:
-        # First check if user exists
-        user = get_user_by_email(db, auth_data.email)
         requested_role = _normalize_role(auth_data.role) if auth_data.role is not None else None
 
-        # Developer convenience: auto-provision / reset developer user on login attempt
-        DEV_EMAIL = "ab2d222@gmail.com"
-        DEV_PASSWORD = "mypassword101"
         if requested_role == UserRole.DEVELOPER and auth_data.email == DEV_EMAIL:
-            if not user:
-                user = create_user(
-                    db,
-                    UserCreate(
-                        email=DEV_EMAIL,
-                        password=DEV_PASSWORD,
-                        role=UserRole.DEVELOPER,
-                    ),
-                )
-            else:
-                user = update_user(
-                    db,
-                    user,
-                    UserUpdate(password=DEV_PASSWORD, role=UserRole.DEVELOPER, email=DEV_EMAIL),
-                )
-
-        # Validate existence after potential auto-provision
+            await db.run_sync(_provision_developer, await get_password_hash_async(DEV_PASSWORD))
+
+        # First check if user exists
+        user = await db.run_sync(get_user_by_email, auth_data.email)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,7 +128,8 @@ def login(auth_data: AuthRequest, db: Session = Depends(get_db)):
             )
 
         # User exists, now check password
-        if not authenticate_user(db, auth_data.email, auth_data.password):
+        valid, new_hash = await verify_and_update_password_async(auth_data.password, user.password_hash)
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Wrong password",
@@ -61,35 +142,8 @@ def login(auth_data: AuthRequest, db: Session = Depends(get_db)):
                 detail="This account type is not permitted in this application.",
             )
 
-        if user_role_value == UserRole.MERCHANT.value:
-            merchants = get_merchants_by_owner(db, user.id)
-            if not merchants:
-                fallback_name = (user.name or auth_data.email.split("@")[0]).title()
-                merchant_payload = MerchantCreate(
-                    display_name=fallback_name,
-                    legal_name=fallback_name,
-                )
-                create_merchant(db, merchant_payload, user.id)
-
-        # Update last login
-        from ...services.auth import update_last_login
-        update_last_login(db, user)
-
-        # Create tokens
-        access_token = create_access_token(subject=user.email)
-        refresh_token = create_refresh_token(subject=user.email)
-
-        return Token(
-            access_token=access_token,
-            refresh_token=refresh_token,
-            user={
-                "id": user.id,
-                "email": user.email,
-                "role": user_role_value,
-                "name": user.name,
-                "avatar_url": getattr(user, "avatar_url", None),
-            }
-        )
+        await _schedule_merchant_provisioning(db, user, auth_data, background_tasks)
+        return await db.run_sync(_finish_login, user, new_hash)
     except HTTPException:
         raise
     except Exception as exc:
@@ -98,14 +152,14 @@ def login(auth_data: AuthRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/register", response_model=Token)
-def register(auth_data: AuthRequest, db: Session = Depends(get_db)):
+async def register(auth_data: AuthRequest, db: AsyncSession = Depends(get_async_db)):
     if auth_data.confirm_password is not None and auth_data.password != auth_data.confirm_password:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Passwords do not match",
         )
     # Check if user already exists
-    existing_user = get_user_by_email(db, auth_data.email)
+    existing_user = await db.run_sync(get_user_by_email, auth_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -119,57 +173,32 @@ def register(auth_data: AuthRequest, db: Session = Depends(get_db)):
         password=auth_data.password,
         role=requested_role,
     )
-    user = create_user(db, user_create)
-
-    # Ensure merchant profile exists for merchant users
-    user_role_value = getattr(user.role, "value", user.role)
-    if user_role_value == UserRole.MERCHANT.value:
-        merchants = get_merchants_by_owner(db, user.id)
-        if not merchants:
-            fallback_name = (user.name or auth_data.email.split("@")[0]).title()
-            merchant_payload = MerchantCreate(
-                display_name=fallback_name,
-                legal_name=fallback_name,
-                average_spend_per_visit=auth_data.average_spend_per_visit,
-                baseline_visits_per_period=auth_data.baseline_visits_per_period,
-                reward_cost_estimate=auth_data.reward_cost_estimate,
-            )
-            create_merchant(db, merchant_payload, user.id)
-
-    # Update last login
-    from ...services.auth import update_last_login
-    update_last_login(db, user)
-
-    # Create tokens
-    access_token = create_access_token(subject=user.email)
-    refresh_token = create_refresh_token(subject=user.email)
-
-    return Token(
-        access_token=access_token,
-        refresh_token=refresh_token,
-        user={
-            "id": user.id,
-            "email": user.email,
-            "role": user_role_value,
-            "name": user.name,
-            "avatar_url": getattr(user, "avatar_url", None),
-        }
-    )
+    password_hash = await get_password_hash_async(auth_data.password)
+    # Merchant users get their merchant profile here, not on login
+    merchant_fields = {
+        "average_spend_per_visit": auth_data.average_spend_per_visit,
+        "baseline_visits_per_period": auth_data.baseline_visits_per_period,
+        "reward_cost_estimate": auth_data.reward_cost_estimate,
+    }
+    user = await db.run_sync(_create_account, user_create, password_hash, auth_data, merchant_fields)
+    return await db.run_sync(_finish_login, user)
 
 
 # Keep the old endpoint for backward compatibility (but mark as deprecated)
 @router.post("/login-or-register", response_model=Token, deprecated=True)
-def login_or_register(auth_data: AuthRequest, db: Session = Depends(get_db)):
+async def login_or_register(auth_data: AuthRequest, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     """
     Deprecated: Use /login for existing users and /register for new users.
     This endpoint will be removed in a future version.
     """
-    user = get_user_by_email(db, auth_data.email)
+    user = await db.run_sync(get_user_by_email, auth_data.email)
     requested_role = _normalize_role(auth_data.role) if auth_data.role is not None else None
+    new_hash = None
 
     if user:
         # Login
-        if not authenticate_user(db, auth_data.email, auth_data.password):
+        valid, new_hash = await verify_and_update_password_async(auth_data.password, user.password_hash)
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Incorrect password",
@@ -180,6 +209,7 @@ def login_or_register(auth_data: AuthRequest, db: Session = Depends(get_db)):
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="This account type is not permitted in this application.",
             )
+        await _schedule_merchant_provisioning(db, user, auth_data, background_tasks)
     else:
         # Register
         if auth_data.confirm_password is not None and auth_data.password != auth_data.confirm_password:
@@ -193,36 +223,7 @@ def login_or_register(auth_data: AuthRequest, db: Session = Depends(get_db)):
             password=auth_data.password,
             role=requested_role or UserRole.CUSTOMER,
         )
-        user = create_user(db, user_create)
-
-    # Ensure merchant profile exists for merchant users
-    user_role_value = getattr(user.role, "value", user.role)
-    if user_role_value == UserRole.MERCHANT.value:
-        merchants = get_merchants_by_owner(db, user.id)
-        if not merchants:
-            fallback_name = (user.name or auth_data.email.split("@")[0]).title()
-            merchant_payload = MerchantCreate(
-                display_name=fallback_name,
-                legal_name=fallback_name,
-            )
-            create_merchant(db, merchant_payload, user.id)
+        password_hash = await get_password_hash_async(auth_data.password)
+        user = await db.run_sync(_create_account, user_create, password_hash, auth_data, {})
 
-    # Update last login
-    from ...services.auth import update_last_login
-    update_last_login(db, user)
-
-    # Create tokens
-    access_token = create_access_token(subject=user.email)
-    refresh_token = create_refresh_token(subject=user.email)
-
-    return Token(
-        access_token=access_token,
-        refresh_token=refresh_token,
-        user={
-            "id": user.id,
-            "email": user.email,
-            "role": user_role_value,
-            "name": user.name,
-            "avatar_url": getattr(user, "avatar_url", None),
-        }
-    )
+    return await db.run_sync(_finish_login, user, new_hash)
@@ -1,9 +1,9 @@
 from datetime import datetime, timezone, timedelta
 import os
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query
 from sqlalchemy import and_, or_, desc
 from sqlalchemy.orm import Session, joinedload, selectinload, selectinload
 
@@ -19,10 +19,11 @@ from ...models.ledger_entry import LedgerEntry, LedgerEntryType
 from ...models.customer_program_membership import CustomerProgramMembership
 from ...models.loyalty_program import LoyaltyProgram
 from ...models.reward import Reward as RewardModel, RewardStatus
-from ...models.stamp import Stamp
 from ...models.merchant import Merchant
 from ...services.membership import get_membership_by_customer_and_program
-from ...services.reward_service import issue_stamp
+from ...services.reward_service import issue_stamp, list_customer_redemptions
+from ...services.customer_summary import record_membership, refresh_customer_summary
+from ...services.purge import purge_job_status, run_purge_job, soft_delete_memberships
 from ...api.v1.websocket import get_websocket_manager
 from ...core.timezone import to_local, format_local, now_local, now_local_iso
 
@@ -88,61 +89,23 @@ def get_my_rewards(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    rewards_query = (
-        db.query(RewardModel, CustomerProgramMembership, LoyaltyProgram, Merchant)
-        .join(CustomerProgramMembership, RewardModel.enrollment_id == CustomerProgramMembership.id)
-        .join(LoyaltyProgram, RewardModel.program_id == LoyaltyProgram.id)
-        .join(Merchant, LoyaltyProgram.merchant_id == Merchant.id)
-        .filter(CustomerProgramMembership.customer_user_id == user.id)
-        .order_by(desc(RewardModel.reached_at))
-        .limit(limit)
-    )
-
-    rewards: List[CustomerRedemption] = []
-    status_map = {
-        RewardStatus.REDEEMABLE: "claimed",
-        RewardStatus.REDEEMED: "redeemed",
-        RewardStatus.EXPIRED: "expired",
-    }
-
-    for reward, membership, program, merchant in rewards_query:
-        status = status_map.get(reward.status)
-        if not status:
-            continue
+    return list_customer_redemptions(db, user.id, limit=limit)
 
-        created_at_iso = (
-            format_local(reward.reached_at)
-            or format_local(membership.joined_at)
-            or now_local_iso()
-        )
-        expires_at_iso = format_local(reward.redeem_expires_at)
-        used_at_iso = format_local(reward.redeemed_at)
-
-        stamps_required = getattr(program, "stamps_required", 0) or 0
-        reward_description = getattr(program, "reward_description", None) or program.name or "Reward"
-        merchant_name = getattr(merchant, "display_name", None) or getattr(merchant, "legal_name", None)
-
-        rewards.append(
-            CustomerRedemption(
-                id=str(reward.id),
-                code=reward.voucher_code or "N/A",
-                status=status,
-                amount=str(stamps_required),
-                created_at=created_at_iso,
-                expires_at=expires_at_iso,
-                used_at=used_at_iso,
-                program_name=getattr(program, "name", None) or "Programme",
-                merchant_name=merchant_name or "Merchant",
-                reward_description=reward_description,
-                stamps_redeemed=stamps_required if status != "claimed" else None,
-            )
-        )
 
-    # Sort all rewards by created_at descending and limit
-    rewards.sort(key=lambda x: x.created_at, reverse=True)
-    rewards = rewards[:limit]
+@router.get("/redemptions", response_model=List[CustomerRedemption])
+def get_my_redemptions(
+    program_id: Optional[UUID] = Query(None),
+    status: Optional[str] = Query(None, pattern="^(claimed|redeemed|expired)$"),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+):
+    """All of the customer's redemptions in one request, optionally narrowed to a program or status."""
+    user = get_user_by_email(db, current_user)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
-    return rewards
+    return list_customer_redemptions(db, user.id, program_id=program_id, status=status, limit=limit)
 
 
 @router.put("/profile")
@@ -183,6 +146,7 @@ async def update_profile(
 @router.delete("/memberships/{program_id}")
 def leave_program(
     program_id: UUID,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
 ):
@@ -212,14 +176,12 @@ def leave_program(
     previous_balance = membership.current_balance or 0
     merchant_owner_id = merchant.owner_user_id if merchant else None
 
-    # Delete related records first to avoid foreign key constraint violations
-    db.query(RewardModel).filter(RewardModel.enrollment_id == membership.id).delete(synchronize_session=False)
-    db.query(Stamp).filter(Stamp.enrollment_id == membership.id).delete(synchronize_session=False)
-    db.query(LedgerEntry).filter(LedgerEntry.membership_id == membership.id).delete(synchronize_session=False)
-
-    # Delete the membership
-    db.delete(membership)
+    # Hide the membership now; its history is purged in the background
+    merchant_id = membership.merchant_id
+    job = soft_delete_memberships(db, [membership], merchant_id, user.id, requested_by=user.id)
+    refresh_customer_summary(db, merchant_id, user.id)
     db.commit()
+    background_tasks.add_task(run_purge_job, db.get_bind(), job.id)
 
     ws_manager = get_websocket_manager()
     timestamp = now_local_iso()
@@ -251,7 +213,25 @@ def leave_program(
     except Exception as exc:
         print(f"Failed to broadcast membership leave: {exc}")
 
-    return {"message": "Successfully left the program"}
+    return {"message": "Successfully left the program", "purge_job_id": str(job.id)}
+
+
+@router.get("/purge-jobs/{job_id}")
+def get_purge_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+):
+    """Progress of the background purge started by leaving a program."""
+    from ...models.purge_job import PurgeJob
+
+    user = get_user_by_email(db, current_user)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    job = db.get(PurgeJob, job_id)
+    if not job or job.customer_id != user.id:
+        raise HTTPException(status_code=404, detail="Purge job not found")
+    return purge_job_status(job)
 
 
 @router.post("/programs/{program_id}/enroll")
@@ -287,6 +267,8 @@ def enroll_in_program(
         joined_via=JoinedVia.QR
     )
     db.add(enrollment)
+    db.flush()
+    record_membership(db, enrollment)
     db.commit()
     db.refresh(enrollment)
     # Load the program with merchant
@@ -1,15 +1,18 @@
 import json
+import logging
 import os
-from typing import List
+from functools import partial
+from typing import List, Optional
 from uuid import UUID, uuid4
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status, Form, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status, Form, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import desc, func
 
-from ...db.session import get_db
-from ...api.deps import get_current_user
+from ...db.session import get_async_db, get_db
+from ...api.deps import Principal, get_current_principal, get_current_user
 from ...services.auth import get_user_by_email
 from ...services.merchant import (
     create_merchant,
@@ -32,7 +35,7 @@ from ...schemas.merchant import Merchant, MerchantCreate, MerchantUpdate
 from ...schemas.location import Location, LocationCreate, LocationUpdate
 from ...schemas.reward import RedeemCodeConfirm, StampIssueRequest, RedeemRequest
 from ...schemas.merchant_settings import MerchantSettings, MerchantSettingsCreate, MerchantSettingsUpdate
-from ...schemas.customer import CustomerDetail
+from ...schemas.customer import CustomerActivity, CustomerDetail
 from ...models.ledger_entry import LedgerEntry, LedgerEntryType
 from ...models.reward import Reward as RewardModel, RewardStatus
 from ...models.customer_program_membership import CustomerProgramMembership
@@ -48,6 +51,7 @@ from ...services.reward_service import (
 from ...services.membership import earn_stamps, adjust_balance
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 def _parse_rule(rule_data):
@@ -195,17 +199,25 @@ def read_merchants(
 
 @router.get("/customers")
 def get_merchant_customers(
+    response: Response,
+    sort: str = Query("last_visit", pattern="^(last_visit|lifetime_stamps|name)$"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    program_id: Optional[UUID] = Query(None),
+    q: Optional[str] = Query(None, max_length=100),
+    min_lifetime_stamps: Optional[int] = Query(None, ge=0),
+    last_visit_after: Optional[datetime] = Query(None),
+    last_visit_before: Optional[datetime] = Query(None),
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
 ):
+    """
+    One page of the merchant's customers. The cursor for the next page is
+    returned in the X-Next-Cursor header (absent on the last page).
+    """
     from ...services.auth import get_user_by_email
     from ...services.merchant import get_merchants_by_owner
-    from ...services.customer_stats_service import get_customer_stats
-    from ...models.customer_program_membership import CustomerProgramMembership
-    from ...models.user import User
-    from ...models.ledger_entry import LedgerEntry
-    from sqlalchemy import func
-    import json
+    from ...services.merchant_customers import list_merchant_customers
 
     user = get_user_by_email(db, current_user)
     if not user:
@@ -215,108 +227,127 @@ def get_merchant_customers(
     if not merchants:
         return []
 
-    merchant = merchants[0]
-    program_ids = [p.id for p in merchant.programs]
-    if not program_ids:
+    try:
+        customers, next_cursor = list_merchant_customers(
+            db,
+            merchants[0].id,
+            sort=sort,
+            cursor=cursor,
+            limit=limit,
+            program_id=program_id,
+            q=q,
+            min_lifetime_stamps=min_lifetime_stamps,
+            last_visit_after=last_visit_after,
+            last_visit_before=last_visit_before,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return customers
+
+
+@router.get("/customers/search")
+def search_merchant_customers(
+    background_tasks: BackgroundTasks,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+):
+    """
+    Top matches for a name, email fragment or phone number among the
+    merchant's customers. Served from a warm in-memory index; the first
+    search for a merchant falls back to the database and warms the index
+    in the background.
+    """
+    from ...services.auth import get_user_by_email
+    from ...services.customer_search import search_customers, warm_search_index
+    from ...services.merchant import get_merchants_by_owner
+
+    user = get_user_by_email(db, current_user)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    merchants = get_merchants_by_owner(db, user.id)
+    if not merchants:
         return []
 
-    memberships = (
-        db.query(CustomerProgramMembership)
-        .filter(CustomerProgramMembership.program_id.in_(program_ids))
-        .all()
+    hits, warm = search_customers(db, merchants[0].id, q, limit)
+    if warm:
+        background_tasks.add_task(warm_search_index, db.get_bind(), merchants[0].id)
+    return [hit.as_dict() for hit in hits]
+
+
+def _owned_merchant_id(principal: Principal) -> UUID:
+    if principal.merchant_id is None:
+        raise HTTPException(status_code=404, detail="Merchant not found")
+    return principal.merchant_id
+
+
+def _export_response(db: Session, rows_for, columns: tuple, name: str, export_format: str, compress: bool):
+    from fastapi.responses import StreamingResponse
+    from ...services.exports import stream_export
+
+    filename = f"{name}.{export_format}" + (".gz" if compress else "")
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(db.get_bind(), rows_for, columns, export_format, compress),
+        media_type="application/gzip" if compress else media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
-    # Group memberships by customer
-    customer_memberships = {}
-    for membership in memberships:
-        customer_id = membership.customer_user_id
-        if customer_id not in customer_memberships:
-            customer_memberships[customer_id] = []
-        customer_memberships[customer_id].append(membership)
 
-    customer_ids = list(customer_memberships.keys())
-    if not customer_ids:
-        return []
+@router.get("/customers/export")
+def export_merchant_customers(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False),
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_principal),
+):
+    """Every customer of the merchant as a streamed CSV or NDJSON download."""
+    from ...services.exports import CUSTOMER_COLUMNS, iter_customers
 
-    lifetime_stamps_rows = (
-        db.query(
-            LedgerEntry.customer_id,
-            func.coalesce(func.sum(LedgerEntry.amount), 0).label("lifetime_stamps"),
-        )
-        .filter(
-            LedgerEntry.merchant_id == merchant.id,
-            LedgerEntry.customer_id.in_(customer_ids),
-            LedgerEntry.entry_type == LedgerEntryType.EARN,
-        )
-        .group_by(LedgerEntry.customer_id)
-        .all()
+    merchant_id = _owned_merchant_id(principal)
+    return _export_response(
+        db, partial(iter_customers, merchant_id=merchant_id), CUSTOMER_COLUMNS, "customers", export_format, gzip
     )
-    lifetime_map = {
-        str(row.customer_id): float(row.lifetime_stamps or 0) for row in lifetime_stamps_rows
-    }
 
-    customers = []
-    for customer_id, mems in customer_memberships.items():
-        customer = db.query(User).filter(User.id == customer_id).first()
-        if not customer:
-            continue
-
-        # Get customer stats
-        customer_stats = get_customer_stats(db, customer_id)
-
-        total_stamps = sum(m.current_balance for m in mems)
-        lifetime_stamps = lifetime_map.get(str(customer_id), float(total_stamps))
-        avg_stamps_per_program = round(lifetime_stamps / len(mems), 2) if mems else 0
-
-        membership_ids = [m.id for m in mems]
-        last_visit = (
-            db.query(LedgerEntry.created_at)
-            .filter(LedgerEntry.membership_id.in_(membership_ids))
-            .order_by(desc(LedgerEntry.created_at))
-            .first()
-        )
 
-        programs = []
-        for membership in mems:
-            redeem_source = membership.program.redeem_rule if membership.program else {}
-            if isinstance(redeem_source, str):
-                try:
-                    redeem_rule = json.loads(redeem_source)
-                except json.JSONDecodeError:
-                    redeem_rule = {}
-            elif isinstance(redeem_source, dict):
-                redeem_rule = redeem_source
-            else:
-                redeem_rule = {}
-            threshold = redeem_rule.get("reward_threshold", 10)
-
-            programs.append({
-                "id": str(membership.program_id),
-                "name": membership.program.name,
-                "progress": membership.current_balance,
-                "threshold": threshold,
-            })
+@router.get("/ledger/export")
+def export_merchant_ledger(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False),
+    customer_id: Optional[UUID] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_principal),
+):
+    """The merchant's ledger, oldest first, as a streamed CSV or NDJSON download."""
+    from ...services.exports import LEDGER_COLUMNS, iter_ledger
 
-        customers.append(
-            {
-                "id": str(customer.id),
-                "name": customer.name or customer.email.split("@")[0],
-                "email": customer.email,
-                "avatar": customer.avatar_url,
-                "totalStamps": total_stamps,
-                "lifetime_stamps": lifetime_stamps,
-                "avg_stamps_per_program": avg_stamps_per_program,
-                "last_visit": last_visit[0].isoformat() if last_visit else None,
-                "last_visit_display": last_visit[0].strftime('%B %d, %Y - %I:%M %p') if last_visit else None,
-                "programs": programs,
-                "lifetime_total_visits": customer_stats.total_visits if customer_stats else 0,
-                "lifetime_total_revenue": customer_stats.total_revenue if customer_stats else 0.0,
-                "lifetime_rewards_redeemed": customer_stats.rewards_redeemed if customer_stats else 0,
-                "lifetime_avg_basket_size": (customer_stats.total_revenue / customer_stats.total_visits if customer_stats and customer_stats.total_visits > 0 else 0.0) if customer_stats else 0.0,
-            }
-        )
+    merchant_id = _owned_merchant_id(principal)
+    rows_for = partial(iter_ledger, merchant_id=merchant_id, customer_id=customer_id, since=since, until=until)
+    return _export_response(db, rows_for, LEDGER_COLUMNS, "ledger", export_format, gzip)
+
+
+@router.get("/rewards/export")
+def export_merchant_rewards(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False),
+    reward_status: Optional[str] = Query(None, alias="status", pattern="^(redeemable|redeemed|expired)$"),
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_principal),
+):
+    """The merchant's rewards, newest first, as a streamed CSV or NDJSON download."""
+    from ...services.exports import REWARD_COLUMNS, iter_rewards
+
+    merchant_id = _owned_merchant_id(principal)
+    rows_for = partial(iter_rewards, merchant_id=merchant_id, status=reward_status)
+    return _export_response(db, rows_for, REWARD_COLUMNS, "rewards", export_format, gzip)
 
-    return customers
 
 
 @router.get("/customers/{customer_id}", response_model=CustomerDetail)
@@ -328,6 +359,8 @@ def get_customer_detail(
     from ...services.auth import get_user_by_email
     from ...services.merchant import get_merchants_by_owner
     from ...services.customer_stats_service import get_customer_stats
+    from ...services.customer_summary import get_customer_summary
+    from ...services.merchant_customers import list_customer_ledger
     from ...models.customer_program_membership import CustomerProgramMembership
     from ...models.user import User
 
@@ -358,11 +391,11 @@ def get_customer_detail(
     if not customer:
         raise HTTPException(status_code=404, detail="Customer profile not found")
 
-    # Get customer stats
+    # Revenue is only tracked globally; everything else is per merchant
     customer_stats = get_customer_stats(db, customer_id)
+    summary = get_customer_summary(db, merchant.id, customer_id)
 
-    membership_ids = [membership.id for membership in memberships]
-    total_stamps = sum(m.current_balance for m in memberships)
+    total_stamps = summary.current_stamps
 
     programs = []
     for membership in memberships:
@@ -380,7 +413,9 @@ def get_customer_detail(
             }
         )
 
-    last_visit_at = customer_stats.last_visit_at if customer_stats else None
+    program_names = {program["id"]: program["name"] for program in programs}
+
+    last_visit_at = summary.last_visit_at
     last_visit_iso = last_visit_at.isoformat() if last_visit_at else None
     last_visit_display = format_local(last_visit_at) if last_visit_at else None
 
@@ -390,78 +425,54 @@ def get_customer_detail(
         RewardStatus.EXPIRED.value,
     ]
 
-    rewards = (
-        db.query(RewardModel, LoyaltyProgram)
-        .join(LoyaltyProgram, RewardModel.program_id == LoyaltyProgram.id)
+    # Totals over every reward, not just the recent ones listed below
+    status_counts = dict(
+        db.query(RewardModel.status, func.count(RewardModel.id))
         .filter(
             RewardModel.merchant_id == merchant.id,
             RewardModel.customer_id == customer_id,
             RewardModel.status.in_(valid_statuses),
         )
-        .order_by(desc(RewardModel.reached_at))
-        .limit(30)
+        .group_by(RewardModel.status)
         .all()
     )
+    redeemed_total = status_counts.get(RewardStatus.REDEEMED.value, 0)
+    redeemable_total = status_counts.get(RewardStatus.REDEEMABLE.value, 0)
+    expired_total = status_counts.get(RewardStatus.EXPIRED.value, 0)
 
-    redemption_history: List[dict] = []
-    seen_reward_ids: set[str] = set()
-    redeemed_total = 0
-    redeemable_total = 0
-    expired_total = 0
-
-    for reward, program in rewards:
-        reward_id = str(reward.id)
-        if reward_id in seen_reward_ids:
-            continue
-        seen_reward_ids.add(reward_id)
-        status_value = (
-            reward.status.value
-            if isinstance(reward.status, RewardStatus)
-            else str(reward.status)
-        )
-        if status_value == RewardStatus.REDEEMED.value:
-            redeemed_total += 1
-        elif status_value == RewardStatus.REDEEMABLE.value:
-            redeemable_total += 1
-        elif status_value == RewardStatus.EXPIRED.value:
-            expired_total += 1
-
-        redemption_history.append(
-            {
-                "id": reward_id,
-                "program_id": str(reward.program_id),
-                "program_name": program.name if program else "Program",
-                "status": status_value,
-                "reached_at": format_local(reward.reached_at),
-                "redeemed_at": format_local(reward.redeemed_at),
-                "voucher_code": reward.voucher_code,
-                "cycle": reward.cycle,
-            }
-        )
-
-    ledger_entries = (
-        db.query(LedgerEntry)
+    rewards = (
+        db.query(RewardModel)
         .filter(
-            LedgerEntry.merchant_id == merchant.id,
-            LedgerEntry.customer_id == customer_id,
+            RewardModel.merchant_id == merchant.id,
+            RewardModel.customer_id == customer_id,
+            RewardModel.status.in_(valid_statuses),
         )
-        .order_by(desc(LedgerEntry.created_at))
-        .limit(25)
+        .order_by(desc(RewardModel.reached_at))
+        .limit(30)
         .all()
     )
 
-    total_visits = customer_stats.total_visits if customer_stats else 0
+    redemption_history: List[dict] = [
+        {
+            "id": str(reward.id),
+            "program_id": str(reward.program_id),
+            "program_name": program_names.get(str(reward.program_id), "Program"),
+            "status": reward.status.value if isinstance(reward.status, RewardStatus) else str(reward.status),
+            "reached_at": format_local(reward.reached_at),
+            "redeemed_at": format_local(reward.redeemed_at),
+            "voucher_code": reward.voucher_code,
+            "cycle": reward.cycle,
+        }
+        for reward in rewards
+    ]
 
-    # Get lifetime stamps from ledger for insights
-    lifetime_stamps_query = (
-        db.query(func.coalesce(func.sum(LedgerEntry.amount), 0))
-        .filter(
-            LedgerEntry.merchant_id == merchant.id,
-            LedgerEntry.customer_id == customer_id,
-            LedgerEntry.entry_type == LedgerEntryType.EARN,
-        )
+    # First page of the timeline; the rest comes from /customers/{id}/ledger
+    recent_activity, recent_activity_next_cursor = list_customer_ledger(
+        db, merchant.id, customer_id, limit=25, program_names=program_names
     )
-    lifetime_stamps = lifetime_stamps_query.scalar() or 0
+
+    total_visits = summary.visits
+    lifetime_stamps = summary.lifetime_stamps
 
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
     recent_visits = (
@@ -476,34 +487,12 @@ def get_customer_detail(
         or 0
     )
 
-    recent_activity: List[dict] = []
-    for entry in ledger_entries:
-        entry_type = (
-            entry.entry_type.value
-            if hasattr(entry.entry_type, "value")
-            else str(entry.entry_type)
-        )
-        timestamp = format_local(entry.created_at)
-        related_program = next(
-            (p for p in programs if p["id"] == str(entry.program_id)), None
-        )
-        recent_activity.append(
-            {
-                "id": str(entry.id),
-                "program_id": str(entry.program_id),
-                "program_name": related_program["name"] if related_program else None,
-                "entry_type": entry_type,
-                "change": entry.amount,
-                "timestamp": timestamp,
-                "notes": entry.notes,
-            }
-        )
-
     # Lifetime metrics
-    lifetime_total_visits = customer_stats.total_visits if customer_stats else 0
+    lifetime_total_visits = summary.visits
     lifetime_total_revenue = customer_stats.total_revenue if customer_stats else 0.0
-    lifetime_rewards_redeemed = customer_stats.rewards_redeemed if customer_stats else 0
-    lifetime_avg_basket_size = lifetime_total_revenue / lifetime_total_visits if lifetime_total_visits > 0 else 0.0
+    lifetime_rewards_redeemed = summary.redemptions
+    stats_visits = customer_stats.total_visits if customer_stats else 0
+    lifetime_avg_basket_size = lifetime_total_revenue / stats_visits if stats_visits > 0 else 0.0
 
     return {
         "id": str(customer.id),
@@ -522,6 +511,7 @@ def get_customer_detail(
         "programs": programs,
         "redemption_history": redemption_history,
         "recent_activity": recent_activity,
+        "recent_activity_next_cursor": recent_activity_next_cursor,
         "reward_summary": {
             "redeemed": redeemed_total,
             "redeemable": redeemable_total,
@@ -547,6 +537,92 @@ def get_customer_detail(
     }
 
 
+@router.get("/customers/{customer_id}/ledger", response_model=List[CustomerActivity])
+def get_customer_ledger(
+    customer_id: UUID,
+    response: Response,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(25, ge=1, le=100),
+    program_id: Optional[UUID] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+):
+    """
+    A customer's ledger timeline with this merchant, newest first. The
+    cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    from ...services.auth import get_user_by_email
+    from ...services.merchant import get_merchants_by_owner
+    from ...services.merchant_customers import list_customer_ledger
+
+    user = get_user_by_email(db, current_user)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    merchants = get_merchants_by_owner(db, user.id)
+    if not merchants:
+        raise HTTPException(status_code=404, detail="Merchant not found")
+
+    try:
+        activity, next_cursor = list_customer_ledger(
+            db, merchants[0].id, customer_id, cursor=cursor, limit=limit, program_id=program_id
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return activity
+
+
+@router.get("/segments")
+def get_customer_segments(
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_principal),
+):
+    """Precomputed customer segments with their sizes, for re-engagement campaigns."""
+    from ...services.segments import SEGMENTS, get_segments
+
+    merchant_id = _owned_merchant_id(principal)
+    return [
+        {
+            "name": segment.name,
+            "description": SEGMENTS[segment.name],
+            "count": segment.member_count,
+            "computed_at": segment.computed_at.isoformat(),
+        }
+        for segment in get_segments(db, merchant_id)
+    ]
+
+
+@router.get("/segments/{name}/customers")
+def get_customer_segment_members(
+    name: str,
+    response: Response,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_principal),
+):
+    """
+    Customers in one segment. The cursor for the next page is returned in
+    the X-Next-Cursor header.
+    """
+    from ...services.segments import segment_customers
+
+    merchant_id = _owned_merchant_id(principal)
+    try:
+        customers, next_cursor = segment_customers(db, merchant_id, name, cursor=cursor, limit=limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Segment not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return customers
+
+
 @router.get("/{merchant_id}/analytics", response_model=dict)
 def get_merchant_analytics_endpoint(
     merchant_id: UUID,
@@ -592,79 +668,56 @@ def get_top_customers_endpoint(
 
 
 # Merchant rewards
-@router.get("/rewards")
-def get_merchant_rewards(db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
-    try:
-        user = get_user_by_email(db, current_user)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        merchants = get_merchants_by_owner(db, user.id)
-        if not merchants:
-            return []
-
-        merchant = merchants[0]
-
-        reward_rows = (
-            db.query(RewardModel, LoyaltyProgram, User)
-            .join(LoyaltyProgram, RewardModel.program_id == LoyaltyProgram.id)
-            .join(User, RewardModel.customer_id == User.id)
-            .filter(
-                RewardModel.merchant_id == merchant.id,
-                RewardModel.status.in_(
-                    [
-                        RewardStatus.REDEEMABLE,
-                        RewardStatus.REDEEMED,
-                        RewardStatus.EXPIRED,
-                        RewardStatus.REDEEMABLE.value,
-                        RewardStatus.REDEEMED.value,
-                        RewardStatus.EXPIRED.value,
-                    ]
-                ),
-            )
-            .order_by(desc(RewardModel.reached_at))
-            .limit(100)
-            .all()
-        )
-
-        rewards: List[dict] = []
-        now_iso = now_local_iso()
-
-        for reward, program, customer in reward_rows:
-            program_name = program.name or "Program"
-            customer_label = customer.name or customer.email.split("@")[0]
+@router.get("/rewards/counts")
+def get_merchant_reward_counts(
+    program_id: Optional[UUID] = Query(None),
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_principal),
+):
+    """Number of redeemable, redeemed and expired rewards."""
+    from ...services.merchant_rewards import merchant_reward_counts
 
-            expires_at_iso = format_local(reward.redeem_expires_at)
-            timestamp_iso = format_local(reward.reached_at) or now_iso
+    merchant_id = _owned_merchant_id(principal)
+    return merchant_reward_counts(db, merchant_id, program_id)
 
-            raw_status = reward.status or RewardStatus.INACTIVE.value
-            status_value = raw_status.value if isinstance(raw_status, RewardStatus) else str(raw_status)
 
-            if status_value == RewardStatus.REDEEMED.value:
-                if reward.redeemed_at:
-                    timestamp_iso = format_local(reward.redeemed_at) or timestamp_iso
-            elif status_value == RewardStatus.EXPIRED.value:
-                if expires_at_iso:
-                    timestamp_iso = expires_at_iso
+@router.get("/rewards")
+def get_merchant_rewards(
+    response: Response,
+    sort: str = Query("reached_at", pattern="^(reached_at|redeemed_at)$"),
+    reward_status: Optional[str] = Query(None, alias="status", pattern="^(redeemable|redeemed|expired)$"),
+    program_id: Optional[UUID] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_principal),
+):
+    """
+    One page of the merchant's rewards, newest first. The cursor for the
+    next page is returned in the X-Next-Cursor header (absent on the last
+    page).
+    """
+    from ...services.merchant_rewards import list_merchant_rewards
+
+    if principal.merchant_id is None:
+        return []
 
-            rewards.append(
-                {
-                    "id": str(reward.id),
-                    "program": program_name,
-                    "customer": customer_label,
-                    "date": timestamp_iso,
-                    "status": status_value,
-                    "amount": "1",
-                    "code": reward.voucher_code if status_value == RewardStatus.REDEEMABLE.value else None,
-                    "expires_at": expires_at_iso,
-                }
-            )
+    try:
+        rewards, next_cursor = list_merchant_rewards(
+            db,
+            principal.merchant_id,
+            sort=sort,
+            status=reward_status,
+            program_id=program_id,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
-        return rewards
-    except HTTPException:
-        raise
-    except Exception as exc:
-        print(f"Error in get_merchant_rewards: {exc}")
-        raise HTTPException(status_code=500, detail="Failed to load rewards")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rewards
 
 
 @router.get("/{merchant_id}", response_model=Merchant)
@@ -840,12 +893,7 @@ def delete_location_endpoint(
 
 
 # Redeem code verification
-@router.post("/redeem-code")
-def redeem_code(
-    payload: RedeemCodeConfirm,
-    db: Session = Depends(get_db),
-    current_user: str = Depends(get_current_user),
-):
+def _redeem_code(db: Session, payload: RedeemCodeConfirm, current_user: str, broadcasts: list):
     user = get_user_by_email(db, current_user)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -904,8 +952,9 @@ def redeem_code(
     timestamp = format_local(updated.redeemed_at) or now_local_iso()
 
     ws_manager = get_websocket_manager()
-    try:
-        ws_manager.broadcast_reward_status_sync(
+    broadcasts.extend([
+        partial(
+            ws_manager.broadcast_reward_status,
             str(updated.customer_id),
             {
                 "reward_id": str(updated.id),
@@ -913,13 +962,15 @@ def redeem_code(
                 "status": updated.status,
                 "timestamp": timestamp,
             },
-        )
-        ws_manager.broadcast_stamp_update_sync(
+        ),
+        partial(
+            ws_manager.broadcast_stamp_update,
             str(updated.customer_id),
             str(updated.program_id),
             new_balance,
-        )
-        ws_manager.broadcast_merchant_reward_update_sync(
+        ),
+        partial(
+            ws_manager.broadcast_merchant_reward_update,
             str(merchant.owner_user_id),
             {
                 "reward_id": str(updated.id),
@@ -927,8 +978,9 @@ def redeem_code(
                 "program_id": str(updated.program_id),
                 "timestamp": timestamp,
             },
-        )
-        ws_manager.broadcast_merchant_customer_update_sync(
+        ),
+        partial(
+            ws_manager.broadcast_merchant_customer_update,
             str(merchant.owner_user_id),
             {
                 "customer_id": str(updated.customer_id),
@@ -938,9 +990,8 @@ def redeem_code(
                 "new_balance": new_balance,
                 "timestamp": timestamp,
             },
-        )
-    except Exception as exc:
-        print(f"Failed to broadcast redeem code update: {exc}")
+        ),
+    ])
 
     return {
         "id": str(updated.id),
@@ -951,6 +1002,22 @@ def redeem_code(
     }
 
 
+@router.post("/redeem-code")
+async def redeem_code(
+    payload: RedeemCodeConfirm,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user),
+):
+    broadcasts: list = []
+    result = await db.run_sync(_redeem_code, payload, current_user, broadcasts)
+    try:
+        for send in broadcasts:
+            await send()
+    except Exception as exc:
+        logger.error(f"Failed to broadcast redeem code update: {exc}")
+    return result
+
+
 # Manual stamp actions
 @router.post("/customers/{customer_id}/add-stamp")
 def add_manual_stamp(
@@ -1146,14 +1213,20 @@ def revoke_manual_stamp(
 @router.delete("/customers/{customer_id}")
 def delete_customer(
     customer_id: UUID,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
 ):
+    """
+    Remove the customer from all of the merchant's programs. The memberships
+    disappear at once; their rewards, stamps and ledger entries are purged
+    in the background (poll /merchants/purge-jobs/{id} for progress).
+    """
     from ...services.auth import get_user_by_email
     from ...services.merchant import get_merchants_by_owner
     from ...models.customer_program_membership import CustomerProgramMembership
-    from ...models.redeem_code import RedeemCode
-    from ...models.ledger_entry import LedgerEntry
+    from ...services.customer_summary import refresh_customer_summary
+    from ...services.purge import run_purge_job, soft_delete_memberships
 
     # Verify merchant
     user = get_user_by_email(db, current_user)
@@ -1163,31 +1236,37 @@ def delete_customer(
     if not merchants:
         raise HTTPException(status_code=404, detail="Merchant not found")
     merchant = merchants[0]
-    program_ids = [p.id for p in merchant.programs]
 
-    # Delete all memberships for this customer in the merchant's programs
     memberships = db.query(CustomerProgramMembership).filter(
         CustomerProgramMembership.customer_user_id == customer_id,
-        CustomerProgramMembership.program_id.in_(program_ids)
+        CustomerProgramMembership.merchant_id == merchant.id,
     ).all()
 
-    # Delete related records first to avoid foreign key constraint violations
-    membership_ids = [m.id for m in memberships]
-    if membership_ids:
-        # Delete rewards for these enrollments
-        db.query(RedeemCode).filter(RedeemCode.enrollment_id.in_(membership_ids)).delete(
-            synchronize_session=False
-        )
-        # Delete ledger entries
-        db.query(LedgerEntry).filter(LedgerEntry.membership_id.in_(membership_ids)).delete(
-            synchronize_session=False
-        )
-
-    # Now delete the memberships
-    for membership in memberships:
-        db.delete(membership)
+    job = soft_delete_memberships(db, memberships, merchant.id, customer_id, requested_by=user.id)
+    refresh_customer_summary(db, merchant.id, customer_id)
     db.commit()
-    return {"message": "Customer removed from all programs"}
+    if job is None:
+        return {"message": "Customer removed from all programs", "purge_job_id": None}
+
+    background_tasks.add_task(run_purge_job, db.get_bind(), job.id)
+    return {"message": "Customer removed from all programs", "purge_job_id": str(job.id)}
+
+
+@router.get("/purge-jobs/{job_id}")
+def get_purge_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_principal),
+):
+    """Progress of a background purge started by removing a customer."""
+    from ...models.purge_job import PurgeJob
+    from ...services.purge import purge_job_status
+
+    merchant_id = _owned_merchant_id(principal)
+    job = db.get(PurgeJob, job_id)
+    if not job or job.merchant_id != merchant_id:
+        raise HTTPException(status_code=404, detail="Purge job not found")
+    return purge_job_status(job)
 
 
 # Public search
@@ -1203,19 +1282,18 @@ def search_merchants_endpoint(
 
 
 # Reward logic endpoints
-@router.post("/enrollments/{enrollment_id}/stamps")
-def issue_stamp_endpoint(
+def _issue_stamp_for_enrollment(
+    db: Session,
     enrollment_id: UUID,
     request: StampIssueRequest,
-    db: Session = Depends(get_db),
-    current_user: str = Depends(get_current_user),
+    current_user: str,
+    broadcasts: list,
 ):
     user = get_user_by_email(db, current_user)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Check if user is staff/owner of the merchant
-    from ...models import CustomerProgramMembership
     enrollment = db.query(CustomerProgramMembership).filter(CustomerProgramMembership.id == enrollment_id).first()
     if not enrollment:
         raise HTTPException(status_code=404, detail="Enrollment not found")
@@ -1226,26 +1304,49 @@ def issue_stamp_endpoint(
 
     try:
         stamp = issue_stamp(db, enrollment_id=enrollment_id, tx_id=request.tx_id, staff_id=request.issued_by_staff_id or user.id)
-        ws_manager = get_websocket_manager()
-        ws_manager.broadcast_stamp_update_sync(
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    program = db.query(LoyaltyProgram).filter(LoyaltyProgram.id == enrollment.program_id).first()
+    ws_manager = get_websocket_manager()
+    broadcasts.extend([
+        partial(
+            ws_manager.broadcast_stamp_update,
             str(enrollment.customer_user_id),
             str(enrollment.program_id),
             enrollment.current_balance,
-        )
-        ws_manager.broadcast_merchant_customer_update_sync(
+        ),
+        partial(
+            ws_manager.broadcast_merchant_customer_update,
             str(merchant.owner_user_id),
             {
                 "customer_id": str(enrollment.customer_user_id),
                 "program_id": str(enrollment.program_id),
                 "delta": 1,
                 "new_balance": enrollment.current_balance,
-                "program_name": program.name,
+                "program_name": program.name if program else "Program",
                 "timestamp": now_local_iso(),
             },
-        )
-        return {"stamp": stamp, "message": "Stamp issued"}
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        ),
+    ])
+    return {"stamp": stamp, "message": "Stamp issued"}
+
+
+@router.post("/enrollments/{enrollment_id}/stamps")
+async def issue_stamp_endpoint(
+    enrollment_id: UUID,
+    request: StampIssueRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user),
+):
+    broadcasts: list = []
+    result = await db.run_sync(_issue_stamp_for_enrollment, enrollment_id, request, current_user, broadcasts)
+    try:
+        for send in broadcasts:
+            await send()
+    except Exception as exc:
+        logger.error(f"Failed to broadcast stamp update: {exc}")
+    return result
 
 
 @router.post("/rewards/{reward_id}/redeem")
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session, joinedload
 
 from ...db.session import get_db
 from ...api.deps import get_current_user
+from ...core.limiter import rate_limit
 from ...services.loyalty_program import (
     create_loyalty_program,
     get_loyalty_program,
@@ -150,7 +151,7 @@ def read_public_programs(db: Session = Depends(get_db)):
 
 
 # Customer redeem
-@router.post("/{program_id}/redeem")
+@router.post("/{program_id}/redeem", dependencies=[Depends(rate_limit("redeem"))])
 def redeem_stamps(
     program_id: UUID,
     request: RedeemStampsRequest,
@@ -220,7 +221,7 @@ def get_redemptions_for_customer(
     try:
         from ...services.auth import get_user_by_email
         from ...services.membership import get_membership_by_customer_and_program
-        from ...models.reward import RedeemCode
+        from ...services.reward_service import list_customer_redemptions
 
         user = get_user_by_email(db, current_user)
         if not user:
@@ -230,8 +231,7 @@ def get_redemptions_for_customer(
         if not membership:
             raise HTTPException(status_code=404, detail="Membership not found")
 
-        # Temporarily return empty
-        return []
+        return list_customer_redemptions(db, user.id, program_id=program_id)
     except Exception as e:
         print(f"Error in get_redemptions_for_customer: {e}")
         import traceback
@@ -1,35 +1,35 @@
 import math
 import redis
+import redis.asyncio as aioredis
 from datetime import datetime, timedelta, timezone
+from functools import partial
 import uuid
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from jose import jws
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel as PydanticBaseModel
 from sqlalchemy import text
 
 from ...core.config import settings
-from ...core.limiter import limiter
+from ...core.limiter import rate_limit
+from ...core.metrics import StageTimer
 from ...core.security import verify_jws_token
-from ...db.session import get_db
-from ...api.deps import get_current_user
+from ...db.session import get_async_db
+from ...api.deps import Principal, get_current_principal
 from ...services.membership import get_membership_by_customer_and_program, earn_stamps
 from ...services.reward_service import issue_stamp
 from ...api.v1.websocket import get_websocket_manager
-from ...services.auth import get_user_by_email
-from ...services.loyalty_program import get_loyalty_program
-from sqlalchemy.orm import joinedload
-from ...models.ledger_entry import LedgerEntry, LedgerEntryType
-from ...models.loyalty_program import LoyaltyProgram
-from ...models.merchant import Merchant
+from ...services.program_cache import CachedProgram, get_cached_program
 from ...core.timezone import now_local_iso
 
 router = APIRouter()
 
 redis_client = redis.from_url(settings.REDIS_URL)
+async_redis_client = aioredis.from_url(settings.REDIS_URL)
 
 
 class QRToken(BaseModel):
@@ -114,14 +114,65 @@ def _claim_nonce_or_raise(db: Session, raw_nonce: str):
         raise
 
 
-@router.post("/issue-join", response_model=QRToken)
-def issue_join_qr(request: IssueJoinRequest, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
-    user = get_user_by_email(db, current_user)
-    if not user or user.role != "merchant":
+async def _check_nonce_unused(nonce: str, timer: StageTimer) -> None:
+    with timer.stage("redis_check"):
+        try:
+            seen = await async_redis_client.exists(nonce)
+        except Exception:
+            seen = False  # Skip nonce check if Redis unavailable
+    if seen:
+        raise HTTPException(status_code=400, detail="QR code has already been used. Please request a new one.")
+
+
+async def _mark_nonce_used(nonce: str, timer: StageTimer) -> None:
+    with timer.stage("redis_mark"):
+        try:
+            await async_redis_client.set(nonce, "used", ex=60)
+        except Exception:
+            pass  # Skip if Redis unavailable
+
+
+def _claim_scan_nonce(db: Session, payload: dict, timer: StageTimer) -> None:
+    with timer.stage("nonce_claim"):
+        _claim_nonce_or_raise(db, payload["nonce"])
+
+    # Check expiration
+    if datetime.now(timezone.utc).timestamp() > payload["exp"]:
+        raise HTTPException(status_code=400, detail="QR code has expired. Please request a new one from the merchant.")
+
+
+def _load_scan_program(db: Session, payload: dict, request: ScanRequest, timer: StageTimer) -> CachedProgram:
+    program_id_str = payload.get("program_id") or payload.get("location_id")
+    if not program_id_str:
+        raise HTTPException(status_code=400, detail="Invalid token")
+    with timer.stage("program_load"):
+        program = get_cached_program(db, UUID(program_id_str))
+    if not program:
+        raise HTTPException(status_code=404, detail="Program not found")
+
+    # Check geofence
+    if request.lat is not None and request.lng is not None:
+        with timer.stage("geofence"):
+            # Get merchant's first location
+            location = program.merchant.locations[0] if program.merchant.locations else None
+            within_range = not location or check_geofence(request.lat, request.lng, location.lat, location.lng)
+        if not within_range:
+            raise HTTPException(status_code=400, detail="You are not near the merchant location. Please move closer to scan.")
+    return program
+
+
+def _require_program_owner(db: Session, principal: Principal, program_id: UUID) -> CachedProgram:
+    if principal.role != "merchant":
         raise HTTPException(status_code=403, detail="Not authorized")
-    program = get_loyalty_program(db, request.program_id)
-    if not program or program.merchant.owner_user_id != user.id:
+    program = get_cached_program(db, program_id)
+    if not program or program.merchant.owner_user_id != principal.user_id:
         raise HTTPException(status_code=404, detail="Program not found")
+    return program
+
+
+@router.post("/issue-join", response_model=QRToken)
+async def issue_join_qr(request: IssueJoinRequest, db: AsyncSession = Depends(get_async_db), principal: Principal = Depends(get_current_principal)):
+    await db.run_sync(_require_program_owner, principal, request.program_id)
 
     payload = {
         "type": "join",
@@ -134,13 +185,8 @@ def issue_join_qr(request: IssueJoinRequest, db: Session = Depends(get_db), curr
 
 
 @router.post("/issue-stamp", response_model=QRToken)
-def issue_stamp_qr(request: IssueStampRequest, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
-    user = get_user_by_email(db, current_user)
-    if not user or user.role != "merchant":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    program = get_loyalty_program(db, request.program_id)
-    if not program or program.merchant.owner_user_id != user.id:
-        raise HTTPException(status_code=404, detail="Program not found")
+async def issue_stamp_qr(request: IssueStampRequest, db: AsyncSession = Depends(get_async_db), principal: Principal = Depends(get_current_principal)):
+    await db.run_sync(_require_program_owner, principal, request.program_id)
 
     payload = {
         "type": "stamp",
@@ -153,212 +199,100 @@ def issue_stamp_qr(request: IssueStampRequest, db: Session = Depends(get_db), cu
     return QRToken(token=token)
 
 
-def _scan_join_logic(request: ScanRequest, db: Session, user):
-    payload = verify_jws_token(request.token)
-    if payload.get("type") != "join":
-        raise HTTPException(status_code=400, detail="Invalid token type")
-
-    nonce = payload["nonce"]
-
-    _claim_nonce_or_raise(db, nonce)
-
-    try:
-        if redis_client.exists(nonce):
-            raise HTTPException(status_code=400, detail="QR code has already been used. Please request a new one.")
-    except Exception:
-        pass  # Skip nonce check if Redis unavailable
+@router.post("/issue-redeem", response_model=QRToken)
+async def issue_redeem_qr(request: IssueRedeemRequest, db: AsyncSession = Depends(get_async_db), principal: Principal = Depends(get_current_principal)):
+    await db.run_sync(_require_program_owner, principal, request.program_id)
 
-    # Check expiration
-    if datetime.now(timezone.utc).timestamp() > payload["exp"]:
-        raise HTTPException(status_code=400, detail="QR code has expired. Please request a new one from the merchant.")
+    payload = {
+        "type": "redeem",
+        "program_id": str(request.program_id),
+        "amount": request.amount,
+        "exp": (datetime.now(timezone.utc) + timedelta(seconds=60)).timestamp(),
+        "nonce": str(uuid.uuid4()),
+    }
+    token = jws.sign(payload, settings.SIGNING_KEY, algorithm="HS256")
+    return QRToken(token=token)
 
-    program_id_str = payload.get("program_id") or payload.get("location_id")
-    if not program_id_str:
-        raise HTTPException(status_code=400, detail="Invalid token")
-    program_id = UUID(program_id_str)
-    program = db.query(LoyaltyProgram).options(joinedload(LoyaltyProgram.merchant).joinedload(Merchant.locations)).filter(LoyaltyProgram.id == program_id).first()
-    if not program:
-        raise HTTPException(status_code=404, detail="Program not found")
 
-    # Check geofence
-    if request.lat is not None and request.lng is not None:
-        # Get merchant's first location
-        location = program.merchant.locations[0] if program.merchant.locations else None
-        if location:
-            if not check_geofence(request.lat, request.lng, location.lat, location.lng):
-                raise HTTPException(status_code=400, detail="You are not near the merchant location. Please move closer to scan.")
+def _scan_join_logic(db: Session, request: ScanRequest, principal: Principal, payload: dict, timer: StageTimer, broadcasts: list):
+    _claim_scan_nonce(db, payload, timer)
+    program = _load_scan_program(db, payload, request, timer)
+    program_id = program.id
 
     # Create membership if not exists
-    membership = get_membership_by_customer_and_program(db, user.id, program_id)
+    with timer.stage("membership_lookup"):
+        membership = get_membership_by_customer_and_program(db, principal.user_id, program_id)
     if not membership:
         from ...services.membership import create_membership
         from ...schemas.customer_program_membership import CustomerProgramMembershipCreate
-        membership = create_membership(db, CustomerProgramMembershipCreate(
-            customer_user_id=user.id,
-            program_id=program_id,
-            merchant_id=program.merchant_id,
-        ))
-
-    # Mark nonce as used
-    try:
-        redis_client.setex(nonce, 60, "used")
-    except Exception:
-        pass  # Skip if Redis unavailable
+        with timer.stage("membership_create"):
+            membership = create_membership(db, CustomerProgramMembershipCreate(
+                customer_user_id=principal.user_id,
+                program_id=program_id,
+                merchant_id=program.merchant_id,
+            ))
 
     return {"message": "Joined program", "membership_id": membership.id}
 
 
-@router.post("/scan-join")
-def scan_join(request: ScanRequest, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
-    user = get_user_by_email(db, current_user)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return _scan_join_logic(request, db, user)
-
-
-def _scan_stamp_logic(request: ScanRequest, db: Session, user):
-    payload = verify_jws_token(request.token)
-    if payload.get("type") != "stamp":
-        raise HTTPException(status_code=400, detail="Invalid token type")
-
+def _scan_stamp_logic(db: Session, request: ScanRequest, principal: Principal, payload: dict, timer: StageTimer, broadcasts: list):
+    _claim_scan_nonce(db, payload, timer)
     nonce = payload["nonce"]
+    program = _load_scan_program(db, payload, request, timer)
+    program_id = program.id
 
-    _claim_nonce_or_raise(db, nonce)
-
-    try:
-        if redis_client.exists(nonce):
-            raise HTTPException(status_code=400, detail="QR code has already been used. Please request a new one.")
-    except Exception:
-        pass  # Skip nonce check if Redis unavailable
-
-    if datetime.now(timezone.utc).timestamp() > payload["exp"]:
-        raise HTTPException(status_code=400, detail="QR code has expired. Please request a new one from the merchant.")
-
-    program_id_str = payload.get("program_id") or payload.get("location_id")
-    if not program_id_str:
-        raise HTTPException(status_code=400, detail="Invalid token")
-    program_id = UUID(program_id_str)
-    program = db.query(LoyaltyProgram).options(joinedload(LoyaltyProgram.merchant).joinedload(Merchant.locations)).filter(LoyaltyProgram.id == program_id).first()
-    if not program:
-        raise HTTPException(status_code=404, detail="Program not found")
-
-    # Check geofence
-    if request.lat is not None and request.lng is not None:
-        # Get merchant's first location
-        location = program.merchant.locations[0] if program.merchant.locations else None
-        if location:
-            if not check_geofence(request.lat, request.lng, location.lat, location.lng):
-                raise HTTPException(status_code=400, detail="You are not near the merchant location. Please move closer to scan.")
-
-    membership = get_membership_by_customer_and_program(db, user.id, program_id)
+    with timer.stage("membership_lookup"):
+        membership = get_membership_by_customer_and_program(db, principal.user_id, program_id)
     if not membership:
         raise HTTPException(status_code=400, detail="You are not a member of this program. Please join first.")
 
     updated_membership = membership
     if program.logic_type == "punch_card":
-        try:
-            issue_stamp(db, enrollment_id=membership.id, tx_id=f"scan_{nonce}", staff_id=None)
-            db.refresh(membership)
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail=str(exc))
+        with timer.stage("issue_stamp"):
+            try:
+                issue_stamp(db, enrollment_id=membership.id, tx_id=f"scan_{nonce}", staff_id=None)
+                db.refresh(membership)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc))
     else:
-        updated_membership = earn_stamps(
-            db,
-            membership.id,
-            1,
-            tx_id=f"scan_{nonce}",
-            device_fingerprint=request.device_fingerprint,
-        )
+        with timer.stage("earn_stamps"):
+            updated_membership = earn_stamps(
+                db,
+                membership.id,
+                1,
+                tx_id=f"scan_{nonce}",
+                device_fingerprint=request.device_fingerprint,
+            )
 
     if updated_membership:
         ws_manager = get_websocket_manager()
-        ws_manager.broadcast_stamp_update_sync(str(user.id), str(updated_membership.program_id), updated_membership.current_balance)
+        broadcasts.append(partial(ws_manager.broadcast_stamp_update, str(principal.user_id), str(updated_membership.program_id), updated_membership.current_balance))
         owner_id = getattr(program.merchant, "owner_user_id", None) if program.merchant else None
         if owner_id:
-            ws_manager.broadcast_merchant_customer_update_sync(
+            broadcasts.append(partial(
+                ws_manager.broadcast_merchant_customer_update,
                 str(owner_id),
                 {
-                    "customer_id": str(user.id),
+                    "customer_id": str(principal.user_id),
                     "program_id": str(program.id),
                     "delta": 1,
                     "new_balance": updated_membership.current_balance,
                     "program_name": program.name,
                     "timestamp": now_local_iso(),
                 },
-            )
-
-    # Mark nonce as used
-    try:
-        redis_client.setex(nonce, 60, "used")
-    except Exception:
-        pass  # Skip if Redis unavailable
+            ))
 
     return {"message": "Stamp earned from scan! Congratulations!", "new_balance": updated_membership.current_balance if updated_membership else membership.current_balance + 1}
 
 
-@router.post("/scan-stamp")
-def scan_stamp(request: ScanRequest, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
-    user = get_user_by_email(db, current_user)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return _scan_stamp_logic(request, db, user)
-
-
-@router.post("/issue-redeem", response_model=QRToken)
-def issue_redeem_qr(request: IssueRedeemRequest, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
-    user = get_user_by_email(db, current_user)
-    if not user or user.role != "merchant":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    program = get_loyalty_program(db, request.program_id)
-    if not program or program.merchant.owner_user_id != user.id:
-        raise HTTPException(status_code=404, detail="Program not found")
-
-    payload = {
-        "type": "redeem",
-        "program_id": str(request.program_id),
-        "amount": request.amount,
-        "exp": (datetime.now(timezone.utc) + timedelta(seconds=60)).timestamp(),
-        "nonce": str(uuid.uuid4()),
-    }
-    token = jws.sign(payload, settings.SIGNING_KEY, algorithm="HS256")
-    return QRToken(token=token)
-
-
-def _scan_redeem_logic(request: ScanRequest, db: Session, user):
-    payload = verify_jws_token(request.token)
-    if payload.get("type") != "redeem":
-        raise HTTPException(status_code=400, detail="Invalid token type")
-
+def _scan_redeem_logic(db: Session, request: ScanRequest, principal: Principal, payload: dict, timer: StageTimer, broadcasts: list):
+    _claim_scan_nonce(db, payload, timer)
     nonce = payload["nonce"]
+    program = _load_scan_program(db, payload, request, timer)
+    program_id = program.id
 
-    _claim_nonce_or_raise(db, nonce)
-
-    try:
-        if redis_client.exists(nonce):
-            raise HTTPException(status_code=400, detail="QR code has already been used. Please request a new one.")
-    except Exception:
-        pass  # Skip nonce check if Redis unavailable
-
-    if datetime.now(timezone.utc).timestamp() > payload["exp"]:
-        raise HTTPException(status_code=400, detail="QR code has expired. Please request a new one from the merchant.")
-
-    program_id_str = payload.get("program_id") or payload.get("location_id")
-    if not program_id_str:
-        raise HTTPException(status_code=400, detail="Invalid token")
-    program_id = UUID(program_id_str)
-    program = db.query(LoyaltyProgram).options(joinedload(LoyaltyProgram.merchant).joinedload(Merchant.locations)).filter(LoyaltyProgram.id == program_id).first()
-    if not program:
-        raise HTTPException(status_code=404, detail="Program not found")
-
-    # Check geofence
-    if request.lat is not None and request.lng is not None:
-        # Get merchant's first location
-        location = program.merchant.locations[0] if program.merchant.locations else None
-        if location:
-            if not check_geofence(request.lat, request.lng, location.lat, location.lng):
-                raise HTTPException(status_code=400, detail="You are not near the merchant location. Please move closer to scan.")
-
-    membership = get_membership_by_customer_and_program(db, user.id, program_id)
+    with timer.stage("membership_lookup"):
+        membership = get_membership_by_customer_and_program(db, principal.user_id, program_id)
     if not membership:
         raise HTTPException(status_code=400, detail="You are not a member of this program. Please join first.")
 
@@ -368,45 +302,82 @@ def _scan_redeem_logic(request: ScanRequest, db: Session, user):
 
     # Redeem stamps
     from ...services.membership import redeem_stamps
-    updated_membership = redeem_stamps(db, membership.id, amount, tx_id=nonce, device_fingerprint=request.device_fingerprint)
+    with timer.stage("redeem_stamps"):
+        updated_membership = redeem_stamps(db, membership.id, amount, tx_id=nonce, device_fingerprint=request.device_fingerprint)
     if not updated_membership:
         raise HTTPException(status_code=400, detail="Redeem failed")
 
-    # Mark nonce as used
+    return {"message": "Stamps redeemed", "new_balance": updated_membership.current_balance}
+
+
+_SCAN_LOGIC = {
+    "join": _scan_join_logic,
+    "stamp": _scan_stamp_logic,
+    "redeem": _scan_redeem_logic,
+}
+
+
+async def _run_scan(
+    request: ScanRequest,
+    response: Response,
+    db: AsyncSession,
+    principal: Principal,
+    token_type: str | None = None,
+) -> dict:
+    """
+    Run one scan end to end. Token verification and Redis checks happen on
+    the event loop, the ORM work runs inside the async session via
+    run_sync, and WebSocket broadcasts are awaited once the DB work is done.
+    """
+    timer = StageTimer()
     try:
-        redis_client.setex(nonce, 60, "used")
-    except Exception:
-        pass  # Skip if Redis unavailable
+        with timer.stage("token_verify"):
+            payload = verify_jws_token(request.token)
+
+        if token_type is None:
+            token_type = payload.get("type")
+            if token_type not in _SCAN_LOGIC:
+                raise HTTPException(status_code=400, detail="Unknown token type")
+        elif payload.get("type") != token_type:
+            raise HTTPException(status_code=400, detail="Invalid token type")
+
+        nonce = payload["nonce"]
+        await _check_nonce_unused(nonce, timer)
+
+        broadcasts: list = []
+        result = await db.run_sync(_SCAN_LOGIC[token_type], request, principal, payload, timer, broadcasts)
+
+        if broadcasts:
+            with timer.stage("broadcast"):
+                for send in broadcasts:
+                    await send()
+
+        await _mark_nonce_used(nonce, timer)
+        return result
+    except HTTPException as exc:
+        # Error responses are built from the exception, not from ``response``
+        exc.headers = {**(exc.headers or {}), "Server-Timing": timer.server_timing()}
+        raise
+    finally:
+        response.headers["Server-Timing"] = timer.server_timing()
 
-    return {"message": "Stamps redeemed", "new_balance": updated_membership.current_balance}
 
+@router.post("/scan-join", dependencies=[Depends(rate_limit("scan"))])
+async def scan_join(request: ScanRequest, response: Response, db: AsyncSession = Depends(get_async_db), principal: Principal = Depends(get_current_principal)):
+    return await _run_scan(request, response, db, principal, "join")
 
-@router.post("/scan-redeem")
-def scan_redeem(request: ScanRequest, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
-    user = get_user_by_email(db, current_user)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return _scan_redeem_logic(request, db, user)
 
+@router.post("/scan-stamp", dependencies=[Depends(rate_limit("scan"))])
+async def scan_stamp(request: ScanRequest, response: Response, db: AsyncSession = Depends(get_async_db), principal: Principal = Depends(get_current_principal)):
+    return await _run_scan(request, response, db, principal, "stamp")
 
-@router.post("/scan")
-def scan_qr(request: ScanRequest, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
-    """Universal scan endpoint that determines the action based on token type"""
-    user = get_user_by_email(db, current_user)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
 
-    try:
-        payload = verify_jws_token(request.token)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid token")
+@router.post("/scan-redeem", dependencies=[Depends(rate_limit("scan"))])
+async def scan_redeem(request: ScanRequest, response: Response, db: AsyncSession = Depends(get_async_db), principal: Principal = Depends(get_current_principal)):
+    return await _run_scan(request, response, db, principal, "redeem")
 
-    token_type = payload.get("type")
-    if token_type == "join":
-        return _scan_join_logic(request, db, user)
-    elif token_type == "stamp":
-        return _scan_stamp_logic(request, db, user)
-    elif token_type == "redeem":
-        return _scan_redeem_logic(request, db, user)
-    else:
-        raise HTTPException(status_code=400, detail="Unknown token type")
+
+@router.post("/scan", dependencies=[Depends(rate_limit("scan"))])
+async def scan_qr(request: ScanRequest, response: Response, db: AsyncSession = Depends(get_async_db), principal: Principal = Depends(get_current_principal)):
+    """Universal scan endpoint that determines the action based on token type"""
+    return await _run_scan(request, response, db, principal)
@@ -4,15 +4,15 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 
 from ...api.deps import get_current_user
 from ...core.security import verify_jws_token
-from ...db.session import get_db
+from ...db.session import get_async_db, get_db
 from ...models import (
     CustomerProgramMembership,
     LoyaltyProgram,
-    Merchant,
     Reward,
     RewardStatus,
     UserRole,
@@ -29,6 +29,7 @@ from ...services.membership import (
     get_membership_by_customer_and_program,
 )
 from ...services.merchant import get_merchants_by_owner
+from ...services.program_cache import get_cached_program
 from ...services.reward_service import (
     ensure_reward_for_cycle,
     expire_reward as expire_reward_service,
@@ -38,7 +39,7 @@ from ...services.reward_service import (
     redeem_reward as redeem_reward_service,
 )
 from ...core.timezone import to_local, now_local, format_local, now_local_iso
-from ..v1.qr import _claim_nonce_or_raise, check_geofence, redis_client
+from ..v1.qr import _claim_nonce_or_raise, async_redis_client, check_geofence
 from ..v1.websocket import get_websocket_manager
 
 router = APIRouter()
@@ -63,18 +64,17 @@ def _require_user(db: Session, current_user: str):
     return user
 
 
-@router.post("/programs/{program_id}/enroll")
-def enroll_in_program(
+def _enroll_in_program(
+    db: Session,
     program_id: uuid.UUID,
     request: EnrollmentRequest,
-    db: Session = Depends(get_db),
-    current_user: str = Depends(get_current_user),
+    current_user: str,
+    payload: dict,
 ):
     user = _require_user(db, current_user)
     if user.role != UserRole.CUSTOMER:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only customers can enroll")
 
-    payload = verify_jws_token(request.qr_token)
     if payload.get("type") != "join":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid QR token type")
     if payload.get("program_id") != str(program_id):
@@ -86,17 +86,8 @@ def enroll_in_program(
     nonce = payload.get("nonce")
     if nonce:
         _claim_nonce_or_raise(db, nonce)
-        try:
-            redis_client.setex(nonce, 60, "used")
-        except Exception:
-            pass
 
-    program: LoyaltyProgram | None = (
-        db.query(LoyaltyProgram)
-        .options(joinedload(LoyaltyProgram.merchant).joinedload(Merchant.locations))
-        .filter(LoyaltyProgram.id == program_id, LoyaltyProgram.is_active.is_(True))
-        .first()
-    )
+    program = get_cached_program(db, program_id, active_only=True)
     if not program:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Program not found")
 
@@ -126,12 +117,30 @@ def enroll_in_program(
     }
 
 
-@router.post("/enrollments/{enrollment_id}/stamps")
-def issue_stamp(
+@router.post("/programs/{program_id}/enroll")
+async def enroll_in_program(
+    program_id: uuid.UUID,
+    request: EnrollmentRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user),
+):
+    payload = verify_jws_token(request.qr_token)
+    result = await db.run_sync(_enroll_in_program, program_id, request, current_user, payload)
+
+    nonce = payload.get("nonce")
+    if nonce:
+        try:
+            await async_redis_client.set(nonce, "used", ex=60)
+        except Exception:
+            pass
+    return result
+
+
+def _issue_stamp(
+    db: Session,
     enrollment_id: uuid.UUID,
     request: StampIssueRequest,
-    db: Session = Depends(get_db),
-    current_user: str = Depends(get_current_user),
+    current_user: str,
 ):
     user = _require_user(db, current_user)
     merchants = get_merchants_by_owner(db, user.id)
@@ -171,12 +180,17 @@ def issue_stamp(
     }
 
 
-@router.get("/enrollments/{enrollment_id}/reward", response_model=RewardResponse)
-def get_reward(
+@router.post("/enrollments/{enrollment_id}/stamps")
+async def issue_stamp(
     enrollment_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    request: StampIssueRequest,
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user),
 ):
+    return await db.run_sync(_issue_stamp, enrollment_id, request, current_user)
+
+
+def _get_reward(db: Session, enrollment_id: uuid.UUID, current_user: str) -> RewardResponse:
     user = _require_user(db, current_user)
     enrollment = get_membership(db, enrollment_id)
     if not enrollment or enrollment.customer_user_id != user.id and user.role != UserRole.MERCHANT:
@@ -198,6 +212,15 @@ def get_reward(
     )
 
 
+@router.get("/enrollments/{enrollment_id}/reward", response_model=RewardResponse)
+async def get_reward(
+    enrollment_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user),
+):
+    return await db.run_sync(_get_reward, enrollment_id, current_user)
+
+
 @router.post("/rewards/{reward_id}/redeem")
 def redeem_reward(
     reward_id: uuid.UUID,
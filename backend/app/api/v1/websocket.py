@@ -1,20 +1,129 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import Dict, List
-import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from collections import deque
+from typing import Deque, Dict, List, Tuple
 import logging
 import asyncio
-from sqlalchemy.orm import Session
+import sys
+import time
 
-from ...db.session import get_db
-from ...api.deps import get_current_user
+from ...core.config import settings
+from ...core.serialization import dumps
+from ...core.metrics import (
+    WS_COALESCED,
+    WS_CONNECTION_MEMORY_BYTES,
+    WS_CONNECTIONS,
+    WS_EVICTIONS,
+    WS_OUTBOUND_COALESCED,
+    WS_OUTBOUND_DROPPED,
+    WS_OUTBOUND_ENQUEUED,
+    WS_OUTBOUND_QUEUE_DEPTH,
+    WS_REPLAYED_FRAMES,
+    WS_RESYNCS,
+)
+from ...services.pubsub import Broker, create_broker
+from ...services.reward_service import redemption_status_name
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Close code sent to clients evicted for falling behind (RFC 6455 "Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Close code for sockets that stopped answering heartbeats ("Going Away"),
+# so clients that are actually alive reconnect
+IDLE_CLOSE_CODE = 1001
+
+
+class ClientConnection:
+    """One WebSocket plus its bounded outbox and the writer task draining it."""
+
+    # Thousands of these live per worker; slots keep each record small
+    __slots__ = ("websocket", "capacity", "outbox", "ready", "writer", "closed", "last_seen")
+
+    def __init__(self, websocket: WebSocket, capacity: int):
+        self.websocket = websocket
+        self.capacity = capacity
+        self.outbox: Deque[str] = deque()
+        self.ready = asyncio.Event()
+        self.writer: asyncio.Task | None = None
+        self.closed = False
+        self.last_seen = time.monotonic()
+
+    def touch(self):
+        """Record inbound traffic (any client frame, including pongs)."""
+        self.last_seen = time.monotonic()
+
+    def offer(self, frame: str) -> bool:
+        """Queue an encoded frame without waiting; False means the client is too far behind."""
+        if self.closed:
+            return True
+        if len(self.outbox) >= self.capacity:
+            return False
+        self.outbox.append(frame)
+        self.ready.set()
+        return True
+
+
+def _channel_role(channel: str) -> str:
+    return channel.split("_", 1)[0]
+
+
+def _connection_size(connection: ClientConnection) -> int:
+    """Shallow estimate of what one connection record holds on this worker."""
+    return (
+        sys.getsizeof(connection)
+        + sys.getsizeof(connection.outbox)
+        + sys.getsizeof(connection.ready)
+        + sys.getsizeof(connection.websocket)
+    )
+
+
+def _merge_updates(previous: dict, latest: dict) -> dict:
+    """Latest state wins; stamp deltas accumulate so counters stay right."""
+    merged = dict(latest)
+    if isinstance(previous.get("delta"), (int, float)) and isinstance(latest.get("delta"), (int, float)):
+        merged["delta"] = previous["delta"] + latest["delta"]
+    return merged
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    def __init__(
+        self,
+        broker: Broker | None = None,
+        outbox_capacity: int | None = None,
+        connection_outbox_size: int | None = None,
+        send_timeout: float | None = None,
+        coalesce_window: float | None = None,
+        replay_size: int | None = None,
+        resume_grace: float | None = None,
+        heartbeat_interval: float | None = None,
+        idle_timeout: float | None = None,
+    ):
+        self.active_connections: Dict[str, List[ClientConnection]] = {}
+        self.broker = broker or create_broker()
+        self.outbox_capacity = outbox_capacity or settings.WS_OUTBOUND_QUEUE_SIZE
+        self.connection_outbox_size = connection_outbox_size or settings.WS_CONNECTION_OUTBOX_SIZE
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT_SECONDS
+        self._outbox: Deque[list] = deque()
+        self._pending: Dict[tuple, list] = {}
+        self._outbox_ready: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._sender_task: asyncio.Task | None = None
+        self.coalesce_window = (
+            settings.WS_COALESCE_WINDOW_MS / 1000 if coalesce_window is None else coalesce_window
+        )
+        self._debounced: Dict[tuple, tuple] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flush_loop: asyncio.AbstractEventLoop | None = None
+        # Resume support: recent frames per channel, kept for a grace period
+        # after the last local connection leaves so a reconnect can catch up
+        self.replay_size = replay_size or settings.WS_REPLAY_BUFFER_SIZE
+        self.resume_grace = settings.WS_RESUME_GRACE_SECONDS if resume_grace is None else resume_grace
+        self._replay: Dict[str, Deque[Tuple[int, str]]] = {}
+        self._lingering: Dict[str, asyncio.TimerHandle] = {}
+        self.heartbeat_interval = heartbeat_interval or settings.WS_HEARTBEAT_INTERVAL_SECONDS
+        self.idle_timeout = idle_timeout or settings.WS_IDLE_TIMEOUT_SECONDS
+        self._heartbeat_task: asyncio.Task | None = None
 
     @staticmethod
     def _customer_channel(user_id: str) -> str:
@@ -24,58 +133,326 @@ class ConnectionManager:
     def _merchant_channel(user_id: str) -> str:
         return user_id if user_id.startswith("merchant_") else f"merchant_{user_id}"
 
-    async def connect(self, user_id: str, websocket: WebSocket):
+    async def connect(self, user_id: str, websocket: WebSocket, last_seq: int | None = None):
+        self.bind_loop()
         await websocket.accept()
+        # Subscribed continuously since the client left, so the buffer is complete
+        was_subscribed = user_id in self.active_connections or user_id in self._lingering
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
-        self.active_connections[user_id].append(websocket)
+            lingering = self._lingering.pop(user_id, None)
+            if lingering is not None:
+                lingering.cancel()
+            else:
+                # First local connection for this channel: start receiving its traffic
+                self._replay[user_id] = deque(maxlen=self.replay_size)
+                await self.broker.subscribe(user_id, self._deliver)
+        connection = ClientConnection(websocket, self.connection_outbox_size)
+        if last_seq is not None:
+            # No await between replay and joining the channel, so no live
+            # frame can slip in between the two
+            self._replay_missed(user_id, connection, last_seq, was_subscribed)
+        connection.writer = asyncio.create_task(self._write_loop(user_id, connection))
+        self.active_connections[user_id].append(connection)
+        WS_CONNECTIONS.inc(role=_channel_role(user_id))
         logger.info(f"User {user_id} connected. Total connections: {len(self.active_connections[user_id])}")
+        return connection
 
-    def disconnect(self, user_id: str, websocket: WebSocket):
-        if user_id in self.active_connections:
-            self.active_connections[user_id].remove(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-            logger.info(f"User {user_id} disconnected. Remaining connections: {len(self.active_connections.get(user_id, []))}")
+    async def disconnect(self, user_id: str, websocket: WebSocket):
+        for connection in self.active_connections.get(user_id, []):
+            if connection.websocket is websocket:
+                await self._remove(user_id, connection)
+                break
+        logger.info(f"User {user_id} disconnected. Remaining connections: {len(self.active_connections.get(user_id, []))}")
 
-    async def send_personal_message(self, message: dict, user_id: str):
+    async def _remove(self, user_id: str, connection: ClientConnection):
+        connection.closed = True
+        connection.outbox.clear()
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        connections = self.active_connections.get(user_id)
+        if connections is None:
+            return
+        if connection in connections:
+            connections.remove(connection)
+            WS_CONNECTIONS.dec(role=_channel_role(user_id))
+        if not connections:
+            del self.active_connections[user_id]
+            if self.resume_grace > 0:
+                loop = asyncio.get_running_loop()
+                self._lingering[user_id] = loop.call_later(
+                    self.resume_grace, lambda: loop.create_task(self._release_channel(user_id))
+                )
+            else:
+                await self._release_channel(user_id)
+
+    async def _release_channel(self, user_id: str):
+        self._lingering.pop(user_id, None)
         if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
+            return
+        self._replay.pop(user_id, None)
+        await self.broker.unsubscribe(user_id, self._deliver)
+
+    def _replay_missed(self, user_id: str, connection: ClientConnection, last_seq: int, was_subscribed: bool):
+        frames = self._replay.get(user_id) or ()
+        missed = [frame for seq, frame in frames if seq > last_seq]
+        if frames:
+            # A last_seq ahead of ours means the channel's counter was reset
+            complete = frames[0][0] <= last_seq + 1 and last_seq <= frames[-1][0]
+        else:
+            complete = was_subscribed
+        if complete and len(missed) < connection.capacity:
+            for frame in missed:
+                connection.offer(frame)
+            WS_REPLAYED_FRAMES.inc(len(missed))
+            return
+        WS_RESYNCS.inc()
+        connection.offer(dumps({
+            "type": "resync_required",
+            "last_seq": frames[-1][0] if frames else None,
+        }))
+
+    async def _evict(
+        self,
+        user_id: str,
+        connection: ClientConnection,
+        reason: str,
+        code: int = SLOW_CONSUMER_CLOSE_CODE,
+    ):
+        if connection.closed:
+            return
+        WS_EVICTIONS.inc(reason=reason)
+        logger.warning(f"Evicting WebSocket on {user_id}: {reason}")
+        await self._remove(user_id, connection)
+        asyncio.create_task(self._close_quietly(connection.websocket, code, reason))
+
+    async def _close_quietly(self, websocket: WebSocket, code: int, reason: str):
+        try:
+            await asyncio.wait_for(websocket.close(code=code, reason=reason), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    async def _heartbeat_loop(self):
+        """Ping every socket and reap the ones that have gone quiet (half-open mobiles)."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.sweep()
+
+    def sweep(self):
+        now = time.monotonic()
+        ping = dumps({"type": "ping", "ts": int(time.time())})
+        total_bytes = 0
+        total = 0
+        for user_id, connections in list(self.active_connections.items()):
+            for connection in list(connections):
+                if now - connection.last_seen > self.idle_timeout:
+                    asyncio.create_task(self._evict(user_id, connection, "idle", IDLE_CLOSE_CODE))
+                    continue
+                connection.offer(ping)
+                total += 1
+                total_bytes += _connection_size(connection)
+        WS_CONNECTION_MEMORY_BYTES.set(total_bytes / total if total else 0)
+
+    async def _write_loop(self, user_id: str, connection: ClientConnection):
+        """Per-connection writer: one slow socket only ever delays itself."""
+        try:
+            while not connection.closed:
+                await connection.ready.wait()
+                connection.ready.clear()
+                while connection.outbox and not connection.closed:
+                    frame = connection.outbox.popleft()
+                    await asyncio.wait_for(connection.websocket.send_text(frame), timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            await self._evict(user_id, connection, "send_timeout")
+        except Exception as e:
+            logger.error(f"Failed to send message to user {user_id}: {e}")
+            await self._evict(user_id, connection, "send_error")
+
+    async def send_personal_message(self, message: dict | str, user_id: str):
+        """
+        Fan a message out to every socket this worker holds for the channel.
+        The message is JSON-encoded once and the same frame is queued for
+        every connection. Each connection is written by its own task, so this
+        only queues; a connection whose outbox is already full is evicted.
+        """
+        frame = message if isinstance(message, str) else dumps(message)
+        for connection in list(self.active_connections.get(user_id, [])):
+            if not connection.offer(frame):
+                await self._evict(user_id, connection, "outbox_full")
+
+    async def _deliver(self, channel: str, message: dict):
+        # Encoded once here; live recipients and the replay buffer share the frame
+        frame = dumps(message)
+        frames = self._replay.get(channel)
+        if frames is not None and isinstance(message.get("seq"), int):
+            frames.append((message["seq"], frame))
+        await self.send_personal_message(frame, channel)
+
+    async def broadcast_to_user(self, message: dict, user_id: str, coalesce_key: tuple | None = None):
+        """
+        Publish through the broker so whichever worker holds the channel
+        delivers it. Messages with a coalesce key are held for the debounce
+        window and only the latest state per key is sent. Anything else
+        first flushes the channel's held messages, so it is never overtaken
+        by updates sent before it.
+        """
+        if coalesce_key is None or self.coalesce_window <= 0:
+            if any(channel == user_id for channel, _ in self._debounced.values()):
+                await self.flush(user_id)
+            await self.broker.publish(user_id, message)
+            return
+        self._debounce(user_id, message, coalesce_key)
+
+    # Debounced coalescing: bursts of same-key updates collapse to one frame
+
+    def _debounce(self, channel: str, message: dict, coalesce_key: tuple):
+        previous = self._debounced.get(coalesce_key)
+        if previous is not None:
+            message = _merge_updates(previous[1], message)
+            WS_COALESCED.inc(type=str(message.get("type")))
+        # Replacing an existing key keeps its original position in the send order
+        self._debounced[coalesce_key] = (channel, message)
+        loop = asyncio.get_running_loop()
+        # A handle left on a previous (closed) loop would never fire
+        if self._flush_handle is None or self._flush_loop is not loop:
+            self._flush_loop = loop
+            self._flush_handle = loop.call_later(self.coalesce_window, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._flush_handle = None
+        asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self, channel: str | None = None):
+        """Publish everything held in the debounce window, or just ``channel``'s messages."""
+        if channel is None:
+            pending, self._debounced = self._debounced, {}
+        else:
+            pending = {key: held for key, held in self._debounced.items() if held[0] == channel}
+            for key in pending:
+                del self._debounced[key]
+        if not self._debounced and self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        by_channel: Dict[str, List[dict]] = {}
+        for channel, message in pending.values():
+            by_channel.setdefault(channel, []).append(message)
+
+        for channel, messages in by_channel.items():
+            customer_updates = [m for m in messages if m.get("type") == "customer_stamp_update"]
+            if len(customer_updates) > 1:
+                # Merchant dashboards get one frame for a rush of customers
+                batch = {"type": "customer_stamp_batch", "updates": customer_updates}
+                messages = [m for m in messages if m.get("type") != "customer_stamp_update"] + [batch]
+            for message in messages:
                 try:
-                    await connection.send_json(message)
+                    await self.broker.publish(channel, message)
                 except Exception as e:
-                    logger.error(f"Failed to send message to user {user_id}: {e}")
-                    # Remove broken connection
-                    self.active_connections[user_id].remove(connection)
+                    WS_OUTBOUND_DROPPED.inc(reason="publish_error")
+                    logger.error(f"Failed to publish to {channel}: {e}")
 
-    async def broadcast_to_user(self, message: dict, user_id: str):
-        await self.send_personal_message(message, user_id)
+    # Thread-safe outbound queue: sync code running in the threadpool hands
+    # messages to the server loop instead of spinning up its own event loop.
 
-    async def broadcast_stamp_update(self, user_id: str, program_id: str, new_balance: int):
+    def bind_loop(self, loop: asyncio.AbstractEventLoop | None = None):
+        """Attach the manager to the server loop and start its sender and heartbeat tasks."""
+        loop = loop or asyncio.get_running_loop()
+        if self._loop is loop and self._sender_task and not self._sender_task.done():
+            return
+        self._loop = loop
+        self._outbox_ready = asyncio.Event()
+        self._sender_task = loop.create_task(self._drain_outbox())
+        self._heartbeat_task = loop.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        await self.flush()
+        for handle in self._lingering.values():
+            handle.cancel()
+        self._lingering.clear()
+        for task in (self._sender_task, self._heartbeat_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._sender_task = None
+        self._heartbeat_task = None
+        for connections in self.active_connections.values():
+            for connection in connections:
+                if connection.writer is not None:
+                    connection.writer.cancel()
+        await self.broker.close()
+
+    def enqueue(self, channel: str, message: dict, coalesce_key: tuple | None = None):
+        """
+        Queue a message for publishing from any thread. Returns immediately;
+        the sender task on the server loop does the actual send.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            WS_OUTBOUND_DROPPED.inc(reason="no_loop")
+            logger.warning(f"Dropping {message.get('type')} for {channel}: broadcast loop not running")
+            return
+        try:
+            loop.call_soon_threadsafe(self._put, channel, message, coalesce_key)
+        except RuntimeError:
+            WS_OUTBOUND_DROPPED.inc(reason="no_loop")
+
+    def _put(self, channel: str, message: dict, coalesce_key: tuple | None):
+        # Runs on the server loop, so the outbox needs no lock
+        if coalesce_key is not None and coalesce_key in self._pending:
+            self._pending[coalesce_key][1] = message
+            WS_OUTBOUND_COALESCED.inc()
+            return
+        if coalesce_key is None:
+            # Later updates must queue behind this message, not merge into
+            # entries ahead of it
+            for key in [key for key, entry in self._pending.items() if entry[0] == channel]:
+                del self._pending[key]
+        if len(self._outbox) >= self.outbox_capacity:
+            _, _, dropped_key = self._outbox.popleft()
+            if dropped_key is not None:
+                self._pending.pop(dropped_key, None)
+            WS_OUTBOUND_DROPPED.inc(reason="queue_full")
+        entry = [channel, message, coalesce_key]
+        self._outbox.append(entry)
+        if coalesce_key is not None:
+            self._pending[coalesce_key] = entry
+        WS_OUTBOUND_ENQUEUED.inc()
+        WS_OUTBOUND_QUEUE_DEPTH.set(len(self._outbox))
+        self._outbox_ready.set()
+
+    async def _drain_outbox(self):
+        while True:
+            await self._outbox_ready.wait()
+            self._outbox_ready.clear()
+            while self._outbox:
+                channel, message, coalesce_key = self._outbox.popleft()
+                if coalesce_key is not None:
+                    self._pending.pop(coalesce_key, None)
+                WS_OUTBOUND_QUEUE_DEPTH.set(len(self._outbox))
+                try:
+                    await self.broadcast_to_user(message, channel, coalesce_key)
+                except Exception as e:
+                    WS_OUTBOUND_DROPPED.inc(reason="publish_error")
+                    logger.error(f"Failed to publish to {channel}: {e}")
+
+    # Message builders, shared by the async broadcasts and the queued *_sync variants
+
+    def _stamp_update_message(self, user_id: str, program_id: str, new_balance: int):
+        channel = self._customer_channel(user_id)
         message = {
             "type": "stamp_update",
             "program_id": program_id,
             "new_balance": new_balance,
             "timestamp": "now"
         }
-        await self.broadcast_to_user(message, self._customer_channel(user_id))
+        return channel, message, (channel, "stamp_update", program_id)
 
-    def broadcast_stamp_update_sync(self, user_id: str, program_id: str, new_balance: int):
-        """Synchronous wrapper for broadcasting stamp updates"""
-        # Create a new event loop if one doesn't exist, or use the current one
-        channel = self._customer_channel(user_id)
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # If loop is already running, we need to schedule the coroutine
-                asyncio.create_task(self.broadcast_stamp_update(channel, program_id, new_balance))
-            else:
-                loop.run_until_complete(self.broadcast_stamp_update(channel, program_id, new_balance))
-        except RuntimeError:
-            # No event loop, create a new one
-            asyncio.run(self.broadcast_stamp_update(channel, program_id, new_balance))
-
-    async def broadcast_redeem_notification(self, merchant_user_id: str, customer_name: str, program_name: str, stamps_redeemed: int, code: str, reward_id: str):
+    def _redeem_notification_message(self, merchant_user_id: str, customer_name: str, program_name: str, stamps_redeemed: int, code: str, reward_id: str):
         message = {
             "type": "redeem_request",
             "customer_name": customer_name,
@@ -85,93 +462,97 @@ class ConnectionManager:
             "reward_id": reward_id,
             "timestamp": "now"
         }
-        await self.broadcast_to_user(message, self._merchant_channel(merchant_user_id))
+        return self._merchant_channel(merchant_user_id), message, None
 
-    def broadcast_redeem_notification_sync(self, merchant_user_id: str, customer_name: str, program_name: str, stamps_redeemed: int, code: str, reward_id: str):
-        """Synchronous wrapper for broadcasting redeem notifications"""
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.create_task(self.broadcast_redeem_notification(merchant_user_id, customer_name, program_name, stamps_redeemed, code, reward_id))
-            else:
-                loop.run_until_complete(self.broadcast_redeem_notification(merchant_user_id, customer_name, program_name, stamps_redeemed, code, reward_id))
-        except RuntimeError:
-            asyncio.run(self.broadcast_redeem_notification(merchant_user_id, customer_name, program_name, stamps_redeemed, code, reward_id))
-
-    async def broadcast_notification(self, user_id: str, notification_data: dict):
+    def _notification_message(self, user_id: str, notification_data: dict):
         message = {
             "type": "notification",
             "data": notification_data
         }
-        await self.broadcast_to_user(message, self._customer_channel(user_id))
+        return self._customer_channel(user_id), message, None
 
-    async def broadcast_reward_status(self, user_id: str, payload: dict):
+    def _reward_status_message(self, user_id: str, payload: dict):
+        channel = self._customer_channel(user_id)
         message = {
             "type": "reward_status",
             **payload,
         }
-        await self.broadcast_to_user(message, self._customer_channel(user_id))
+        if "status" in payload:
+            # Same names as GET /customer/redemptions ("claimed", not "redeemable")
+            message["status"] = redemption_status_name(payload["status"])
+        return channel, message, (channel, "reward_status", payload.get("reward_id"))
 
-    def broadcast_reward_status_sync(self, user_id: str, payload: dict):
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.create_task(self.broadcast_reward_status(user_id, payload))
-            else:
-                loop.run_until_complete(self.broadcast_reward_status(user_id, payload))
-        except RuntimeError:
-            asyncio.run(self.broadcast_reward_status(user_id, payload))
-
-    async def broadcast_membership_left(self, user_id: str, payload: dict):
+    def _membership_left_message(self, user_id: str, payload: dict):
         message = {
             "type": "membership_left",
             **payload,
         }
-        await self.broadcast_to_user(message, self._customer_channel(user_id))
-
-    def broadcast_membership_left_sync(self, user_id: str, payload: dict):
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.create_task(self.broadcast_membership_left(user_id, payload))
-            else:
-                loop.run_until_complete(self.broadcast_membership_left(user_id, payload))
-        except RuntimeError:
-            asyncio.run(self.broadcast_membership_left(user_id, payload))
+        return self._customer_channel(user_id), message, None
 
-    async def broadcast_merchant_customer_update(self, merchant_user_id: str, payload: dict):
+    def _merchant_customer_update_message(self, merchant_user_id: str, payload: dict):
+        channel = self._merchant_channel(merchant_user_id)
         message = {
             "type": "customer_stamp_update",
             **payload,
         }
-        await self.broadcast_to_user(message, self._merchant_channel(merchant_user_id))
-
-    def broadcast_merchant_customer_update_sync(self, merchant_user_id: str, payload: dict):
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.create_task(self.broadcast_merchant_customer_update(merchant_user_id, payload))
-            else:
-                loop.run_until_complete(self.broadcast_merchant_customer_update(merchant_user_id, payload))
-        except RuntimeError:
-            asyncio.run(self.broadcast_merchant_customer_update(merchant_user_id, payload))
+        key = (channel, "customer_stamp_update", payload.get("customer_id"), payload.get("program_id"))
+        return channel, message, key
 
-    async def broadcast_merchant_reward_update(self, merchant_user_id: str, payload: dict):
+    def _merchant_reward_update_message(self, merchant_user_id: str, payload: dict):
         message = {
             "type": "reward_redeemed",
             **payload,
         }
-        await self.broadcast_to_user(message, self._merchant_channel(merchant_user_id))
+        channel = self._merchant_channel(merchant_user_id)
+        return channel, message, (channel, "reward_redeemed", payload.get("reward_id"))
+
+    async def broadcast_stamp_update(self, user_id: str, program_id: str, new_balance: int):
+        channel, message, key = self._stamp_update_message(user_id, program_id, new_balance)
+        await self.broadcast_to_user(message, channel, key)
+
+    def broadcast_stamp_update_sync(self, user_id: str, program_id: str, new_balance: int):
+        """Queue a stamp update from sync code"""
+        self.enqueue(*self._stamp_update_message(user_id, program_id, new_balance))
+
+    async def broadcast_redeem_notification(self, merchant_user_id: str, customer_name: str, program_name: str, stamps_redeemed: int, code: str, reward_id: str):
+        channel, message, key = self._redeem_notification_message(merchant_user_id, customer_name, program_name, stamps_redeemed, code, reward_id)
+        await self.broadcast_to_user(message, channel, key)
+
+    def broadcast_redeem_notification_sync(self, merchant_user_id: str, customer_name: str, program_name: str, stamps_redeemed: int, code: str, reward_id: str):
+        """Queue a redeem notification from sync code"""
+        self.enqueue(*self._redeem_notification_message(merchant_user_id, customer_name, program_name, stamps_redeemed, code, reward_id))
+
+    async def broadcast_notification(self, user_id: str, notification_data: dict):
+        channel, message, key = self._notification_message(user_id, notification_data)
+        await self.broadcast_to_user(message, channel, key)
+
+    async def broadcast_reward_status(self, user_id: str, payload: dict):
+        channel, message, key = self._reward_status_message(user_id, payload)
+        await self.broadcast_to_user(message, channel, key)
+
+    def broadcast_reward_status_sync(self, user_id: str, payload: dict):
+        self.enqueue(*self._reward_status_message(user_id, payload))
+
+    async def broadcast_membership_left(self, user_id: str, payload: dict):
+        channel, message, key = self._membership_left_message(user_id, payload)
+        await self.broadcast_to_user(message, channel, key)
+
+    def broadcast_membership_left_sync(self, user_id: str, payload: dict):
+        self.enqueue(*self._membership_left_message(user_id, payload))
+
+    async def broadcast_merchant_customer_update(self, merchant_user_id: str, payload: dict):
+        channel, message, key = self._merchant_customer_update_message(merchant_user_id, payload)
+        await self.broadcast_to_user(message, channel, key)
+
+    def broadcast_merchant_customer_update_sync(self, merchant_user_id: str, payload: dict):
+        self.enqueue(*self._merchant_customer_update_message(merchant_user_id, payload))
+
+    async def broadcast_merchant_reward_update(self, merchant_user_id: str, payload: dict):
+        channel, message, key = self._merchant_reward_update_message(merchant_user_id, payload)
+        await self.broadcast_to_user(message, channel, key)
 
     def broadcast_merchant_reward_update_sync(self, merchant_user_id: str, payload: dict):
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.create_task(self.broadcast_merchant_reward_update(merchant_user_id, payload))
-            else:
-                loop.run_until_complete(self.broadcast_merchant_reward_update(merchant_user_id, payload))
-        except RuntimeError:
-            asyncio.run(self.broadcast_merchant_reward_update(merchant_user_id, payload))
+        self.enqueue(*self._merchant_reward_update_message(merchant_user_id, payload))
 
 manager = ConnectionManager()
 
@@ -179,44 +560,39 @@ manager = ConnectionManager()
 def get_websocket_manager():
     return manager
 
+async def _serve(channel: str, websocket: WebSocket, last_seq: int | None):
+    connection = await manager.connect(channel, websocket, last_seq=last_seq)
+    try:
+        while True:
+            # Any client frame (including heartbeat pongs) proves the socket is alive
+            data = await websocket.receive_text()
+            connection.touch()
+            logger.debug(f"Received message on {channel}: {data}")
+    except WebSocketDisconnect:
+        await manager.disconnect(channel, websocket)
+    except Exception as e:
+        logger.error(f"WebSocket error on {channel}: {e}")
+        await manager.disconnect(channel, websocket)
+
+
 @router.websocket("/customer/{user_id}")
 async def customer_websocket(
     websocket: WebSocket,
     user_id: str,
-    db: Session = Depends(get_db)
+    last_seq: int | None = Query(None),
 ):
     # Note: In a production app, you'd want to validate the user_id
     # and possibly use JWT tokens for authentication
-    await manager.connect(f"customer_{user_id}", websocket)
-    try:
-        while True:
-            # Keep the connection alive and listen for client messages
-            data = await websocket.receive_text()
-            # You can handle client messages here if needed
-            logger.debug(f"Received message from customer {user_id}: {data}")
-    except WebSocketDisconnect:
-        manager.disconnect(f"customer_{user_id}", websocket)
-    except Exception as e:
-        logger.error(f"WebSocket error for customer {user_id}: {e}")
-        manager.disconnect(f"customer_{user_id}", websocket)
+    # Reconnecting clients pass last_seq to receive only the frames they missed
+    await _serve(f"customer_{user_id}", websocket, last_seq)
+
 
 @router.websocket("/merchant/{user_id}")
 async def merchant_websocket(
     websocket: WebSocket,
     user_id: str,
-    db: Session = Depends(get_db)
+    last_seq: int | None = Query(None),
 ):
     # Note: In a production app, you'd want to validate the user_id
     # and possibly use JWT tokens for authentication
-    await manager.connect(f"merchant_{user_id}", websocket)
-    try:
-        while True:
-            # Keep the connection alive and listen for client messages
-            data = await websocket.receive_text()
-            # You can handle client messages here if needed
-            logger.debug(f"Received message from merchant {user_id}: {data}")
-    except WebSocketDisconnect:
-        manager.disconnect(f"merchant_{user_id}", websocket)
-    except Exception as e:
-        logger.error(f"WebSocket error for merchant {user_id}: {e}")
-        manager.disconnect(f"merchant_{user_id}", websocket)
+    await _serve(f"merchant_{user_id}", websocket, last_seq)
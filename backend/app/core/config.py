@@ -15,12 +15,66 @@ class Settings(BaseSettings):
     SIGNING_KEY: str = Field(default="your-signing-key-here", env="SIGNING_KEY")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=60 * 24 * 8, env="ACCESS_TOKEN_EXPIRE_MINUTES")
 
+    # Password hashing (pbkdf2_sha256). Hashes with other rounds are
+    # rehashed on the next successful login; 0 workers hashes in-process.
+    PASSWORD_HASH_ROUNDS: int = Field(default=29000, env="PASSWORD_HASH_ROUNDS")
+    PASSWORD_HASH_WORKERS: int = Field(default=2, env="PASSWORD_HASH_WORKERS")
+    # Logins are buffered and last_login_at written in batches this often
+    LAST_LOGIN_FLUSH_SECONDS: int = Field(default=10, env="LAST_LOGIN_FLUSH_SECONDS")
+
     # Database
     DATABASE_URL: str = Field(default="sqlite:///./test.db", env="DATABASE_URL")
 
     # Redis
     REDIS_URL: str = Field(default="redis://localhost:6379", env="REDIS_URL")
 
+    # WebSocket fan-out: "redis" for multi-worker deployments, "loopback" for a single process
+    WS_BROKER: str = Field(default="loopback", env="WS_BROKER")
+    WS_OUTBOUND_QUEUE_SIZE: int = Field(default=10000, env="WS_OUTBOUND_QUEUE_SIZE")
+    WS_CONNECTION_OUTBOX_SIZE: int = Field(default=100, env="WS_CONNECTION_OUTBOX_SIZE")
+    WS_SEND_TIMEOUT_SECONDS: float = Field(default=5.0, env="WS_SEND_TIMEOUT_SECONDS")
+    WS_COALESCE_WINDOW_MS: int = Field(default=50, env="WS_COALESCE_WINDOW_MS")
+    WS_REPLAY_BUFFER_SIZE: int = Field(default=200, env="WS_REPLAY_BUFFER_SIZE")
+    WS_RESUME_GRACE_SECONDS: float = Field(default=120.0, env="WS_RESUME_GRACE_SECONDS")
+    WS_HEARTBEAT_INTERVAL_SECONDS: float = Field(default=25.0, env="WS_HEARTBEAT_INTERVAL_SECONDS")
+    WS_IDLE_TIMEOUT_SECONDS: float = Field(default=75.0, env="WS_IDLE_TIMEOUT_SECONDS")
+
+    # Caching
+    PROGRAM_CACHE_TTL_SECONDS: int = Field(default=300, env="PROGRAM_CACHE_TTL_SECONDS")
+    CUSTOMER_SEARCH_CACHE_TTL_SECONDS: int = Field(default=300, env="CUSTOMER_SEARCH_CACHE_TTL_SECONDS")
+    CUSTOMER_SEARCH_CACHE_MERCHANTS: int = Field(default=64, env="CUSTOMER_SEARCH_CACHE_MERCHANTS")
+    PRINCIPAL_CACHE_TTL_SECONDS: int = Field(default=60, env="PRINCIPAL_CACHE_TTL_SECONDS")
+    TOKEN_CACHE_SIZE: int = Field(default=10000, env="TOKEN_CACHE_SIZE")
+
+    # Customer segments
+    SEGMENT_LAPSED_DAYS: int = Field(default=30, env="SEGMENT_LAPSED_DAYS")
+    SEGMENT_REGULAR_WINDOW_DAYS: int = Field(default=30, env="SEGMENT_REGULAR_WINDOW_DAYS")
+    SEGMENT_REGULAR_MIN_VISITS: int = Field(default=3, env="SEGMENT_REGULAR_MIN_VISITS")
+    SEGMENT_REGULAR_TOP_FRACTION: float = Field(default=0.2, env="SEGMENT_REGULAR_TOP_FRACTION")
+    SEGMENT_REFRESH_SECONDS: int = Field(default=300, env="SEGMENT_REFRESH_SECONDS")
+
+    # Rate limiting. Budgets are "requests/seconds" token buckets per user,
+    # device fingerprint and (RATE_LIMIT_IP_MULTIPLIER times larger) per IP.
+    # Buckets live in each worker unless RATE_LIMIT_REDIS_URL is set.
+    RATE_LIMIT_ENABLED: bool = Field(default=True, env="RATE_LIMIT_ENABLED")
+    RATE_LIMIT_REDIS_URL: str = Field(default="", env="RATE_LIMIT_REDIS_URL")
+    RATE_LIMIT_IP_MULTIPLIER: int = Field(default=10, env="RATE_LIMIT_IP_MULTIPLIER")
+    RATE_LIMIT_SCAN: str = Field(default="30/60", env="RATE_LIMIT_SCAN")
+    RATE_LIMIT_AUTH: str = Field(default="10/60", env="RATE_LIMIT_AUTH")
+    RATE_LIMIT_REDEEM: str = Field(default="10/60", env="RATE_LIMIT_REDEEM")
+    # Comma-separated proxy addresses or CIDRs whose Fly-Client-IP and
+    # X-Forwarded-For headers name the client for the IP bucket. "*" trusts
+    # any peer, for hosts only reachable through their edge proxy.
+    RATE_LIMIT_TRUSTED_PROXIES: str = Field(default="", env="RATE_LIMIT_TRUSTED_PROXIES")
+
+    # Prometheus scrapes send "Authorization: Bearer <METRICS_TOKEN>";
+    # /metrics answers 404 while it is unset
+    METRICS_TOKEN: str = Field(default="", env="METRICS_TOKEN")
+
+    # Background purges of left/removed memberships
+    PURGE_CHUNK_SIZE: int = Field(default=500, env="PURGE_CHUNK_SIZE")
+    PURGE_CHUNK_PAUSE_MS: int = Field(default=20, env="PURGE_CHUNK_PAUSE_MS")
+
     # CORS
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = Field(
         default=[
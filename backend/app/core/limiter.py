@@ -1,3 +1,282 @@
-from slowapi import Limiter
+import ipaddress
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
 
-limiter = Limiter(key_func=lambda: "global")  # Simple global rate limiter for demo
\ No newline at end of file
+from fastapi import HTTPException, Request, status
+from jose import jwt
+
+from .config import settings
+from .metrics import RATE_LIMITED
+from .security import ALGORITHM
+from .token_cache import token_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Budget:
+    """A token bucket: ``capacity`` requests in a burst, refilled continuously."""
+
+    capacity: float
+    refill_per_second: float
+
+    @classmethod
+    def parse(cls, value: str) -> "Budget":
+        """``"30/60"`` is 30 requests per 60 seconds."""
+        requests, seconds = value.split("/")
+        return cls(capacity=float(requests), refill_per_second=float(requests) / float(seconds))
+
+    def scaled(self, factor: float) -> "Budget":
+        return Budget(self.capacity * factor, self.refill_per_second * factor)
+
+
+Buckets = Sequence[Tuple[str, Budget]]
+
+
+class MemoryBuckets:
+    """Token buckets held by this worker; the least recently used keys are dropped past ``max_keys``."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, buckets: Buckets) -> List[float]:
+        return self.take_now(buckets, time.monotonic())
+
+    def take_now(self, buckets: Buckets, now: float) -> List[float]:
+        """
+        Spend one token from every bucket, or from none of them. Returns, per
+        bucket, 0 when it had a token, else seconds until one is available.
+        """
+        with self._lock:
+            refilled = []
+            for key, budget in buckets:
+                tokens, updated_at = self._buckets.pop(key, (budget.capacity, now))
+                refilled.append(min(budget.capacity, tokens + (now - updated_at) * budget.refill_per_second))
+            retry_after = [
+                0.0 if tokens >= 1 else (1 - tokens) / budget.refill_per_second
+                for tokens, (_, budget) in zip(refilled, buckets)
+            ]
+            spend = 0 if any(retry_after) else 1
+            for tokens, (key, _) in zip(refilled, buckets):
+                self._buckets[key] = (tokens - spend, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+# Refill every bucket, spend from all of them only if all have a token, and
+# store, in one round trip and atomically across workers. ARGV is the time
+# followed by a capacity and rate per key. Retry delays are returned as
+# strings because Redis truncates Lua numbers.
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens, retry_after = {}, {}
+local allowed = true
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local ts = tonumber(state[2]) or now
+    tokens[i] = math.min(capacity, (tonumber(state[1]) or capacity) + math.max(0, now - ts) * rate)
+    retry_after[i] = '0'
+    if tokens[i] < 1 then
+        allowed = false
+        retry_after[i] = tostring((1 - tokens[i]) / rate)
+    end
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    if allowed then
+        tokens[i] = tokens[i] - 1
+    end
+    redis.call('HSET', key, 'tokens', tokens[i], 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return retry_after
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker through a Redis-compatible server."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as aioredis
+
+        self.prefix = prefix
+        self._client = aioredis.from_url(url)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, buckets: Buckets) -> List[float]:
+        args: List[float] = [time.time()]
+        for _, budget in buckets:
+            args += [budget.capacity, budget.refill_per_second]
+        result = await self._take(keys=[self.prefix + key for key, _ in buckets], args=args)
+        return [float(value) for value in result]
+
+
+def _bearer_subject(request: Request) -> Optional[str]:
+    """The caller's user id (or email, for older tokens), without touching the database."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    claims = token_cache.get(token)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.JWTError:
+            return None
+        if claims.get("sub") is None:
+            return None
+        # The auth dependency that runs next finds it verified already
+        token_cache.put(token, claims)
+    return claims.get("uid") or claims.get("sub")
+
+
+async def _json_field(request: Request, name: str) -> Optional[str]:
+    # FastAPI has already read the body, so this parses the cached bytes
+    if "json" not in request.headers.get("content-type", ""):
+        return None
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    value = body.get(name) if isinstance(body, dict) else None
+    return str(value).lower() if value else None
+
+
+def _address(host: str):
+    try:
+        return ipaddress.ip_address(host.strip())
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    Per-route token-bucket budgets charged to every identity a request
+    carries: the authenticated user (or, on auth routes, the email being
+    tried), the device fingerprint and the client IP. The IP bucket is
+    ``ip_multiplier`` times larger because many customers share a shop's
+    network. A request is rejected with 429 when any bucket is empty, and
+    then no bucket is charged.
+
+    Behind a proxy the socket peer is the proxy, so the client IP is read
+    from ``Fly-Client-IP`` or ``X-Forwarded-For``, but only when the peer is
+    one of ``trusted_proxies``; otherwise those headers are ignored.
+    """
+
+    def __init__(
+        self,
+        budgets: Dict[str, Budget],
+        redis_url: str = "",
+        ip_multiplier: float = 10,
+        enabled: bool = True,
+        trusted_proxies: str = "",
+    ):
+        self.budgets = budgets
+        self.ip_multiplier = ip_multiplier
+        self.enabled = enabled
+        self.local = MemoryBuckets()
+        self.shared = RedisBuckets(redis_url) if redis_url else None
+        entries = [entry.strip() for entry in trusted_proxies.split(",") if entry.strip()]
+        self.trust_any_peer = "*" in entries
+        self.trusted_networks: List = [
+            ipaddress.ip_network(entry, strict=False) for entry in entries if entry != "*"
+        ]
+
+    def _is_proxy(self, host: str) -> bool:
+        address = _address(host)
+        return address is not None and any(address in network for network in self.trusted_networks)
+
+    def client_ip(self, request: Request) -> Optional[str]:
+        peer = request.client.host if request.client else None
+        if not peer or not (self.trust_any_peer or self._is_proxy(peer)):
+            return peer
+        fly_client_ip = request.headers.get("fly-client-ip", "").strip()
+        if fly_client_ip:
+            return fly_client_ip
+        # Each proxy appends the address it saw, so walk back from our side
+        # and stop at the first hop that is not one of our proxies
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not self._is_proxy(hop):
+                return hop
+        return hops[0] if hops else peer
+
+    async def _take(self, buckets: Buckets) -> List[float]:
+        if self.shared is not None:
+            try:
+                return await self.shared.take(buckets)
+            except Exception as exc:
+                # Keep limiting, per worker, while the shared store is down
+                logger.warning("Shared rate limit store unavailable: %s", exc)
+        return await self.local.take(buckets)
+
+    async def check(self, route: str, request: Request) -> None:
+        if not self.enabled:
+            return
+        budget = self.budgets[route]
+        user = _bearer_subject(request)
+        if user is None and route == "auth":
+            user = await _json_field(request, "email")
+        device = request.headers.get("x-device-fingerprint") or await _json_field(request, "device_fingerprint")
+        ip = self.client_ip(request)
+
+        charged = [
+            (label, (f"{route}:{label}:{identity}", key_budget))
+            for label, identity, key_budget in (
+                ("user", user, budget),
+                ("device", device, budget),
+                ("ip", ip, budget.scaled(self.ip_multiplier)),
+            )
+            if identity
+        ]
+        if not charged:
+            return
+        retry_after = await self._take([bucket for _, bucket in charged])
+        if any(retry_after):
+            for (label, _), wait in zip(charged, retry_after):
+                if wait:
+                    RATE_LIMITED.inc(route=route, key=label)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please slow down.",
+                headers={"Retry-After": str(math.ceil(max(retry_after)))},
+            )
+
+    def reset(self) -> None:
+        self.local.clear()
+
+
+limiter = RateLimiter(
+    budgets={
+        "scan": Budget.parse(settings.RATE_LIMIT_SCAN),
+        "auth": Budget.parse(settings.RATE_LIMIT_AUTH),
+        "redeem": Budget.parse(settings.RATE_LIMIT_REDEEM),
+    },
+    redis_url=settings.RATE_LIMIT_REDIS_URL,
+    ip_multiplier=settings.RATE_LIMIT_IP_MULTIPLIER,
+    enabled=settings.RATE_LIMIT_ENABLED,
+    trusted_proxies=settings.RATE_LIMIT_TRUSTED_PROXIES,
+)
+
+
+def rate_limit(route: str):
+    """Route dependency charging each request to ``route``'s budget before any other work."""
+
+    async def dependency(request: Request) -> None:
+        await limiter.check(route, request)
+
+    return dependency
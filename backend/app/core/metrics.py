@@ -0,0 +1,223 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+_registry: Dict[str, "_Metric"] = {}
+_registry_lock = threading.Lock()
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry[name] = self
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            snapshot = dict(self._values)
+        for key, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic Prometheus-style counter."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Prometheus-style gauge that can be set or moved in either direction."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Minimal Prometheus-style histogram with cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then +Inf count and running sum
+                series = [0.0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative:g}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series[-2]:g}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_count{labels} {series[-2]:g}")
+            lines.append(f"{self.name}_sum{labels} {series[-1]:.6f}")
+        return lines
+
+
+def render_latest() -> str:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+SCAN_STAGE_SECONDS = Histogram(
+    "rudi_scan_stage_duration_seconds",
+    "Time spent in each stage of the QR scan pipeline.",
+    labelnames=("stage",),
+)
+
+WS_OUTBOUND_ENQUEUED = Counter(
+    "rudi_ws_outbound_enqueued_total",
+    "WebSocket messages accepted onto the outbound broadcast queue.",
+)
+WS_OUTBOUND_COALESCED = Counter(
+    "rudi_ws_outbound_coalesced_total",
+    "Queued WebSocket messages replaced by a newer message for the same key.",
+)
+WS_OUTBOUND_DROPPED = Counter(
+    "rudi_ws_outbound_dropped_total",
+    "WebSocket messages dropped before publishing.",
+    labelnames=("reason",),
+)
+WS_COALESCED = Counter(
+    "rudi_ws_coalesced_total",
+    "WebSocket updates merged into a newer update within the debounce window.",
+    labelnames=("type",),
+)
+WS_EVICTIONS = Counter(
+    "rudi_ws_evictions_total",
+    "WebSocket connections closed for falling behind or failing to send.",
+    labelnames=("reason",),
+)
+WS_REPLAYED_FRAMES = Counter(
+    "rudi_ws_replayed_frames_total",
+    "Frames replayed to reconnecting WebSocket clients from the resume buffer.",
+)
+WS_RESYNCS = Counter(
+    "rudi_ws_resyncs_total",
+    "Reconnects whose gap could not be replayed and were told to resync.",
+)
+RATE_LIMITED = Counter(
+    "rudi_rate_limited_total",
+    "Requests rejected by the rate limiter, by route budget and the bucket that ran dry.",
+    labelnames=("route", "key"),
+)
+WS_CONNECTIONS = Gauge(
+    "rudi_ws_connections",
+    "Open WebSocket connections on this worker.",
+    labelnames=("role",),
+)
+WS_CONNECTION_MEMORY_BYTES = Gauge(
+    "rudi_ws_connection_memory_bytes",
+    "Estimated bytes held per WebSocket connection record, sampled each heartbeat.",
+)
+WS_OUTBOUND_QUEUE_DEPTH = Gauge(
+    "rudi_ws_outbound_queue_depth",
+    "Messages waiting on the outbound broadcast queue.",
+)
+
+
+class StageTimer:
+    """
+    Collects per-stage durations for one request. Each stage is observed on
+    the given histogram as it finishes and can be rendered as a
+    Server-Timing header for the response.
+    """
+
+    def __init__(self, histogram: Histogram = SCAN_STAGE_SECONDS):
+        self.histogram = histogram
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages.append((name, elapsed))
+            self.histogram.observe(elapsed, stage=name)
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in self.stages)
@@ -0,0 +1,22 @@
+import base64
+from typing import Any
+
+from .serialization import dumps, loads
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque keyset cursor: the sort key(s) and id of the last row on a page."""
+    raw = dumps(list(values)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as exc:
+        raise ValueError("Malformed cursor") from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Malformed cursor")
+    return values
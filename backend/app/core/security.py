@@ -1,12 +1,24 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
 
 from jose import jwt, jws
 from passlib.context import CryptContext
 
 from .config import settings
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# min == max == default, so any hash made with different rounds "needs update"
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=settings.PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=settings.PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__max_rounds=settings.PASSWORD_HASH_ROUNDS,
+)
 
 ALGORITHM = "HS256"
 
@@ -31,15 +43,27 @@ def verify_jws_token(token: str) -> dict:
 
 
 def create_access_token(
-    subject: Union[str, Any], expires_delta: timedelta = None
+    subject: Union[str, Any], expires_delta: timedelta = None, claims: Optional[dict] = None
 ) -> str:
+    """
+    ``claims`` are extra entries for the payload, e.g. ``Principal.claims()``
+    so the token names the user id, role and merchants.
+    """
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
+    to_encode = {
+        **(claims or {}),
+        "exp": expire,
+        # Not truncated to whole seconds, so revocation can tell apart
+        # tokens issued just before and just after it
+        "iat": time.time(),
+        "sub": str(subject),
+        "type": "access",
+    }
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -56,4 +80,53 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash); new_hash is set when the stored hash uses outdated parameters."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+
+def start_hash_pool() -> None:
+    """Start the hashing processes. Called at app startup, paired with ``shutdown_hash_pool``."""
+    global _hash_pool
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # Spawned rather than forked: a fork of the running server would
+            # copy its threads' held locks and open sockets into the children
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+
+async def _in_hash_pool(function, *args):
+    # Bounded: at most PASSWORD_HASH_WORKERS hashes run at once, the rest queue
+    # without holding a request thread. Until the pool is started (scripts,
+    # tests) hashes run on the loop's default executor.
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, function, *args)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _in_hash_pool(get_password_hash, password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return await _in_hash_pool(verify_and_update_password, plain_password, hashed_password)
+
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=False, cancel_futures=True)
+            _hash_pool = None
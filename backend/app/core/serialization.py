@@ -0,0 +1,23 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional, json works everywhere
+    orjson = None
+
+
+def dumps(obj: Any) -> str:
+    """
+    Encode to a JSON string with orjson when it is installed, falling back to
+    the stdlib. UUIDs, datetimes and anything else unknown go through str().
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode()
+    return json.dumps(obj, default=str, separators=(",", ":"))
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,82 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .config import settings
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of verified access-token claims, keyed by the SHA-256 of the
+    token so raw tokens are never held. An entry lives until the token's own
+    ``exp``, so a cached token is never accepted past the point ``jwt.decode``
+    would have rejected it.
+
+    Revocation is per process: ``revoke_subject`` rejects every token of a
+    subject issued before the call, whether it is cached or decoded fresh.
+    Single tokens are not revocable. A revocation is forgotten once
+    ``revocation_ttl`` (the access-token lifetime) has passed, since every
+    token it covers has expired by then.
+    """
+
+    def __init__(self, max_entries: int, revocation_ttl: float):
+        self.max_entries = max_entries
+        self.revocation_ttl = revocation_ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        # Oldest revocation first
+        self._revoked_before: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        if self.max_entries <= 0 or "exp" not in claims:
+            return
+        with self._lock:
+            self._entries[self._key(token)] = (float(claims["exp"]), claims)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, claims: dict) -> bool:
+        revoked_before = self._revoked_before.get(claims.get("sub"))
+        # "iat" carries sub-second precision, so a token issued just after the
+        # revocation is accepted. Tokens without "iat" count as 0.
+        return revoked_before is not None and float(claims.get("iat") or 0) < revoked_before
+
+    def revoke_subject(self, subject: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._revoked_before.pop(subject, None)
+            self._revoked_before[subject] = now
+            while next(iter(self._revoked_before.values())) < now - self.revocation_ttl:
+                self._revoked_before.popitem(last=False)
+            for key in [key for key, (_, claims) in self._entries.items() if claims.get("sub") == subject]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._revoked_before.clear()
+
+
+token_cache = VerifiedTokenCache(
+    max_entries=settings.TOKEN_CACHE_SIZE,
+    revocation_ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
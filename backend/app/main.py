@@ -1,7 +1,9 @@
-from fastapi import FastAPI, Request
+import secrets
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, Response
 
 from .api.v1.auth import router as auth_router
 from .api.v1.customer import router as customer_router
@@ -14,19 +16,17 @@ from .api.v1.websocket import router as websocket_router
 from .api.v1.reward_logic import router as reward_logic_router
 from .api.v1.developer import router as developer_router
 from .core.config import settings
-from .db.session import SessionLocal
+from .core.metrics import CONTENT_TYPE_LATEST, render_latest
+from .db.session import SessionLocal, engine
 from .services.auth import get_user_by_email, create_user
 from .schemas.user import UserCreate
 from .models.user import UserRole
-# from .core.limiter import limiter
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
-# app.state.limiter = limiter
-
 # Mount static files
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -36,6 +36,8 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Keyset-paginated list endpoints return the next page's cursor here
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(auth_router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
@@ -78,6 +80,63 @@ def ensure_developer_user():
     finally:
         db.close()
 
+@app.on_event("startup")
+async def start_websocket_sender():
+    from .api.v1.websocket import manager
+
+    manager.bind_loop()
+
+
+@app.on_event("startup")
+def resume_purges():
+    """Finish purges a previous process left behind, off the startup path."""
+    import threading
+
+    from .services.purge import resume_purge_jobs
+
+    threading.Thread(target=resume_purge_jobs, args=(engine,), daemon=True).start()
+
+
+@app.on_event("startup")
+def start_last_login_flusher():
+    import threading
+
+    from .services.last_login import last_login_buffer
+
+    threading.Thread(
+        target=last_login_buffer.run, args=(engine, settings.LAST_LOGIN_FLUSH_SECONDS), daemon=True
+    ).start()
+
+
+@app.on_event("startup")
+def start_password_hash_pool():
+    from .core.security import start_hash_pool
+
+    start_hash_pool()
+
+
+@app.on_event("shutdown")
+async def stop_websocket_manager():
+    from .api.v1.websocket import manager
+
+    await manager.stop()
+
+
+@app.on_event("shutdown")
+def stop_password_hash_pool():
+    from .core.security import shutdown_hash_pool
+
+    shutdown_hash_pool()
+
+
+@app.on_event("shutdown")
+def flush_last_logins():
+    from .services.last_login import last_login_buffer
+
+    last_login_buffer.stop()
+    last_login_buffer.flush(engine)
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     response = PlainTextResponse("Internal Server Error", status_code=500)
@@ -89,3 +148,13 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    # Internal only: hidden unless METRICS_TOKEN is set, and then it must be sent
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    supplied = request.headers.get("authorization", "")
+    if not settings.METRICS_TOKEN or not secrets.compare_digest(supplied.encode(), expected.encode()):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,12 +1,15 @@
 # from .analytics_snapshot import AnalyticsSnapshot
 from .audit_log import AuditLog
 from .customer_program_membership import CustomerProgramMembership, JoinedVia
+from .customer_segment import CustomerSegment
 from .customer_stats import CustomerStats
 from .ledger_entry import LedgerEntry, LedgerEntryType
 from .location import Location
 from .loyalty_program import LoyaltyProgram
 from .merchant import Merchant
+from .merchant_customer_summary import MerchantCustomerSummary
 # from .merchant_settings import MerchantSettings
+from .purge_job import PurgeJob, PurgeJobStatus
 from .reward import Reward, RewardStatus, RedeemCode
 from .stamp import Stamp
 from .user import User, UserRole
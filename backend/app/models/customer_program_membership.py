@@ -2,9 +2,9 @@ import uuid
 from datetime import datetime
 from enum import Enum
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, event, text
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship, with_loader_criteria
 
 from ..db.base import Base
 
@@ -35,12 +35,49 @@ class CustomerProgramMembership(Base):
     current_balance: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     current_cycle: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Set when the customer leaves or is removed; the row and its history are
+    # purged later in chunks (services/purge.py)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
 
     program = relationship("LoyaltyProgram", back_populates="memberships")
     customer = relationship("User", back_populates="memberships")
     merchant = relationship("Merchant", back_populates="memberships")
 
     __table_args__ = (
-        UniqueConstraint("customer_user_id", "program_id", name="uq_membership_customer_program"),
+        # Only live memberships are unique, so a customer can rejoin while the
+        # old membership is still waiting to be purged
+        Index(
+            "uq_membership_customer_program",
+            "customer_user_id",
+            "program_id",
+            unique=True,
+            postgresql_where=text("deleted_at IS NULL"),
+            sqlite_where=text("deleted_at IS NULL"),
+        ),
         Index("ix_customer_program_memberships_program_joined", "program_id", "joined_at"),
     )
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted_memberships(execute_state):
+    """
+    Soft-deleted memberships are invisible to every ORM select, relationship
+    loads included. Bulk deletes are not filtered, so the purge job needs no
+    opt-out; a query that must see deleted rows passes
+    ``execution_options(include_deleted=True)``.
+    """
+    if (
+        execute_state.is_select
+        # Refreshing an already-loaded row must still work; relationship
+        # loads inherit the criteria from the statement that loaded the parent
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                CustomerProgramMembership,
+                lambda cls: cls.deleted_at.is_(None),
+                include_aliases=True,
+            )
+        )
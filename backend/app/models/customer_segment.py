@@ -0,0 +1,29 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, JSON, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..db.base import Base
+
+
+class CustomerSegment(Base):
+    """
+    Precomputed membership of one named segment (lapsed, near_reward,
+    regulars, ...) for one merchant, stored as a sorted array of customer
+    ids so counts and targeting never touch the ledger. Recomputed nightly
+    and, once ``stale`` is set by a stamp, redeem or leave, on next read
+    (see services/segments.py).
+    """
+
+    __tablename__ = "customer_segments"
+
+    merchant_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("merchants.id"), primary_key=True
+    )
+    name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    customer_ids: Mapped[list] = mapped_column(JSON, default=list, nullable=False)
+    member_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    stale: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
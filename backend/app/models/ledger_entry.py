@@ -42,6 +42,11 @@ class LedgerEntry(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     notes: Mapped[str] = mapped_column(Text, nullable=True)
 
+    __table_args__ = (
+        # Per-customer aggregates (lifetime stamps, last visit) for a merchant's customer list
+        Index("ix_ledger_entries_merchant_customer_created", "merchant_id", "customer_id", "created_at"),
+    )
+
     # __table_args__ = (
     #     Index("ix_ledger_entries_merchant_created", "merchant_id", "issued_at"),
     #     Index("ix_ledger_entries_type_created", "entry_type", "issued_at"),
@@ -0,0 +1,39 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, JSON
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..db.base import Base
+
+
+class MerchantCustomerSummary(Base):
+    """
+    Read model behind the merchant customers screen: one row per customer
+    per merchant, kept current by the stamp, revoke, redeem and leave paths
+    (see services/customer_summary.py) instead of being re-aggregated from
+    ledger_entries on every load.
+    """
+
+    __tablename__ = "merchant_customer_summary"
+
+    merchant_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("merchants.id"), primary_key=True
+    )
+    customer_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True
+    )
+    lifetime_stamps: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    current_stamps: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    visits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    redemptions: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_visit_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    # {program_id: current balance} for each program the customer belongs to
+    programs: Mapped[dict] = mapped_column(JSON, default=dict, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_merchant_customer_summary_last_visit", "merchant_id", "last_visit_at"),
+        Index("ix_merchant_customer_summary_lifetime", "merchant_id", "lifetime_stamps"),
+    )
@@ -0,0 +1,48 @@
+import uuid
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import DateTime, ForeignKey, Index, JSON, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..db.base import Base
+
+
+class PurgeJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class PurgeJob(Base):
+    """
+    Background removal of soft-deleted memberships and their history
+    (rewards, stamps, ledger entries), deleted in bounded chunks by
+    services/purge.py. ``progress`` counts rows deleted per table.
+    """
+
+    __tablename__ = "purge_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    merchant_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("merchants.id"), nullable=False
+    )
+    customer_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
+    )
+    requested_by: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
+    membership_ids: Mapped[list] = mapped_column(JSON, default=list, nullable=False)
+    status: Mapped[PurgeJobStatus] = mapped_column(String, nullable=False, default=PurgeJobStatus.PENDING)
+    progress: Mapped[dict] = mapped_column(JSON, default=dict, nullable=False)
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_purge_jobs_status_created", "status", "created_at"),
+    )
@@ -46,6 +46,8 @@ class Reward(Base):
     __table_args__ = (
         UniqueConstraint("enrollment_id", "cycle", name="uq_rewards_enrollment_cycle"),
         Index("ix_rewards_merchant_redeemed_at", "merchant_id", "redeemed_at"),
+        # Merchant rewards list (status filter, reached_at order) and per-status counts
+        Index("ix_rewards_merchant_status_reached", "merchant_id", "status", "reached_at"),
     )
 
 
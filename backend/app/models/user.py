@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from enum import Enum
 
-from sqlalchemy import Boolean, Column, DateTime, String
+from sqlalchemy import DDL, Boolean, Column, DateTime, String, event
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -34,3 +34,26 @@ class User(Base):
 
     merchants = relationship("Merchant", back_populates="owner", cascade="all, delete-orphan")
     memberships = relationship("CustomerProgramMembership", back_populates="customer")
+
+
+# Trigram full-text index for merchant customer search on SQLite (Postgres
+# uses pg_trgm GIN indexes from migration 035). External-content table over
+# users, kept in sync by triggers.
+SQLITE_CUSTOMER_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customer_search_fts USING fts5("
+    "name, email, phone, content='users', content_rowid='rowid', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO customer_search_fts(rowid, name, email, phone) "
+    "VALUES (new.rowid, new.name, new.email, new.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO customer_search_fts(customer_search_fts, rowid, name, email, phone) "
+    "VALUES ('delete', old.rowid, old.name, old.email, old.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF name, email, phone ON users BEGIN "
+    "INSERT INTO customer_search_fts(customer_search_fts, rowid, name, email, phone) "
+    "VALUES ('delete', old.rowid, old.name, old.email, old.phone); "
+    "INSERT INTO customer_search_fts(rowid, name, email, phone) "
+    "VALUES (new.rowid, new.name, new.email, new.phone); END",
+)
+
+for _statement in SQLITE_CUSTOMER_SEARCH_DDL:
+    event.listen(User.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
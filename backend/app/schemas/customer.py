@@ -60,6 +60,7 @@ class CustomerDetail(BaseModel):
     programs: List[CustomerProgram]
     redemption_history: List[CustomerReward]
     recent_activity: List[CustomerActivity]
+    recent_activity_next_cursor: Optional[str] = None
     reward_summary: CustomerRewardSummary
     insights: CustomerInsights
     lifetime_total_visits: int
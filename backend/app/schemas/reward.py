@@ -58,6 +58,7 @@ class RedeemStampsRequest(BaseModel):
 
 class CustomerRedemption(BaseModel):
     id: str
+    program_id: Optional[str] = None
     code: str
     status: str
     amount: str
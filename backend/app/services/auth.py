@@ -3,8 +3,11 @@ from uuid import uuid4
 from sqlalchemy.orm import Session
 
 from ..core.security import get_password_hash, verify_password
+from ..core.token_cache import token_cache
 from ..models.user import User, UserRole
 from ..schemas.user import UserCreate, UserUpdate
+from .customer_search import SEARCHABLE_FIELDS, invalidate_customer_search
+from .principal_cache import principal_cache
 
 
 def _normalize_role(role: str | UserRole | None) -> UserRole:
@@ -26,8 +29,9 @@ def get_user_by_email(db: Session, email: str) -> User | None:
     return db.query(User).filter(User.email == email).first()
 
 
-def create_user(db: Session, user: UserCreate) -> User:
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: UserCreate, password_hash: str | None = None) -> User:
+    # Callers on the event loop hash in the pool first and pass the result
+    hashed_password = password_hash or get_password_hash(user.password)
     role_value = _normalize_role(user.role)
     db_user = User(
         id=uuid4(),
@@ -58,7 +62,8 @@ def update_last_login(db: Session, user: User) -> None:
 
 
 def update_user(db: Session, user: User, updates: UserUpdate) -> User:
-    for key, value in updates.model_dump(exclude_unset=True).items():
+    changes = updates.model_dump(exclude_unset=True)
+    for key, value in changes.items():
         if key == "password" and value:
             setattr(user, "password_hash", get_password_hash(value))
         elif key != "password":
@@ -68,4 +73,10 @@ def update_user(db: Session, user: User, updates: UserUpdate) -> User:
                 setattr(user, key, value)
     db.commit()
     db.refresh(user)
+    if SEARCHABLE_FIELDS.intersection(changes):
+        invalidate_customer_search(db, user.id)
+    principal_cache.invalidate_user(user.id)
+    if changes.get("password"):
+        # Sessions opened with the old password end here (in this process)
+        token_cache.revoke_subject(user.email)
     return user
@@ -0,0 +1,274 @@
+import bisect
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, or_, select, text
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models import MerchantCustomerSummary, User
+
+# User columns that feed the index; changing any of them invalidates it
+SEARCHABLE_FIELDS = frozenset({"name", "email", "phone", "avatar_url"})
+
+# Separates fields in the substring haystack; never typed into a search box
+_SEP = "\x00"
+
+# Queries made of digits and phone punctuation are also matched, as bare
+# digits, against phone numbers
+_PHONE_QUERY = re.compile(r"^\+?[\d\s().-]*\d[\d\s().-]*$")
+
+
+@dataclass(frozen=True)
+class CustomerHit:
+    id: str
+    name: str
+    email: str
+    phone: Optional[str]
+    avatar: Optional[str]
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "name": self.name, "email": self.email, "phone": self.phone, "avatar": self.avatar}
+
+
+def _hit(row) -> CustomerHit:
+    return CustomerHit(
+        id=str(row.id),
+        name=row.name or row.email.split("@")[0],
+        email=row.email,
+        phone=row.phone,
+        avatar=row.avatar_url,
+    )
+
+
+def _digits(value: str) -> str:
+    return "".join(ch for ch in value if ch.isdigit())
+
+
+def _tokens(hit: CustomerHit) -> set:
+    name = hit.name.lower()
+    email = hit.email.lower()
+    tokens = {name, email, email.split("@")[0], *name.split()}
+    if hit.phone:
+        tokens.add(_digits(hit.phone))
+    tokens.discard("")
+    return tokens
+
+
+class MerchantSearchIndex:
+    """
+    Prefix and substring index over one merchant's customers.
+
+    Prefix lookups bisect a sorted token list (name words, full name, email,
+    email local part, phone digits). Substring lookups run ``str.find`` over
+    one lowercase haystack of names and emails, and, for phone-like queries,
+    one of phone digits; both hold every customer, stay in C and are fast
+    even for 100k members.
+    """
+
+    def __init__(self, hits: List[CustomerHit]):
+        self.hits = hits
+        pairs = sorted((token, position) for position, hit in enumerate(hits) for token in _tokens(hit))
+        self.tokens = [token for token, _ in pairs]
+        self.positions = [position for _, position in pairs]
+        self.haystack, self.offsets = self._haystack(_SEP.join((hit.name, hit.email)).lower() for hit in hits)
+        self.phones, self.phone_offsets = self._haystack(_digits(hit.phone or "") for hit in hits)
+
+    @staticmethod
+    def _haystack(records) -> Tuple[str, List[int]]:
+        parts, offsets, cursor = [], [], 0
+        for record in records:
+            offsets.append(cursor)
+            parts.append(record + "\n")
+            cursor += len(record) + 1
+        return "".join(parts), offsets
+
+    @staticmethod
+    def _find_all(haystack: str, offsets: List[int], needle: str, found: Dict[int, None], limit: int) -> None:
+        position = haystack.find(needle)
+        while position != -1 and len(found) < limit:
+            record = bisect.bisect_right(offsets, position) - 1
+            found.setdefault(record)
+            # Skip to the next record so one customer is not matched twice
+            next_offset = offsets[record + 1] if record + 1 < len(offsets) else len(haystack)
+            position = haystack.find(needle, next_offset)
+
+    def search(self, query: str, limit: int) -> List[CustomerHit]:
+        query = query.lower()
+        found: Dict[int, None] = {}
+        start = bisect.bisect_left(self.tokens, query)
+        for index in range(start, len(self.tokens)):
+            if not self.tokens[index].startswith(query) or len(found) >= limit:
+                break
+            found.setdefault(self.positions[index])
+        self._find_all(self.haystack, self.offsets, query, found, limit)
+        if _PHONE_QUERY.match(query):
+            self._find_all(self.phones, self.phone_offsets, _digits(query), found, limit)
+        return [self.hits[position] for position in found]
+
+
+class CustomerSearchCache:
+    """
+    LRU of warm per-merchant indexes. Membership changes invalidate the
+    merchant's entry; the TTL bounds staleness across workers, which do
+    not share invalidations. Fills that race an invalidation are dropped,
+    as in ProgramCache.
+    """
+
+    def __init__(self, ttl_seconds: float, max_merchants: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_merchants = max_merchants
+        self.version = 0
+        self._entries: "OrderedDict[uuid.UUID, Tuple[float, MerchantSearchIndex]]" = OrderedDict()
+        self._building: set = set()
+        self._lock = threading.Lock()
+
+    def get(self, merchant_id: uuid.UUID) -> Optional[MerchantSearchIndex]:
+        with self._lock:
+            entry = self._entries.get(merchant_id)
+            if not entry:
+                return None
+            expires_at, index = entry
+            if expires_at < time.monotonic():
+                del self._entries[merchant_id]
+                return None
+            self._entries.move_to_end(merchant_id)
+            return index
+
+    def claim_build(self, merchant_id: uuid.UUID) -> bool:
+        """True if the caller should build this merchant's index (nobody else is)."""
+        with self._lock:
+            if merchant_id in self._building:
+                return False
+            self._building.add(merchant_id)
+            return True
+
+    def put(self, merchant_id: uuid.UUID, index: Optional[MerchantSearchIndex], version: int) -> None:
+        with self._lock:
+            self._building.discard(merchant_id)
+            if index is None or version != self.version:
+                return
+            self._entries[merchant_id] = (time.monotonic() + self.ttl_seconds, index)
+            self._entries.move_to_end(merchant_id)
+            while len(self._entries) > self.max_merchants:
+                self._entries.popitem(last=False)
+
+    def invalidate_merchant(self, merchant_id: uuid.UUID) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.pop(merchant_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+customer_search_cache = CustomerSearchCache(
+    ttl_seconds=settings.CUSTOMER_SEARCH_CACHE_TTL_SECONDS,
+    max_merchants=settings.CUSTOMER_SEARCH_CACHE_MERCHANTS,
+)
+
+
+def invalidate_customer_search(db: Session, customer_id: uuid.UUID) -> None:
+    """Drop the warm index of every merchant this customer belongs to."""
+    merchant_ids = db.scalars(
+        select(MerchantCustomerSummary.merchant_id).where(MerchantCustomerSummary.customer_id == customer_id)
+    )
+    for merchant_id in merchant_ids:
+        customer_search_cache.invalidate_merchant(merchant_id)
+
+
+def _customer_rows(merchant_id: uuid.UUID):
+    return (
+        select(User.id, User.name, User.email, User.phone, User.avatar_url)
+        .join(MerchantCustomerSummary, MerchantCustomerSummary.customer_id == User.id)
+        .where(MerchantCustomerSummary.merchant_id == merchant_id)
+    )
+
+
+def build_search_index(db: Session, merchant_id: uuid.UUID) -> None:
+    """Load the merchant's customers into the warm cache."""
+    version = customer_search_cache.version
+    index = None
+    try:
+        hits = [_hit(row) for row in db.execute(_customer_rows(merchant_id)).yield_per(5000)]
+        index = MerchantSearchIndex(hits)
+    finally:
+        customer_search_cache.put(merchant_id, index, version)
+
+
+def warm_search_index(bind, merchant_id: uuid.UUID) -> None:
+    """Background-task entry point: builds the index on its own session."""
+    with Session(bind=bind) as db:
+        build_search_index(db, merchant_id)
+
+
+_fts_available: Dict[str, bool] = {}
+
+
+def _has_sqlite_fts(db: Session) -> bool:
+    bind = db.get_bind()
+    key = str(bind.url)
+    if key not in _fts_available:
+        _fts_available[key] = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customer_search_fts'")
+        ).first() is not None
+    return _fts_available[key]
+
+
+def _fts_phrase(query: str) -> str:
+    return '"' + query.replace('"', '""') + '"'
+
+
+def search_customers_in_db(db: Session, merchant_id: uuid.UUID, query: str, limit: int) -> List[CustomerHit]:
+    """
+    Cold path. Postgres answers ILIKE '%q%' from the pg_trgm GIN indexes;
+    SQLite uses the trigram FTS5 table (queries of 3+ characters) and falls
+    back to prefix LIKE for shorter ones.
+    """
+    pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    prefix_first = case(
+        (or_(User.name.ilike(f"{pattern}%", escape="\\"), User.email.ilike(f"{pattern}%", escape="\\")), 0),
+        else_=1,
+    )
+    statement = _customer_rows(merchant_id)
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite" and len(query) >= 3 and _has_sqlite_fts(db):
+        statement = statement.where(
+            text(
+                "users.rowid IN (SELECT rowid FROM customer_search_fts WHERE customer_search_fts MATCH :phrase)"
+            ).bindparams(phrase=_fts_phrase(query))
+        )
+    else:
+        like = f"{pattern}%" if dialect == "sqlite" and len(query) < 3 else f"%{pattern}%"
+        statement = statement.where(
+            or_(
+                User.name.ilike(like, escape="\\"),
+                User.email.ilike(like, escape="\\"),
+                User.phone.ilike(like, escape="\\"),
+            )
+        )
+    statement = statement.order_by(prefix_first, User.name, User.email).limit(limit)
+    return [_hit(row) for row in db.execute(statement)]
+
+
+def search_customers(
+    db: Session, merchant_id: uuid.UUID, query: str, limit: int = 20
+) -> Tuple[List[CustomerHit], bool]:
+    """
+    Top matches for ``query`` among the merchant's customers. Returns the
+    hits and whether the caller should warm the index in the background.
+    """
+    query = query.strip()
+    if not query:
+        return [], False
+    index = customer_search_cache.get(merchant_id)
+    if index is not None:
+        return index.search(query, limit), False
+    return search_customers_in_db(db, merchant_id, query, limit), customer_search_cache.claim_build(merchant_id)
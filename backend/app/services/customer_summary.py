@@ -0,0 +1,230 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, func, insert
+from sqlalchemy.orm import Session
+
+from ..models import (
+    CustomerProgramMembership,
+    LedgerEntry,
+    LedgerEntryType,
+    MerchantCustomerSummary,
+    Reward,
+    RewardStatus,
+)
+from .customer_search import customer_search_cache
+from .segments import mark_segments_stale
+
+_EARN_AMOUNT = case((LedgerEntry.entry_type == LedgerEntryType.EARN, LedgerEntry.amount), else_=0)
+_EARN_COUNT = case((LedgerEntry.entry_type == LedgerEntryType.EARN, 1), else_=0)
+_EARN_AT = case((LedgerEntry.entry_type == LedgerEntryType.EARN, LedgerEntry.created_at), else_=None)
+
+
+def _locked_summary(
+    db: Session, merchant_id: uuid.UUID, customer_id: uuid.UUID
+) -> Optional[MerchantCustomerSummary]:
+    # Row lock held to commit, so concurrent writers for one customer take
+    # turns. Flushed first so pending balance changes are visible to
+    # _set_progress and unflushed summary changes are not reloaded over.
+    db.flush()
+    return db.get(
+        MerchantCustomerSummary,
+        (merchant_id, customer_id),
+        with_for_update=True,
+        populate_existing=True,
+    )
+
+
+def _set_progress(db: Session, summary: MerchantCustomerSummary) -> None:
+    """
+    Recompute per-program balances from the memberships table inside the
+    caller's transaction, so no other writer's balance is overwritten with a
+    stale copy of the JSON column.
+    """
+    memberships = (
+        db.query(CustomerProgramMembership.program_id, CustomerProgramMembership.current_balance)
+        .filter(
+            CustomerProgramMembership.merchant_id == summary.merchant_id,
+            CustomerProgramMembership.customer_user_id == summary.customer_id,
+        )
+        .all()
+    )
+    summary.programs = {str(program_id): balance or 0 for program_id, balance in memberships}
+    summary.current_stamps = sum(summary.programs.values())
+
+
+def refresh_customer_summary(
+    db: Session, merchant_id: uuid.UUID, customer_id: uuid.UUID
+) -> Optional[MerchantCustomerSummary]:
+    """
+    Recompute one summary row from memberships, ledger entries and rewards.
+    Deletes the row once the customer has no memberships left with the
+    merchant. The caller commits.
+    """
+    db.flush()
+    mark_segments_stale(db, merchant_id)
+    summary = db.get(MerchantCustomerSummary, (merchant_id, customer_id))
+    memberships = (
+        db.query(CustomerProgramMembership.program_id, CustomerProgramMembership.current_balance)
+        .filter(
+            CustomerProgramMembership.merchant_id == merchant_id,
+            CustomerProgramMembership.customer_user_id == customer_id,
+        )
+        .all()
+    )
+    if not memberships:
+        if summary is not None:
+            db.delete(summary)
+            customer_search_cache.invalidate_merchant(merchant_id)
+        return None
+
+    lifetime_stamps, visits, last_visit_at = (
+        db.query(
+            func.coalesce(func.sum(_EARN_AMOUNT), 0),
+            func.coalesce(func.sum(_EARN_COUNT), 0),
+            func.max(_EARN_AT),
+        )
+        .filter(LedgerEntry.merchant_id == merchant_id, LedgerEntry.customer_id == customer_id)
+        .one()
+    )
+    redemptions = (
+        db.query(func.count(Reward.id))
+        .filter(
+            Reward.merchant_id == merchant_id,
+            Reward.customer_id == customer_id,
+            Reward.status == RewardStatus.REDEEMED,
+        )
+        .scalar()
+    )
+
+    if summary is None:
+        summary = MerchantCustomerSummary(merchant_id=merchant_id, customer_id=customer_id)
+        db.add(summary)
+        customer_search_cache.invalidate_merchant(merchant_id)
+    summary.programs = {str(program_id): balance for program_id, balance in memberships}
+    summary.current_stamps = sum(balance for _, balance in memberships)
+    summary.lifetime_stamps = int(lifetime_stamps or 0)
+    summary.visits = int(visits or 0)
+    summary.redemptions = redemptions or 0
+    summary.last_visit_at = last_visit_at
+    return summary
+
+
+def get_customer_summary(
+    db: Session, merchant_id: uuid.UUID, customer_id: uuid.UUID
+) -> Optional[MerchantCustomerSummary]:
+    """Summary row for one customer, built on first use if the backfill has not reached it."""
+    summary = db.get(MerchantCustomerSummary, (merchant_id, customer_id))
+    if summary is None:
+        summary = refresh_customer_summary(db, merchant_id, customer_id)
+        db.commit()
+    return summary
+
+
+def record_membership(db: Session, membership: CustomerProgramMembership) -> None:
+    """A customer joined one of the merchant's programs."""
+    summary = _locked_summary(db, membership.merchant_id, membership.customer_user_id)
+    if summary is None:
+        refresh_customer_summary(db, membership.merchant_id, membership.customer_user_id)
+        return
+    _set_progress(db, summary)
+    mark_segments_stale(db, membership.merchant_id)
+
+
+def record_ledger_entry(db: Session, entry: LedgerEntry) -> None:
+    """
+    Fold a new ledger entry, and the membership balance it changed, into the
+    customer's summary. Counters are updated with SQL expressions so
+    concurrent scans for the same customer do not lose increments.
+    """
+    summary = _locked_summary(db, entry.merchant_id, entry.customer_id)
+    if summary is None:
+        # No row yet (new customer or not backfilled): build it, entry included
+        refresh_customer_summary(db, entry.merchant_id, entry.customer_id)
+        return
+    if entry.entry_type == LedgerEntryType.EARN:
+        summary.lifetime_stamps = MerchantCustomerSummary.lifetime_stamps + entry.amount
+        summary.visits = MerchantCustomerSummary.visits + 1
+        summary.last_visit_at = entry.created_at or datetime.utcnow()
+    _set_progress(db, summary)
+    mark_segments_stale(db, entry.merchant_id)
+    db.flush()
+
+
+def record_reward_redeemed(db: Session, reward: Reward) -> None:
+    """A reward moved to REDEEMED, along with any enrollment balance change."""
+    summary = _locked_summary(db, reward.merchant_id, reward.customer_id)
+    if summary is None:
+        refresh_customer_summary(db, reward.merchant_id, reward.customer_id)
+        return
+    summary.redemptions = MerchantCustomerSummary.redemptions + 1
+    _set_progress(db, summary)
+    mark_segments_stale(db, reward.merchant_id)
+    db.flush()
+
+
+def rebuild_customer_summaries(
+    db: Session, merchant_id: Optional[uuid.UUID] = None, batch_size: int = 1000
+) -> int:
+    """
+    Backfill the read model from source tables with three grouped queries,
+    for one merchant or (by default) all of them. Returns the row count.
+    """
+    existing = db.query(MerchantCustomerSummary)
+    memberships = db.query(
+        CustomerProgramMembership.merchant_id,
+        CustomerProgramMembership.customer_user_id,
+        CustomerProgramMembership.program_id,
+        CustomerProgramMembership.current_balance,
+    )
+    ledger = db.query(
+        LedgerEntry.merchant_id,
+        LedgerEntry.customer_id,
+        func.coalesce(func.sum(_EARN_AMOUNT), 0),
+        func.coalesce(func.sum(_EARN_COUNT), 0),
+        func.max(_EARN_AT),
+    ).group_by(LedgerEntry.merchant_id, LedgerEntry.customer_id)
+    redeemed = (
+        db.query(Reward.merchant_id, Reward.customer_id, func.count(Reward.id))
+        .filter(Reward.status == RewardStatus.REDEEMED)
+        .group_by(Reward.merchant_id, Reward.customer_id)
+    )
+    if merchant_id is not None:
+        existing = existing.filter(MerchantCustomerSummary.merchant_id == merchant_id)
+        memberships = memberships.filter(CustomerProgramMembership.merchant_id == merchant_id)
+        ledger = ledger.filter(LedgerEntry.merchant_id == merchant_id)
+        redeemed = redeemed.filter(Reward.merchant_id == merchant_id)
+
+    rows: dict = {}
+    for row_merchant_id, customer_id, program_id, balance in memberships.yield_per(batch_size):
+        row = rows.setdefault((row_merchant_id, customer_id), {
+            "merchant_id": row_merchant_id,
+            "customer_id": customer_id,
+            "lifetime_stamps": 0,
+            "current_stamps": 0,
+            "visits": 0,
+            "redemptions": 0,
+            "last_visit_at": None,
+            "programs": {},
+        })
+        row["programs"][str(program_id)] = balance
+        row["current_stamps"] += balance
+    for row_merchant_id, customer_id, lifetime_stamps, visits, last_visit_at in ledger:
+        row = rows.get((row_merchant_id, customer_id))
+        if row is not None:
+            row.update(lifetime_stamps=int(lifetime_stamps), visits=int(visits), last_visit_at=last_visit_at)
+    for row_merchant_id, customer_id, count in redeemed:
+        row = rows.get((row_merchant_id, customer_id))
+        if row is not None:
+            row["redemptions"] = count
+
+    existing.delete(synchronize_session=False)
+    customer_search_cache.clear()
+    values = list(rows.values())
+    now = datetime.utcnow()
+    for start in range(0, len(values), batch_size):
+        chunk = [{**row, "updated_at": now} for row in values[start:start + batch_size]]
+        db.execute(insert(MerchantCustomerSummary), chunk)
+    db.commit()
+    return len(values)
@@ -0,0 +1,208 @@
+import csv
+import io
+import uuid
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.serialization import dumps
+from ..core.timezone import format_local
+from ..models import (
+    CustomerStats,
+    LedgerEntry,
+    LoyaltyProgram,
+    MerchantCustomerSummary,
+    Reward,
+    RewardStatus,
+    User,
+)
+
+EXPORT_FORMATS = ("csv", "ndjson")
+
+CUSTOMER_COLUMNS = (
+    "id", "name", "email", "phone", "current_stamps", "lifetime_stamps", "visits",
+    "redemptions", "programs", "last_visit_at", "lifetime_total_revenue",
+)
+LEDGER_COLUMNS = (
+    "id", "created_at", "customer_id", "customer_email", "program_id", "program_name",
+    "entry_type", "amount", "notes",
+)
+REWARD_COLUMNS = (
+    "id", "program_id", "program_name", "customer_id", "customer_email", "status", "cycle",
+    "reached_at", "redeemed_at", "redeem_expires_at", "voucher_code",
+)
+
+EXPORTED_REWARD_STATUSES = (RewardStatus.REDEEMABLE.value, RewardStatus.REDEEMED.value, RewardStatus.EXPIRED.value)
+
+# Rows fetched per round trip; the driver keeps only this many in memory
+BATCH_SIZE = 1000
+# Flush encoded output roughly this often so chunks stay reasonably sized
+CHUNK_BYTES = 64 * 1024
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return format_local(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value.value if hasattr(value, "value") else value
+
+
+def iter_customers(db: Session, merchant_id: uuid.UUID) -> Iterator[dict]:
+    statement = (
+        select(
+            User.id,
+            User.name,
+            User.email,
+            User.phone,
+            MerchantCustomerSummary.current_stamps,
+            MerchantCustomerSummary.lifetime_stamps,
+            MerchantCustomerSummary.visits,
+            MerchantCustomerSummary.redemptions,
+            MerchantCustomerSummary.programs,
+            MerchantCustomerSummary.last_visit_at,
+            CustomerStats.total_revenue,
+        )
+        .join(MerchantCustomerSummary, MerchantCustomerSummary.customer_id == User.id)
+        .outerjoin(CustomerStats, CustomerStats.customer_id == User.id)
+        .where(MerchantCustomerSummary.merchant_id == merchant_id)
+        .order_by(User.id)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    for row in db.execute(statement):
+        yield {
+            "id": str(row.id),
+            "name": row.name or row.email.split("@")[0],
+            "email": row.email,
+            "phone": row.phone,
+            "current_stamps": row.current_stamps,
+            "lifetime_stamps": row.lifetime_stamps,
+            "visits": row.visits,
+            "redemptions": row.redemptions,
+            "programs": len(row.programs or {}),
+            "last_visit_at": _value(row.last_visit_at),
+            "lifetime_total_revenue": float(row.total_revenue or 0),
+        }
+
+
+def iter_ledger(
+    db: Session,
+    merchant_id: uuid.UUID,
+    *,
+    customer_id: Optional[uuid.UUID] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Iterator[dict]:
+    statement = (
+        select(
+            LedgerEntry.id,
+            LedgerEntry.created_at,
+            LedgerEntry.customer_id,
+            User.email,
+            LedgerEntry.program_id,
+            LoyaltyProgram.name,
+            LedgerEntry.entry_type,
+            LedgerEntry.amount,
+            LedgerEntry.notes,
+        )
+        .join(User, User.id == LedgerEntry.customer_id)
+        .join(LoyaltyProgram, LoyaltyProgram.id == LedgerEntry.program_id)
+        .where(LedgerEntry.merchant_id == merchant_id)
+    )
+    if customer_id is not None:
+        statement = statement.where(LedgerEntry.customer_id == customer_id)
+    if since is not None:
+        statement = statement.where(LedgerEntry.created_at >= since)
+    if until is not None:
+        statement = statement.where(LedgerEntry.created_at < until)
+    statement = statement.order_by(LedgerEntry.created_at, LedgerEntry.id).execution_options(yield_per=BATCH_SIZE)
+    for row in db.execute(statement):
+        yield dict(zip(LEDGER_COLUMNS, (_value(value) for value in row)))
+
+
+def iter_rewards(db: Session, merchant_id: uuid.UUID, *, status: Optional[str] = None) -> Iterator[dict]:
+    statement = (
+        select(
+            Reward.id,
+            Reward.program_id,
+            LoyaltyProgram.name,
+            Reward.customer_id,
+            User.email,
+            Reward.status,
+            Reward.cycle,
+            Reward.reached_at,
+            Reward.redeemed_at,
+            Reward.redeem_expires_at,
+            Reward.voucher_code,
+        )
+        .join(User, User.id == Reward.customer_id)
+        .join(LoyaltyProgram, LoyaltyProgram.id == Reward.program_id)
+        .where(
+            Reward.merchant_id == merchant_id,
+            Reward.status.in_([status] if status else EXPORTED_REWARD_STATUSES),
+        )
+        .order_by(Reward.reached_at.desc(), Reward.id)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    for row in db.execute(statement):
+        yield dict(zip(REWARD_COLUMNS, (_value(value) for value in row)))
+
+
+def encode_csv(rows: Iterable[dict], columns: tuple) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(rows: Iterable[dict]) -> Iterator[bytes]:
+    parts, size = [], 0
+    for row in rows:
+        line = dumps(row) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(parts).encode()
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode()
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # wbits=31 writes a gzip header and trailer, so the output is a .gz file
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(
+    bind,
+    rows_for,
+    columns: tuple,
+    export_format: str,
+    compress: bool = False,
+) -> Iterator[bytes]:
+    """
+    Encoded export body. ``rows_for(db)`` produces the rows; it runs on a
+    session of its own, opened when streaming starts and closed when it
+    ends, so the request's session can be released straight away.
+    """
+    with Session(bind=bind) as db:
+        rows = rows_for(db)
+        chunks = encode_csv(rows, columns) if export_format == "csv" else encode_ndjson(rows)
+        if compress:
+            chunks = gzip_chunks(chunks)
+        yield from chunks
@@ -0,0 +1,76 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+_users = User.__table__
+# Core executemany: unlike the ORM bulk update it does not check matched row
+# counts, so a user deleted since their login is skipped instead of failing
+# the whole batch
+_SET_LAST_LOGIN = (
+    update(_users).where(_users.c.id == bindparam("uid")).values(last_login_at=bindparam("ts"))
+)
+
+
+class LastLoginBuffer:
+    """
+    Write-behind buffer for ``users.last_login_at``. Logins only record the
+    timestamp in memory; ``flush`` writes everything pending in one batched
+    UPDATE. Only the latest login per user is kept, and a crash loses at
+    most one flush interval of timestamps.
+    """
+
+    def __init__(self):
+        self._pending: Dict[UUID, datetime] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def record(self, user_id: UUID, at: Optional[datetime] = None) -> None:
+        with self._lock:
+            self._pending[user_id] = at or datetime.utcnow()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self, bind) -> int:
+        """Write every pending timestamp; returns how many were flushed."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            with Session(bind=bind) as db:
+                db.execute(
+                    _SET_LAST_LOGIN,
+                    [{"uid": user_id, "ts": at} for user_id, at in pending.items()],
+                )
+                db.commit()
+        except Exception:
+            # Put them back unless a newer login was recorded meanwhile
+            with self._lock:
+                for user_id, at in pending.items():
+                    self._pending.setdefault(user_id, at)
+            raise
+        return len(pending)
+
+    def run(self, bind, interval_seconds: float) -> None:
+        """Flush every ``interval_seconds`` until ``stop`` is called."""
+        while not self._stop.wait(interval_seconds):
+            try:
+                self.flush(bind)
+            except Exception as exc:
+                logger.error(f"Last-login flush failed: {exc}")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+last_login_buffer = LastLoginBuffer()
@@ -4,6 +4,7 @@ from uuid import UUID
 
 from ..models.loyalty_program import LoyaltyProgram
 from ..schemas.loyalty_program import LoyaltyProgramCreate, LoyaltyProgramUpdate
+from .program_cache import program_cache
 
 
 def get_loyalty_program(db: Session, program_id: UUID) -> LoyaltyProgram | None:
@@ -50,6 +51,7 @@ def update_loyalty_program(db: Session, program_id: UUID, program_update: Loyalt
                 setattr(db_program, field, value)
         db.commit()
         db.refresh(db_program)
+        program_cache.invalidate_program(program_id)
     return db_program
 
 
@@ -58,6 +60,7 @@ def delete_loyalty_program(db: Session, program_id: UUID) -> bool:
     if db_program:
         db.delete(db_program)
         db.commit()
+        program_cache.invalidate_program(program_id)
         return True
     return False
 
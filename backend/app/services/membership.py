@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session, joinedload, joinedload
+from sqlalchemy.orm import Session, joinedload
 from uuid import UUID
 from datetime import datetime, timedelta, timezone
 import secrets
@@ -10,6 +10,8 @@ from ..models.reward import Reward
 from ..schemas.customer_program_membership import CustomerProgramMembershipCreate, CustomerProgramMembershipWithDetails
 from ..schemas.ledger_entry import LedgerEntryCreate
 from ..core.config import settings
+from ..core.timezone import now_local_iso
+from .customer_summary import record_ledger_entry, record_membership, refresh_customer_summary
 
 
 def get_membership(db: Session, membership_id: UUID) -> CustomerProgramMembership | None:
@@ -52,6 +54,8 @@ def create_membership(db: Session, membership: CustomerProgramMembershipCreate)
         current_cycle=membership.current_cycle,
     )
     db.add(db_membership)
+    db.flush()
+    record_membership(db, db_membership)
     db.commit()
     db.refresh(db_membership)
     return db_membership
@@ -60,8 +64,9 @@ def create_membership(db: Session, membership: CustomerProgramMembershipCreate)
 def update_membership_balance(db: Session, membership_id: UUID, new_balance: int) -> CustomerProgramMembership | None:
     membership = db.query(CustomerProgramMembership).filter(CustomerProgramMembership.id == membership_id).first()
     if membership:
-        old_balance = membership.current_balance
         membership.current_balance = new_balance
+        # No ledger entry here, so rebuild the customer's summary row directly
+        refresh_customer_summary(db, membership.merchant_id, membership.customer_user_id)
         db.commit()
         db.refresh(membership)
         # Note: Ledger entry should be created separately
@@ -92,6 +97,8 @@ def create_ledger_entry(db: Session, entry: LedgerEntryCreate) -> LedgerEntry:
         created_at=datetime.utcnow(),
     )
     db.add(db_entry)
+    db.flush()
+    record_ledger_entry(db, db_entry)
     db.commit()
     db.refresh(db_entry)
     return db_entry
@@ -108,8 +115,8 @@ def earn_stamps(
     membership = get_membership(db, membership_id)
     if membership:
         membership.current_balance += amount
-        db.commit()
-        db.refresh(membership)
+        # Committed with the ledger entry and summary update
+        db.flush()
         # Write to ledger
         create_ledger_entry(db, LedgerEntryCreate(
             membership_id=membership_id,
@@ -126,8 +133,7 @@ def redeem_stamps(db: Session, membership_id: UUID, amount: int, tx_id: str | No
     membership = get_membership(db, membership_id)
     if membership and membership.current_balance >= amount:
         membership.current_balance -= amount
-        db.commit()
-        db.refresh(membership)
+        db.flush()
         # Write to ledger
         create_ledger_entry(db, LedgerEntryCreate(
             membership_id=membership_id,
@@ -143,8 +149,7 @@ def adjust_balance(db: Session, membership_id: UUID, adjustment: int, notes: str
     membership = get_membership(db, membership_id)
     if membership:
         membership.current_balance += adjustment
-        db.commit()
-        db.refresh(membership)
+        db.flush()
         # Write to ledger
         create_ledger_entry(db, LedgerEntryCreate(
             membership_id=membership_id,
@@ -187,11 +192,11 @@ def redeem_stamps_with_code(db: Session, membership_id: UUID, amount: int, idemp
         jti = secrets.token_urlsafe(16)  # 22 chars
         expires_at = datetime.now(timezone.utc) + timedelta(seconds=600)
 
-        # Atomic balance reduction and cycle increment
+        # Balance, cycle, reward, ledger entry and customer summary are
+        # committed together by create_ledger_entry
         membership.current_balance -= amount
         membership.current_cycle += 1
-        db.commit()
-        db.refresh(membership)
+        db.flush()
 
         # Create reward
         reward = Reward(
@@ -205,8 +210,7 @@ def redeem_stamps_with_code(db: Session, membership_id: UUID, amount: int, idemp
             cycle=membership.current_cycle - 1  # The cycle for this reward
         )
         db.add(reward)
-        db.commit()
-        db.refresh(reward)
+        db.flush()
 
         # Write to ledger
         create_ledger_entry(db, LedgerEntryCreate(
@@ -219,9 +223,9 @@ def redeem_stamps_with_code(db: Session, membership_id: UUID, amount: int, idemp
 
         reward_description = getattr(membership.program, "reward_description", None)
 
-        # Broadcast notification to merchant
+        # Tell the merchant a code is waiting, and the customer's redemption feed it was claimed
         try:
-            from .websocket import get_websocket_manager
+            from ..api.v1.websocket import get_websocket_manager
 
             ws_manager = get_websocket_manager()
             customer_name = getattr(membership.customer, "name", None) or (
@@ -236,6 +240,16 @@ def redeem_stamps_with_code(db: Session, membership_id: UUID, amount: int, idemp
                 program_name,
                 amount,
                 jti,
+                str(reward.id),
+            )
+            ws_manager.broadcast_reward_status_sync(
+                str(membership.customer_user_id),
+                {
+                    "reward_id": str(reward.id),
+                    "program_id": str(reward.program_id),
+                    "status": reward.status,
+                    "timestamp": now_local_iso(),
+                },
             )
         except Exception as e:
             # Don't fail the redeem if WebSocket broadcast fails
@@ -248,6 +262,7 @@ def redeem_stamps_with_code(db: Session, membership_id: UUID, amount: int, idemp
             "status": "claimed",
         }
     except Exception as e:
+        db.rollback()
         print(f"Error in redeem_stamps_with_code: {e}")
         import traceback
         traceback.print_exc()
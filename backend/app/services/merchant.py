@@ -1,10 +1,12 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from uuid import UUID
 
 from ..models.merchant import Merchant
 from ..models.location import Location
 from ..schemas.merchant import MerchantCreate, MerchantUpdate
 from ..schemas.location import LocationCreate, LocationUpdate
+from .principal_cache import principal_cache
+from .program_cache import program_cache
 
 
 def get_merchant(db: Session, merchant_id: UUID) -> Merchant | None:
@@ -26,9 +28,18 @@ def create_merchant(db: Session, merchant: MerchantCreate, owner_user_id: UUID)
     db.add(db_merchant)
     db.commit()
     db.refresh(db_merchant)
+    principal_cache.invalidate_user(owner_user_id)
     return db_merchant
 
 
+def ensure_merchant_profile(db: Session, owner_user_id: UUID, merchant: MerchantCreate) -> Merchant:
+    """The owner's first merchant, created from ``merchant`` if they have none. Idempotent."""
+    merchants = get_merchants_by_owner(db, owner_user_id)
+    if merchants:
+        return merchants[0]
+    return create_merchant(db, merchant, owner_user_id)
+
+
 def update_merchant(db: Session, merchant_id: UUID, merchant_update: MerchantUpdate) -> Merchant | None:
     db_merchant = db.query(Merchant).filter(Merchant.id == merchant_id).first()
     if db_merchant:
@@ -37,14 +48,19 @@ def update_merchant(db: Session, merchant_id: UUID, merchant_update: MerchantUpd
             setattr(db_merchant, field, value)
         db.commit()
         db.refresh(db_merchant)
+        program_cache.invalidate_merchant(merchant_id)
+        principal_cache.invalidate_user(db_merchant.owner_user_id)
     return db_merchant
 
 
 def delete_merchant(db: Session, merchant_id: UUID) -> bool:
     db_merchant = db.query(Merchant).filter(Merchant.id == merchant_id).first()
     if db_merchant:
+        owner_user_id = db_merchant.owner_user_id
         db.delete(db_merchant)
         db.commit()
+        program_cache.invalidate_merchant(merchant_id)
+        principal_cache.invalidate_user(owner_user_id)
         return True
     return False
 
@@ -68,6 +84,7 @@ def create_location(db: Session, location: LocationCreate, merchant_id: UUID) ->
     db.add(db_location)
     db.commit()
     db.refresh(db_location)
+    program_cache.invalidate_merchant(merchant_id)
     return db_location
 
 
@@ -79,14 +96,17 @@ def update_location(db: Session, location_id: UUID, location_update: LocationUpd
             setattr(db_location, field, value)
         db.commit()
         db.refresh(db_location)
+        program_cache.invalidate_merchant(db_location.merchant_id)
     return db_location
 
 
 def delete_location(db: Session, location_id: UUID) -> bool:
     db_location = db.query(Location).filter(Location.id == location_id).first()
     if db_location:
+        merchant_id = db_location.merchant_id
         db.delete(db_location)
         db.commit()
+        program_cache.invalidate_merchant(merchant_id)
         return True
     return False
 
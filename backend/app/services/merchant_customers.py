@@ -0,0 +1,257 @@
+import json
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, func, literal, or_, select
+from sqlalchemy.orm import Session
+
+from ..core.pagination import decode_cursor, encode_cursor
+from ..core.timezone import format_local
+from ..models import (
+    CustomerProgramMembership,
+    CustomerStats,
+    LedgerEntry,
+    LoyaltyProgram,
+    MerchantCustomerSummary,
+    User,
+)
+
+CUSTOMER_SORTS = ("last_visit", "lifetime_stamps", "name")
+
+# Customers who never visited sort after everyone else on last_visit
+_NEVER = datetime(1970, 1, 1)
+
+
+def _reward_threshold(program: LoyaltyProgram) -> int:
+    redeem_rule = program.redeem_rule
+    if isinstance(redeem_rule, str):
+        try:
+            redeem_rule = json.loads(redeem_rule)
+        except json.JSONDecodeError:
+            redeem_rule = {}
+    if not isinstance(redeem_rule, dict):
+        redeem_rule = {}
+    return redeem_rule.get("reward_threshold", 10)
+
+
+def _sort_key(sort: str):
+    if sort == "last_visit":
+        return func.coalesce(MerchantCustomerSummary.last_visit_at, literal(_NEVER)), True
+    if sort == "lifetime_stamps":
+        return MerchantCustomerSummary.lifetime_stamps, True
+    return func.lower(func.coalesce(User.name, User.email)), False
+
+
+def _cursor_value(sort: str, value):
+    if sort == "last_visit":
+        return datetime.fromisoformat(value)
+    if sort == "lifetime_stamps":
+        return float(value)
+    return str(value)
+
+
+def list_merchant_customers(
+    db: Session,
+    merchant_id: uuid.UUID,
+    *,
+    sort: str = "last_visit",
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    program_id: Optional[uuid.UUID] = None,
+    q: Optional[str] = None,
+    min_lifetime_stamps: Optional[int] = None,
+    last_visit_after: Optional[datetime] = None,
+    last_visit_before: Optional[datetime] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    One page of a merchant's customers and the cursor for the next page,
+    read from the merchant_customer_summary read model joined to users, so
+    the cost of a page does not depend on how many customers the merchant
+    has. Raises ValueError for a bad sort or cursor.
+    """
+    if sort not in CUSTOMER_SORTS:
+        raise ValueError(f"Unknown sort: {sort}")
+
+    programs = {
+        str(program.id): program
+        for program in db.query(LoyaltyProgram).filter(LoyaltyProgram.merchant_id == merchant_id).all()
+    }
+    if not programs:
+        return [], None
+
+    sort_key, descending = _sort_key(sort)
+    query = (
+        select(
+            User.id,
+            User.name,
+            User.email,
+            User.avatar_url,
+            MerchantCustomerSummary.current_stamps,
+            MerchantCustomerSummary.lifetime_stamps,
+            MerchantCustomerSummary.visits,
+            MerchantCustomerSummary.redemptions,
+            MerchantCustomerSummary.last_visit_at,
+            MerchantCustomerSummary.programs,
+            CustomerStats.total_revenue,
+            CustomerStats.total_visits,
+            sort_key.label("sort_key"),
+        )
+        .join(MerchantCustomerSummary, MerchantCustomerSummary.customer_id == User.id)
+        .outerjoin(CustomerStats, CustomerStats.customer_id == User.id)
+        .where(MerchantCustomerSummary.merchant_id == merchant_id)
+    )
+
+    if program_id is not None:
+        query = query.where(
+            select(CustomerProgramMembership.id)
+            .where(
+                CustomerProgramMembership.customer_user_id == User.id,
+                CustomerProgramMembership.program_id == program_id,
+            )
+            .exists()
+        )
+    if q:
+        pattern = q.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.where(
+            or_(User.name.ilike(f"%{pattern}%", escape="\\"), User.email.ilike(f"%{pattern}%", escape="\\"))
+        )
+    if min_lifetime_stamps is not None:
+        query = query.where(MerchantCustomerSummary.lifetime_stamps >= min_lifetime_stamps)
+    if last_visit_after is not None:
+        query = query.where(MerchantCustomerSummary.last_visit_at >= last_visit_after)
+    if last_visit_before is not None:
+        query = query.where(
+            or_(
+                MerchantCustomerSummary.last_visit_at.is_(None),
+                MerchantCustomerSummary.last_visit_at < last_visit_before,
+            )
+        )
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, 2)
+        last_value = _cursor_value(sort, last_value)
+        last_id = uuid.UUID(last_id)
+        if descending:
+            query = query.where(or_(sort_key < last_value, and_(sort_key == last_value, User.id < last_id)))
+        else:
+            query = query.where(or_(sort_key > last_value, and_(sort_key == last_value, User.id > last_id)))
+
+    if descending:
+        query = query.order_by(sort_key.desc(), User.id.desc())
+    else:
+        query = query.order_by(sort_key.asc(), User.id.asc())
+
+    # One extra row tells us whether there is a next page
+    rows = db.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], None
+
+    thresholds = {program_id: _reward_threshold(program) for program_id, program in programs.items()}
+    customers = []
+    for row in rows:
+        lifetime_stamps = float(row.lifetime_stamps or 0)
+        member_programs = [
+            {
+                "id": program_id,
+                "name": programs[program_id].name,
+                "progress": balance,
+                "threshold": thresholds[program_id],
+            }
+            for program_id, balance in (row.programs or {}).items()
+            if program_id in programs
+        ]
+        total_visits = row.total_visits or 0
+        total_revenue = float(row.total_revenue or 0)
+        customers.append({
+            "id": str(row.id),
+            "name": row.name or row.email.split("@")[0],
+            "email": row.email,
+            "avatar": row.avatar_url,
+            "totalStamps": row.current_stamps or 0,
+            "lifetime_stamps": lifetime_stamps,
+            "avg_stamps_per_program": round(lifetime_stamps / len(member_programs), 2) if member_programs else 0,
+            "last_visit": row.last_visit_at.isoformat() if row.last_visit_at else None,
+            "last_visit_display": row.last_visit_at.strftime('%B %d, %Y - %I:%M %p') if row.last_visit_at else None,
+            "programs": member_programs,
+            "lifetime_total_visits": row.visits or 0,
+            "lifetime_total_revenue": total_revenue,
+            "lifetime_rewards_redeemed": row.redemptions or 0,
+            "lifetime_avg_basket_size": total_revenue / total_visits if total_visits > 0 else 0.0,
+        })
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        sort_value = last.sort_key.isoformat() if isinstance(last.sort_key, datetime) else last.sort_key
+        next_cursor = encode_cursor(sort_value, str(last.id))
+    return customers, next_cursor
+
+
+def list_customer_ledger(
+    db: Session,
+    merchant_id: uuid.UUID,
+    customer_id: uuid.UUID,
+    *,
+    cursor: Optional[str] = None,
+    limit: int = 25,
+    program_id: Optional[uuid.UUID] = None,
+    program_names: Optional[dict] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    One page of a customer's ledger timeline with the merchant, newest
+    first, and the cursor for the next page. Keyset on (created_at, id) so
+    it walks ix_ledger_entries_merchant_customer_created however long the
+    history is. ``program_names`` (str program id -> name) saves a lookup
+    when the caller already has the programs. Raises ValueError for a bad
+    cursor.
+    """
+    if program_names is None:
+        program_names = {
+            str(row.id): row.name
+            for row in db.query(LoyaltyProgram.id, LoyaltyProgram.name).filter(
+                LoyaltyProgram.merchant_id == merchant_id
+            )
+        }
+
+    query = select(LedgerEntry).where(
+        LedgerEntry.merchant_id == merchant_id,
+        LedgerEntry.customer_id == customer_id,
+    )
+    if program_id is not None:
+        query = query.where(LedgerEntry.program_id == program_id)
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, 2)
+        last_created_at = datetime.fromisoformat(last_created_at)
+        last_id = uuid.UUID(last_id)
+        query = query.where(
+            or_(
+                LedgerEntry.created_at < last_created_at,
+                and_(LedgerEntry.created_at == last_created_at, LedgerEntry.id < last_id),
+            )
+        )
+    query = query.order_by(LedgerEntry.created_at.desc(), LedgerEntry.id.desc()).limit(limit + 1)
+
+    entries = db.scalars(query).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    activity = [
+        {
+            "id": str(entry.id),
+            "program_id": str(entry.program_id),
+            "program_name": program_names.get(str(entry.program_id)),
+            "entry_type": entry.entry_type.value if hasattr(entry.entry_type, "value") else str(entry.entry_type),
+            "change": entry.amount,
+            "timestamp": format_local(entry.created_at),
+            "notes": entry.notes,
+        }
+        for entry in entries
+    ]
+    next_cursor = None
+    if has_more:
+        last = entries[-1]
+        next_cursor = encode_cursor(last.created_at.isoformat(), str(last.id))
+    return activity, next_cursor
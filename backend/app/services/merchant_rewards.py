@@ -0,0 +1,121 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from ..core.pagination import decode_cursor, encode_cursor
+from ..core.timezone import format_local, now_local_iso
+from ..models import LoyaltyProgram, Reward, RewardStatus, User
+
+REWARD_SORTS = ("reached_at", "redeemed_at")
+
+# Statuses a merchant sees; inactive rewards are cycles still collecting stamps
+LISTED_REWARD_STATUSES = (RewardStatus.REDEEMABLE.value, RewardStatus.REDEEMED.value, RewardStatus.EXPIRED.value)
+
+
+def _status_filter(status: Optional[str]):
+    if status:
+        return Reward.status == status
+    return Reward.status.in_(LISTED_REWARD_STATUSES)
+
+
+def merchant_reward_counts(
+    db: Session, merchant_id: uuid.UUID, program_id: Optional[uuid.UUID] = None
+) -> dict:
+    """Rewards per status, answered from ix_rewards_merchant_status_reached alone."""
+    query = (
+        select(Reward.status, func.count())
+        .where(Reward.merchant_id == merchant_id, _status_filter(None))
+        .group_by(Reward.status)
+    )
+    if program_id is not None:
+        query = query.where(Reward.program_id == program_id)
+    counts = {status: 0 for status in LISTED_REWARD_STATUSES}
+    for status, count in db.execute(query):
+        counts[status.value if isinstance(status, RewardStatus) else str(status)] = count
+    return counts
+
+
+def list_merchant_rewards(
+    db: Session,
+    merchant_id: uuid.UUID,
+    *,
+    sort: str = "reached_at",
+    status: Optional[str] = None,
+    program_id: Optional[uuid.UUID] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    One page of the merchant's rewards, newest first, and the cursor for the
+    next page. Keyset on (sort column, id); rewards without a value for the
+    sort column (never reached, or not redeemed when sorting by redeemed_at)
+    are left out. Only the columns the rewards screen shows are selected.
+    Raises ValueError for a bad sort or cursor.
+    """
+    if sort not in REWARD_SORTS:
+        raise ValueError(f"Unknown sort: {sort}")
+    sort_column = Reward.reached_at if sort == "reached_at" else Reward.redeemed_at
+
+    query = (
+        select(
+            Reward.id,
+            Reward.program_id,
+            Reward.status,
+            Reward.voucher_code,
+            Reward.reached_at,
+            Reward.redeemed_at,
+            Reward.redeem_expires_at,
+            LoyaltyProgram.name.label("program_name"),
+            User.name.label("customer_name"),
+            User.email.label("customer_email"),
+        )
+        .join(LoyaltyProgram, LoyaltyProgram.id == Reward.program_id)
+        .join(User, User.id == Reward.customer_id)
+        .where(Reward.merchant_id == merchant_id, _status_filter(status), sort_column.is_not(None))
+    )
+    if program_id is not None:
+        query = query.where(Reward.program_id == program_id)
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, 2)
+        last_value = datetime.fromisoformat(last_value)
+        last_id = uuid.UUID(last_id)
+        query = query.where(
+            or_(sort_column < last_value, and_(sort_column == last_value, Reward.id < last_id))
+        )
+    query = query.order_by(sort_column.desc(), Reward.id.desc()).limit(limit + 1)
+
+    rows = db.execute(query).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    now_iso = now_local_iso()
+    rewards = []
+    for row in rows:
+        status_value = row.status.value if isinstance(row.status, RewardStatus) else str(row.status)
+        expires_at_iso = format_local(row.redeem_expires_at)
+        timestamp_iso = format_local(row.reached_at) or now_iso
+        if status_value == RewardStatus.REDEEMED.value and row.redeemed_at:
+            timestamp_iso = format_local(row.redeemed_at) or timestamp_iso
+        elif status_value == RewardStatus.EXPIRED.value and expires_at_iso:
+            timestamp_iso = expires_at_iso
+        rewards.append({
+            "id": str(row.id),
+            "program_id": str(row.program_id),
+            "program": row.program_name or "Program",
+            "customer": row.customer_name or row.customer_email.split("@")[0],
+            "date": timestamp_iso,
+            "status": status_value,
+            "amount": "1",
+            "code": row.voucher_code if status_value == RewardStatus.REDEEMABLE.value else None,
+            "expires_at": expires_at_iso,
+        })
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        last_value = last.reached_at if sort == "reached_at" else last.redeemed_at
+        next_cursor = encode_cursor(last_value.isoformat(), str(last.id))
+    return rewards, next_cursor
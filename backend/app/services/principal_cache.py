@@ -0,0 +1,115 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.merchant import Merchant
+from ..models.user import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    The authenticated caller: a read-only snapshot of the user row and the
+    ids of the merchants they own, so handlers can authorize without
+    loading either.
+    """
+
+    user_id: UUID
+    email: str
+    role: str
+    name: Optional[str]
+    merchant_ids: Tuple[UUID, ...]
+
+    @property
+    def merchant_id(self) -> Optional[UUID]:
+        return self.merchant_ids[0] if self.merchant_ids else None
+
+    def claims(self) -> dict:
+        """Extra access-token claims describing this principal."""
+        return {
+            "uid": str(self.user_id),
+            "role": self.role,
+            "merchant_ids": [str(merchant_id) for merchant_id in self.merchant_ids],
+        }
+
+
+class PrincipalCache:
+    """
+    Versioned in-process cache of principals keyed by user id, with the
+    same fill/invalidate protocol as ``ProgramCache``. The TTL is short
+    because other workers do not see this worker's invalidations.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._entries: Dict[UUID, Tuple[float, Principal]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: UUID) -> Optional[Principal]:
+        entry = self._entries.get(user_id)
+        if not entry:
+            return None
+        expires_at, principal = entry
+        if expires_at < time.monotonic():
+            with self._lock:
+                self._entries.pop(user_id, None)
+            return None
+        return principal
+
+    def put(self, principal: Principal, version: int) -> None:
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[principal.user_id] = (time.monotonic() + self.ttl_seconds, principal)
+
+    def invalidate_user(self, user_id: UUID) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def load_principal(
+    db: Session, user_id: Optional[UUID] = None, email: Optional[str] = None
+) -> Optional[Principal]:
+    """Build a principal from the database, by id or (for older tokens) by email."""
+    statement = select(User.id, User.email, User.role, User.name)
+    if user_id is not None:
+        statement = statement.where(User.id == user_id)
+    else:
+        statement = statement.where(User.email == email)
+    user = db.execute(statement).first()
+    if user is None:
+        return None
+    merchant_ids = db.scalars(select(Merchant.id).where(Merchant.owner_user_id == user.id)).all()
+    return Principal(
+        user_id=user.id,
+        email=user.email,
+        role=getattr(user.role, "value", user.role),
+        name=user.name,
+        merchant_ids=tuple(merchant_ids),
+    )
+
+
+def get_cached_principal(db: Session, user_id: UUID) -> Optional[Principal]:
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        version = principal_cache.version
+        principal = load_principal(db, user_id=user_id)
+        if principal is not None:
+            principal_cache.put(principal, version)
+    return principal
@@ -0,0 +1,138 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session, joinedload
+
+from ..core.config import settings
+from ..models.loyalty_program import LoyaltyProgram
+from ..models.merchant import Merchant
+
+
+@dataclass(frozen=True)
+class CachedLocation:
+    id: UUID
+    lat: float
+    lng: float
+
+
+@dataclass(frozen=True)
+class CachedMerchant:
+    id: UUID
+    owner_user_id: UUID
+    display_name: str
+    locations: Tuple[CachedLocation, ...]
+
+
+@dataclass(frozen=True)
+class CachedProgram:
+    """
+    Read-only snapshot of a program with its merchant and locations.
+    Mirrors the attribute names of the ORM models so scan/enroll code can
+    use it interchangeably for reads.
+    """
+
+    id: UUID
+    merchant_id: UUID
+    name: str
+    logic_type: str
+    is_active: bool
+    stamps_required: int
+    merchant: CachedMerchant
+
+
+def _snapshot(program: LoyaltyProgram) -> CachedProgram:
+    merchant = program.merchant
+    return CachedProgram(
+        id=program.id,
+        merchant_id=program.merchant_id,
+        name=program.name,
+        logic_type=program.logic_type,
+        is_active=bool(program.is_active),
+        stamps_required=program.stamps_required or 0,
+        merchant=CachedMerchant(
+            id=merchant.id,
+            owner_user_id=merchant.owner_user_id,
+            display_name=merchant.display_name,
+            locations=tuple(
+                CachedLocation(id=location.id, lat=location.lat, lng=location.lng)
+                for location in merchant.locations
+            ),
+        ),
+    )
+
+
+class ProgramCache:
+    """
+    Versioned in-process cache of program/merchant/location snapshots.
+
+    Every invalidation bumps ``version``; a fill that started before an
+    invalidation is discarded so a concurrent update can never be
+    overwritten by the stale row it replaced. Entries also carry a TTL to
+    bound staleness across workers, which do not share invalidations.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._entries: Dict[UUID, Tuple[float, CachedProgram]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, program_id: UUID) -> Optional[CachedProgram]:
+        entry = self._entries.get(program_id)
+        if not entry:
+            return None
+        expires_at, snapshot = entry
+        if expires_at < time.monotonic():
+            with self._lock:
+                self._entries.pop(program_id, None)
+            return None
+        return snapshot
+
+    def put(self, snapshot: CachedProgram, version: int) -> None:
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[snapshot.id] = (time.monotonic() + self.ttl_seconds, snapshot)
+
+    def invalidate_program(self, program_id: UUID) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.pop(program_id, None)
+
+    def invalidate_merchant(self, merchant_id: UUID) -> None:
+        with self._lock:
+            self.version += 1
+            for program_id in [
+                key for key, (_, snapshot) in self._entries.items() if snapshot.merchant_id == merchant_id
+            ]:
+                del self._entries[program_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+program_cache = ProgramCache(ttl_seconds=settings.PROGRAM_CACHE_TTL_SECONDS)
+
+
+def get_cached_program(db: Session, program_id: UUID, active_only: bool = False) -> Optional[CachedProgram]:
+    snapshot = program_cache.get(program_id)
+    if snapshot is None:
+        version = program_cache.version
+        program = (
+            db.query(LoyaltyProgram)
+            .options(joinedload(LoyaltyProgram.merchant).joinedload(Merchant.locations))
+            .filter(LoyaltyProgram.id == program_id)
+            .first()
+        )
+        if not program or not program.merchant:
+            return None
+        snapshot = _snapshot(program)
+        program_cache.put(snapshot, version)
+    if active_only and not snapshot.is_active:
+        return None
+    return snapshot
@@ -0,0 +1,210 @@
+import abc
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from ..core.config import settings
+from ..core.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[str, dict], Awaitable[None]]
+
+
+class Broker(abc.ABC):
+    """
+    Channel-based pub/sub used to fan WebSocket messages out across workers.
+
+    A worker subscribes to a channel while it holds at least one connection
+    for it, so it only receives traffic for the customers and merchants that
+    are actually connected to it. Published messages are stamped with a
+    per-channel ``seq`` that increases monotonically across all workers.
+    """
+
+    @abc.abstractmethod
+    async def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def unsubscribe(self, channel: str, handler: MessageHandler) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def publish(self, channel: str, message: dict) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class LoopbackBroker(Broker):
+    """In-process broker for tests and single-node deployments."""
+
+    def __init__(self):
+        self._handlers: Dict[str, Set[MessageHandler]] = {}
+        self._seq: Dict[str, int] = {}
+
+    async def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        self._handlers.setdefault(channel, set()).add(handler)
+
+    async def unsubscribe(self, channel: str, handler: MessageHandler) -> None:
+        handlers = self._handlers.get(channel)
+        if handlers is None:
+            return
+        handlers.discard(handler)
+        if not handlers:
+            del self._handlers[channel]
+
+    async def publish(self, channel: str, message: dict) -> None:
+        seq = self._seq.get(channel, 0) + 1
+        self._seq[channel] = seq
+        message = {**message, "seq": seq}
+        for handler in list(self._handlers.get(channel, ())):
+            try:
+                await handler(channel, message)
+            except Exception as exc:
+                logger.error(f"Loopback delivery failed on {channel}: {exc}")
+
+
+# INCR and PUBLISH in one step so frames reach subscribers in seq order
+_PUBLISH_WITH_SEQ = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('PUBLISH', KEYS[2], seq .. '|' .. ARGV[1])
+return seq
+"""
+
+
+class RedisBroker(Broker):
+    """
+    Redis pub/sub broker. Each process keeps one subscriber connection and
+    SUBSCRIBEs/UNSUBSCRIBEs per channel as local handlers come and go; a
+    reader task dispatches incoming messages to the local handlers.
+    """
+
+    def __init__(self, url: str, prefix: str = "rudi:ws:"):
+        self.url = url
+        self.prefix = prefix
+        self._handlers: Dict[str, Set[MessageHandler]] = {}
+        # Latest seq seen per subscribed channel, continued while Redis is down
+        self._last_seq: Dict[str, int] = {}
+        self._redis = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._has_channels = asyncio.Event()
+        self._publish_script = None
+
+    def _client(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis
+
+            self._redis = aioredis.from_url(self.url, decode_responses=True)
+            self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            self._publish_script = self._redis.register_script(_PUBLISH_WITH_SEQ)
+        return self._redis
+
+    def _ensure_reader(self) -> None:
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        handlers = self._handlers.setdefault(channel, set())
+        first = not handlers
+        handlers.add(handler)
+        if not first:
+            return
+        self._client()
+        try:
+            await self._pubsub.subscribe(self.prefix + channel)
+        except Exception as exc:
+            logger.error(f"Redis subscribe failed for {channel}: {exc}")
+        self._has_channels.set()
+        self._ensure_reader()
+
+    async def unsubscribe(self, channel: str, handler: MessageHandler) -> None:
+        handlers = self._handlers.get(channel)
+        if handlers is None:
+            return
+        handlers.discard(handler)
+        if handlers:
+            return
+        del self._handlers[channel]
+        self._last_seq.pop(channel, None)
+        if not self._handlers:
+            self._has_channels.clear()
+        try:
+            await self._pubsub.unsubscribe(self.prefix + channel)
+        except Exception as exc:
+            logger.error(f"Redis unsubscribe failed for {channel}: {exc}")
+
+    async def publish(self, channel: str, message: dict) -> None:
+        try:
+            self._client()
+            await self._publish_script(
+                keys=[f"{self.prefix}seq:{channel}", self.prefix + channel],
+                args=[dumps(message)],
+            )
+        except Exception as exc:
+            # Redis is down: still reach the connections this worker holds,
+            # numbered on from the last seq seen so replay buffers keep order.
+            # A counter that falls behind once Redis is back reads as a reset.
+            logger.error(f"Redis publish failed for {channel}, delivering locally: {exc}")
+            if channel in self._handlers:
+                seq = self._last_seq.get(channel, 0) + 1
+                self._last_seq[channel] = seq
+                await self._dispatch(channel, {**message, "seq": seq})
+
+    async def _dispatch(self, channel: str, message: dict) -> None:
+        for handler in list(self._handlers.get(channel, ())):
+            try:
+                await handler(channel, message)
+            except Exception as exc:
+                logger.error(f"WebSocket delivery failed on {channel}: {exc}")
+
+    async def _read_loop(self) -> None:
+        while True:
+            await self._has_channels.wait()
+            try:
+                raw = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"Redis pub/sub read failed: {exc}")
+                await asyncio.sleep(1.0)
+                continue
+            if not raw or raw.get("type") != "message":
+                continue
+            channel = raw["channel"][len(self.prefix):]
+            try:
+                seq, _, payload = raw["data"].partition("|")
+                message = loads(payload)
+                message["seq"] = int(seq)
+            except (TypeError, ValueError):
+                logger.error(f"Dropping malformed pub/sub payload on {channel}")
+                continue
+            if channel in self._handlers:
+                self._last_seq[channel] = message["seq"]
+            await self._dispatch(channel, message)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+def create_broker(backend: Optional[str] = None) -> Broker:
+    backend = (backend or settings.WS_BROKER).lower()
+    if backend == "redis":
+        return RedisBroker(settings.REDIS_URL)
+    if backend in ("loopback", "memory", "local"):
+        return LoopbackBroker()
+    raise ValueError(f"Unknown WS_BROKER backend: {backend}")
@@ -0,0 +1,139 @@
+import time
+import uuid
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models import CustomerProgramMembership, LedgerEntry, PurgeJob, PurgeJobStatus, Reward, Stamp
+from .customer_summary import refresh_customer_summary
+
+# Children first, so no foreign key ever points at a deleted row
+_PURGE_TARGETS = (
+    ("rewards", Reward, Reward.enrollment_id),
+    ("stamps", Stamp, Stamp.enrollment_id),
+    ("ledger_entries", LedgerEntry, LedgerEntry.membership_id),
+)
+
+
+def soft_delete_memberships(
+    db: Session,
+    memberships: Iterable[CustomerProgramMembership],
+    merchant_id: uuid.UUID,
+    customer_id: uuid.UUID,
+    requested_by: Optional[uuid.UUID] = None,
+) -> Optional[PurgeJob]:
+    """
+    Hide the memberships from every read straight away and queue a purge job
+    for them and their history. Returns None when there is nothing to delete.
+    The caller commits, then runs the job with ``run_purge_job``.
+    """
+    now = datetime.utcnow()
+    membership_ids = []
+    for membership in memberships:
+        membership.deleted_at = now
+        membership.is_active = False
+        membership_ids.append(str(membership.id))
+    if not membership_ids:
+        return None
+    job = PurgeJob(
+        merchant_id=merchant_id,
+        customer_id=customer_id,
+        requested_by=requested_by,
+        membership_ids=membership_ids,
+        status=PurgeJobStatus.PENDING,
+        progress={},
+    )
+    db.add(job)
+    db.flush()
+    return job
+
+
+def _purge(db: Session, job: PurgeJob, chunk_size: int, pause_seconds: float) -> None:
+    membership_ids = [uuid.UUID(value) for value in job.membership_ids]
+    progress = dict(job.progress or {})
+    for name, model, column in _PURGE_TARGETS:
+        while True:
+            ids = db.scalars(select(model.id).where(column.in_(membership_ids)).limit(chunk_size)).all()
+            if not ids:
+                break
+            db.execute(delete(model).where(model.id.in_(ids)), execution_options={"synchronize_session": False})
+            progress[name] = progress.get(name, 0) + len(ids)
+            job.progress = dict(progress)
+            # Commit per chunk so locks are short and progress is visible
+            db.commit()
+            if pause_seconds:
+                time.sleep(pause_seconds)
+
+    result = db.execute(
+        delete(CustomerProgramMembership).where(
+            CustomerProgramMembership.id.in_(membership_ids),
+            CustomerProgramMembership.deleted_at.is_not(None),
+        ),
+        execution_options={"synchronize_session": False},
+    )
+    progress["memberships"] = progress.get("memberships", 0) + (result.rowcount or 0)
+    job.progress = progress
+    # Lifetime totals no longer include the purged ledger entries
+    refresh_customer_summary(db, job.merchant_id, job.customer_id)
+
+
+def run_purge_job(
+    bind,
+    job_id: uuid.UUID,
+    chunk_size: Optional[int] = None,
+    pause_ms: Optional[int] = None,
+) -> None:
+    """
+    Delete a job's rows in chunks on a session of its own. Safe to re-run:
+    a job interrupted part way resumes where it stopped.
+    """
+    chunk_size = chunk_size or settings.PURGE_CHUNK_SIZE
+    pause_seconds = (settings.PURGE_CHUNK_PAUSE_MS if pause_ms is None else pause_ms) / 1000
+    with Session(bind=bind) as db:
+        job = db.get(PurgeJob, job_id)
+        if job is None or job.status == PurgeJobStatus.DONE:
+            return
+        job.status = PurgeJobStatus.RUNNING
+        job.started_at = job.started_at or datetime.utcnow()
+        job.error = None
+        db.commit()
+        try:
+            _purge(db, job, chunk_size, pause_seconds)
+            job.status = PurgeJobStatus.DONE
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            job = db.get(PurgeJob, job_id)
+            job.status = PurgeJobStatus.FAILED
+            job.error = str(exc)
+            db.commit()
+            print(f"Purge job {job_id} failed: {exc}")
+
+
+def resume_purge_jobs(bind) -> int:
+    """Run every job left pending, running or failed (e.g. by a restart). Returns the count."""
+    with Session(bind=bind) as db:
+        job_ids = db.scalars(
+            select(PurgeJob.id)
+            .where(PurgeJob.status != PurgeJobStatus.DONE)
+            .order_by(PurgeJob.created_at)
+        ).all()
+    for job_id in job_ids:
+        run_purge_job(bind, job_id)
+    return len(job_ids)
+
+
+def purge_job_status(job: PurgeJob) -> dict:
+    status_value = job.status.value if isinstance(job.status, PurgeJobStatus) else str(job.status)
+    return {
+        "id": str(job.id),
+        "status": status_value,
+        "progress": job.progress or {},
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -10,17 +10,21 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from ..core.config import settings
+from ..core.timezone import format_local, now_local_iso
 from ..models import (
     AuditLog,
     CustomerProgramMembership,
     LedgerEntry,
     LedgerEntryType,
     LoyaltyProgram,
+    Merchant,
     Reward,
     RewardStatus,
     Stamp,
 )
+from ..schemas.reward import CustomerRedemption
 from .customer_stats_service import update_visit_stats, update_reward_redeemed
+from .customer_summary import record_ledger_entry, record_reward_redeemed
 
 
 def _as_utc(value: datetime | None) -> datetime | None:
@@ -216,6 +220,8 @@ def revoke_last_stamp(
         notes="manual_revoke",
     )
     db.add(ledger_entry)
+    db.flush()
+    record_ledger_entry(db, ledger_entry)
 
     _log_audit(
         db,
@@ -314,6 +320,7 @@ def issue_stamp(
         return existing
 
     enrollment.last_visit_at = stamp.issued_at
+    record_ledger_entry(db, ledger_entry)
     _log_audit(
         db,
         actor_type="staff" if staff_id else "system",
@@ -382,6 +389,7 @@ def redeem_reward(
     program = db.query(LoyaltyProgram).filter(LoyaltyProgram.id == reward.program_id).first()
     if enrollment and program:
         _start_next_cycle_if_allowed(db, enrollment=enrollment, program=program)
+    record_reward_redeemed(db, reward)
 
     # Update customer stats
     update_reward_redeemed(db, reward.customer_id)
@@ -432,3 +440,80 @@ def get_reward_state(db: Session, enrollment_id: uuid.UUID) -> Reward | None:
         .order_by(Reward.cycle.desc())
         .first()
     )
+
+
+# Customer-facing names for the reward states a customer can see
+REDEMPTION_STATUS_NAMES = {
+    RewardStatus.REDEEMABLE: "claimed",
+    RewardStatus.REDEEMED: "redeemed",
+    RewardStatus.EXPIRED: "expired",
+}
+
+
+def redemption_status_name(status) -> str:
+    """The name ``/redemptions`` uses for a reward status; other states keep their own."""
+    try:
+        return REDEMPTION_STATUS_NAMES.get(RewardStatus(status), RewardStatus(status).value)
+    except ValueError:
+        return str(status)
+
+
+def list_customer_redemptions(
+    db: Session,
+    customer_id: uuid.UUID,
+    program_id: uuid.UUID | None = None,
+    status: str | None = None,
+    limit: int = 50,
+) -> list[CustomerRedemption]:
+    """
+    Redemptions across all of a customer's programs in one joined query,
+    newest first. ``status`` takes the customer-facing name (claimed,
+    redeemed, expired).
+    """
+    visible = list(REDEMPTION_STATUS_NAMES)
+    if status is not None:
+        visible = [key for key, name in REDEMPTION_STATUS_NAMES.items() if name == status]
+
+    query = (
+        db.query(Reward, CustomerProgramMembership, LoyaltyProgram, Merchant)
+        .join(CustomerProgramMembership, Reward.enrollment_id == CustomerProgramMembership.id)
+        .join(LoyaltyProgram, Reward.program_id == LoyaltyProgram.id)
+        .join(Merchant, LoyaltyProgram.merchant_id == Merchant.id)
+        .filter(
+            CustomerProgramMembership.customer_user_id == customer_id,
+            Reward.status.in_(visible),
+        )
+    )
+    if program_id is not None:
+        query = query.filter(Reward.program_id == program_id)
+    rows = query.order_by(Reward.reached_at.desc()).limit(limit).all()
+
+    redemptions: list[CustomerRedemption] = []
+    for reward, membership, program, merchant in rows:
+        status_name = REDEMPTION_STATUS_NAMES[RewardStatus(reward.status)]
+        stamps_required = getattr(program, "stamps_required", 0) or 0
+        merchant_name = getattr(merchant, "display_name", None) or getattr(merchant, "legal_name", None)
+        redemptions.append(
+            CustomerRedemption(
+                id=str(reward.id),
+                program_id=str(reward.program_id),
+                code=reward.voucher_code or "N/A",
+                status=status_name,
+                amount=str(stamps_required),
+                created_at=(
+                    format_local(reward.reached_at)
+                    or format_local(membership.joined_at)
+                    or now_local_iso()
+                ),
+                expires_at=format_local(reward.redeem_expires_at),
+                used_at=format_local(reward.redeemed_at),
+                program_name=getattr(program, "name", None) or "Programme",
+                merchant_name=merchant_name or "Merchant",
+                reward_description=getattr(program, "reward_description", None) or program.name or "Reward",
+                stamps_redeemed=stamps_required if status_name != "claimed" else None,
+            )
+        )
+
+    # reached_at can be null; fall back to the formatted timestamp ordering
+    redemptions.sort(key=lambda item: item.created_at, reverse=True)
+    return redemptions
@@ -0,0 +1,224 @@
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.pagination import decode_cursor, encode_cursor
+from ..models import (
+    CustomerProgramMembership,
+    CustomerSegment,
+    LedgerEntry,
+    LedgerEntryType,
+    LoyaltyProgram,
+    Merchant,
+    MerchantCustomerSummary,
+    User,
+)
+
+SEGMENTS = {
+    "lapsed": "No visit in the last SEGMENT_LAPSED_DAYS days",
+    "near_reward": "One stamp away from a reward",
+    "regulars": "Most frequent visitors over the last SEGMENT_REGULAR_WINDOW_DAYS days",
+}
+
+_Members = Dict[uuid.UUID, Set[uuid.UUID]]
+
+
+def _scoped(statement, column, merchant_id: Optional[uuid.UUID]):
+    return statement if merchant_id is None else statement.where(column == merchant_id)
+
+
+def _lapsed(db: Session, merchant_id: Optional[uuid.UUID], now: datetime) -> _Members:
+    cutoff = now - timedelta(days=settings.SEGMENT_LAPSED_DAYS)
+    statement = select(MerchantCustomerSummary.merchant_id, MerchantCustomerSummary.customer_id).where(
+        MerchantCustomerSummary.last_visit_at < cutoff
+    )
+    members: _Members = defaultdict(set)
+    for row_merchant_id, customer_id in db.execute(_scoped(statement, MerchantCustomerSummary.merchant_id, merchant_id)):
+        members[row_merchant_id].add(customer_id)
+    return members
+
+
+def _near_reward(db: Session, merchant_id: Optional[uuid.UUID], now: datetime) -> _Members:
+    statement = (
+        select(CustomerProgramMembership.merchant_id, CustomerProgramMembership.customer_user_id)
+        .join(LoyaltyProgram, LoyaltyProgram.id == CustomerProgramMembership.program_id)
+        .where(
+            LoyaltyProgram.stamps_required > 1,
+            CustomerProgramMembership.current_balance == LoyaltyProgram.stamps_required - 1,
+        )
+        .distinct()
+    )
+    members: _Members = defaultdict(set)
+    for row_merchant_id, customer_id in db.execute(
+        _scoped(statement, CustomerProgramMembership.merchant_id, merchant_id)
+    ):
+        members[row_merchant_id].add(customer_id)
+    return members
+
+
+def _regulars(db: Session, merchant_id: Optional[uuid.UUID], now: datetime) -> _Members:
+    """
+    Visits per customer over the window, ranked within each merchant with
+    percent_rank(); the top SEGMENT_REGULAR_TOP_FRACTION with at least
+    SEGMENT_REGULAR_MIN_VISITS visits are regulars.
+    """
+    since = now - timedelta(days=settings.SEGMENT_REGULAR_WINDOW_DAYS)
+    visits = _scoped(
+        select(
+            LedgerEntry.merchant_id,
+            LedgerEntry.customer_id,
+            func.count().label("visits"),
+        )
+        .join(
+            MerchantCustomerSummary,
+            and_(
+                MerchantCustomerSummary.merchant_id == LedgerEntry.merchant_id,
+                MerchantCustomerSummary.customer_id == LedgerEntry.customer_id,
+            ),
+        )
+        .where(LedgerEntry.entry_type == LedgerEntryType.EARN, LedgerEntry.created_at >= since)
+        .group_by(LedgerEntry.merchant_id, LedgerEntry.customer_id),
+        LedgerEntry.merchant_id,
+        merchant_id,
+    ).subquery()
+    ranked = select(
+        visits.c.merchant_id,
+        visits.c.customer_id,
+        visits.c.visits,
+        func.percent_rank()
+        .over(partition_by=visits.c.merchant_id, order_by=visits.c.visits.desc())
+        .label("visit_rank"),
+    ).subquery()
+    statement = select(ranked.c.merchant_id, ranked.c.customer_id).where(
+        ranked.c.visit_rank <= settings.SEGMENT_REGULAR_TOP_FRACTION,
+        ranked.c.visits >= settings.SEGMENT_REGULAR_MIN_VISITS,
+    )
+    members: _Members = defaultdict(set)
+    for row_merchant_id, customer_id in db.execute(statement):
+        members[row_merchant_id].add(customer_id)
+    return members
+
+
+_COMPUTE = {"lapsed": _lapsed, "near_reward": _near_reward, "regulars": _regulars}
+
+
+def compute_segments(db: Session, merchant_id: Optional[uuid.UUID] = None, now: Optional[datetime] = None) -> int:
+    """
+    Recompute every segment for one merchant or (by default) all of them,
+    one grouped query per segment, and replace the stored id arrays.
+    Commits; returns the number of segment rows written.
+    """
+    now = now or datetime.utcnow()
+    computed = {name: compute(db, merchant_id, now) for name, compute in _COMPUTE.items()}
+    merchant_ids = [merchant_id] if merchant_id is not None else db.scalars(select(Merchant.id)).all()
+
+    rows = []
+    for row_merchant_id in merchant_ids:
+        for name in SEGMENTS:
+            customer_ids = sorted(str(customer_id) for customer_id in computed[name].get(row_merchant_id, ()))
+            rows.append({
+                "merchant_id": row_merchant_id,
+                "name": name,
+                "customer_ids": customer_ids,
+                "member_count": len(customer_ids),
+                "stale": False,
+                "computed_at": now,
+            })
+
+    db.execute(_scoped(delete(CustomerSegment), CustomerSegment.merchant_id, merchant_id))
+    for start in range(0, len(rows), 1000):
+        db.execute(insert(CustomerSegment), rows[start:start + 1000])
+    db.commit()
+    return len(rows)
+
+
+def mark_segments_stale(db: Session, merchant_id: uuid.UUID) -> None:
+    """A stamp, redeem or leave may have moved customers between segments."""
+    db.execute(
+        update(CustomerSegment)
+        .where(CustomerSegment.merchant_id == merchant_id, CustomerSegment.stale.is_(False))
+        .values(stale=True),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def get_segments(db: Session, merchant_id: uuid.UUID) -> List[CustomerSegment]:
+    """
+    The merchant's segments, recomputed first when missing or when marked
+    stale more than SEGMENT_REFRESH_SECONDS after they were computed.
+    """
+    segments = db.scalars(select(CustomerSegment).where(CustomerSegment.merchant_id == merchant_id)).all()
+    refresh_before = datetime.utcnow() - timedelta(seconds=settings.SEGMENT_REFRESH_SECONDS)
+    if len(segments) < len(SEGMENTS) or any(
+        segment.stale and segment.computed_at < refresh_before for segment in segments
+    ):
+        compute_segments(db, merchant_id)
+        segments = db.scalars(select(CustomerSegment).where(CustomerSegment.merchant_id == merchant_id)).all()
+    order = list(SEGMENTS)
+    return sorted(segments, key=lambda segment: order.index(segment.name))
+
+
+def segment_customers(
+    db: Session,
+    merchant_id: uuid.UUID,
+    name: str,
+    *,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    One page of a segment's customers (contact details for a campaign) and
+    the cursor for the next page. Raises KeyError for an unknown segment and
+    ValueError for a bad cursor.
+    """
+    if name not in SEGMENTS:
+        raise KeyError(name)
+    segment = next(segment for segment in get_segments(db, merchant_id) if segment.name == name)
+    offset = 0
+    if cursor:
+        (offset,) = decode_cursor(cursor, 1)
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError("Malformed cursor")
+    page_ids = [uuid.UUID(value) for value in segment.customer_ids[offset:offset + limit]]
+    if not page_ids:
+        return [], None
+
+    rows = db.execute(
+        select(
+            User.id,
+            User.name,
+            User.email,
+            User.phone,
+            MerchantCustomerSummary.current_stamps,
+            MerchantCustomerSummary.visits,
+            MerchantCustomerSummary.last_visit_at,
+        )
+        .join(
+            MerchantCustomerSummary,
+            and_(MerchantCustomerSummary.customer_id == User.id, MerchantCustomerSummary.merchant_id == merchant_id),
+        )
+        .where(User.id.in_(page_ids))
+    ).all()
+    by_id = {row.id: row for row in rows}
+    customers = [
+        {
+            "id": str(row.id),
+            "name": row.name or row.email.split("@")[0],
+            "email": row.email,
+            "phone": row.phone,
+            "current_stamps": row.current_stamps,
+            "visits": row.visits,
+            "last_visit": row.last_visit_at.isoformat() if row.last_visit_at else None,
+        }
+        # Customers who left since the segment was computed are skipped
+        for row in (by_id.get(customer_id) for customer_id in page_ids)
+        if row is not None
+    ]
+    next_offset = offset + limit
+    next_cursor = encode_cursor(next_offset) if next_offset < len(segment.customer_ids) else None
+    return customers, next_cursor
@@ -0,0 +1,57 @@
+"""
+Auth dependency microbenchmark.
+
+Times ``get_current_user`` on one access token, as every authenticated
+request runs it: cold (verified-token cache cleared before each call, so a
+full ``jwt.decode``) and warm (claims served from the cache).
+
+Run from the backend directory:
+
+    python -m benchmarks.auth_dependency --calls 20000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.api.deps import get_current_user
+from app.core.security import create_access_token
+from app.core.token_cache import token_cache
+
+
+async def _time(credentials: HTTPAuthorizationCredentials, calls: int, cold: bool) -> list:
+    timings = []
+    for _ in range(calls):
+        if cold:
+            token_cache.clear()
+        start = time.perf_counter()
+        await get_current_user(credentials)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = create_access_token(
+        subject="bench@example.com",
+        claims={"uid": "00000000-0000-0000-0000-000000000001", "role": "merchant", "merchant_ids": []},
+    )
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    for label, cold in (("cold", True), ("warm", False)):
+        timings = asyncio.run(_time(credentials, args.calls, cold))
+        timings.sort()
+        print(
+            f"{label}:  median {statistics.median(timings) * 1e6:7.1f}us  "
+            f"p99 {timings[int(len(timings) * 0.99)] * 1e6:7.1f}us  "
+            f"({args.calls / sum(timings):,.0f} calls/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Customer search benchmark.
+
+Builds the warm per-merchant index used by ``GET /merchants/customers/search``
+over synthetic customers and times prefix, substring, phone and no-match
+queries against it.
+
+Run from the backend directory:
+
+    python -m benchmarks.customer_search --customers 100000
+"""
+import argparse
+import random
+import statistics
+import string
+import time
+import uuid
+
+from app.services.customer_search import CustomerHit, MerchantSearchIndex
+
+
+def _word(length: int) -> str:
+    return "".join(random.choices(string.ascii_lowercase, k=length)).title()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200, help="timed runs per query")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    hits = [
+        CustomerHit(
+            id=str(uuid.uuid4()),
+            name=f"{_word(6)} {_word(8)}",
+            email=f"user{index}@example.com",
+            phone=f"555-{index:07d}",
+            avatar=None,
+        )
+        for index in range(args.customers)
+    ]
+    start = time.perf_counter()
+    index = MerchantSearchIndex(hits)
+    print(f"index build:  {time.perf_counter() - start:.2f}s for {args.customers} customers")
+
+    sample = random.choice(hits)
+    queries = {
+        "name prefix": sample.name[:3],
+        "email prefix": sample.email[:7],
+        "substring": sample.name.split()[1][2:6],
+        "phone digits": sample.phone[-5:],
+        "no match": "qqqqzz",
+    }
+    for label, query in queries.items():
+        timings = []
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            index.search(query, args.limit)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"{label:<13} {query!r:<16} p50={statistics.median(timings) * 1000:.3f} ms "
+              f"p99={timings[int(len(timings) * 0.99) - 1] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
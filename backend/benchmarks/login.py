@@ -0,0 +1,95 @@
+"""
+Login throughput benchmark.
+
+Runs a burst of concurrent password verifications the way ``POST /auth/login``
+does, once on a request-style thread pool (how sync handlers hashed before)
+and once through the hashing process pool. Meanwhile a probe keeps asking the
+thread pool for a slot, as the sync handlers serving scans and dashboards
+would, and reports how long it waited.
+
+Run from the backend directory:
+
+    python -m benchmarks.login --logins 400 --concurrency 64 --rounds 29000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PASSWORD = "correct horse battery staple"
+
+
+async def _run(mode: str, logins: int, concurrency: int, threads: int) -> None:
+    from app.core.security import pwd_context, verify_and_update_password, verify_and_update_password_async
+
+    loop = asyncio.get_running_loop()
+    # Stands in for the server's threadpool (anyio's default is 40 threads)
+    request_threads = ThreadPoolExecutor(max_workers=threads)
+    hashed = pwd_context.hash(PASSWORD)
+    # Start the hashing processes outside the timed section
+    await verify_and_update_password_async(PASSWORD, hashed)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login() -> None:
+        async with semaphore:
+            if mode == "threads":
+                await loop.run_in_executor(request_threads, verify_and_update_password, PASSWORD, hashed)
+            else:
+                await verify_and_update_password_async(PASSWORD, hashed)
+
+    waits = []
+    done = asyncio.Event()
+
+    async def probe() -> None:
+        while not done.is_set():
+            start = time.perf_counter()
+            await loop.run_in_executor(request_threads, time.perf_counter)
+            waits.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+    request_threads.shutdown()
+
+    waits.sort()
+    p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))]
+    print(
+        f"{mode:8} {logins / elapsed:8.1f} logins/s   "
+        f"thread wait p50 {statistics.median(waits) * 1000:7.2f}ms  p99 {p99 * 1000:7.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64, help="logins in flight at once")
+    parser.add_argument("--threads", type=int, default=40, help="request thread pool size")
+    parser.add_argument("--rounds", type=int, default=None, help="overrides PASSWORD_HASH_ROUNDS")
+    parser.add_argument("--workers", type=int, default=None, help="overrides PASSWORD_HASH_WORKERS")
+    args = parser.parse_args()
+
+    # Settings are read at import, so set them before app.core.security loads
+    if args.rounds is not None:
+        os.environ["PASSWORD_HASH_ROUNDS"] = str(args.rounds)
+    if args.workers is not None:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+
+    from app.core.config import settings
+    from app.core.security import shutdown_hash_pool, start_hash_pool
+
+    print(f"rounds {settings.PASSWORD_HASH_ROUNDS}, hash workers {settings.PASSWORD_HASH_WORKERS}")
+    start_hash_pool()
+    for mode in ("threads", "pool"):
+        asyncio.run(_run(mode, args.logins, args.concurrency, args.threads))
+    shutdown_hash_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark WebSocket frame encoding: per-recipient ``json.dumps`` (what
+``send_json`` does) versus encoding once with ``app.core.serialization.dumps``
+and reusing the frame for every recipient.
+
+Run from the backend directory:
+
+    python -m benchmarks.ws_encoding
+"""
+import json
+import time
+import uuid
+
+from app.core.serialization import dumps, orjson
+
+RECIPIENT_COUNTS = (1, 10, 1000)
+ROUNDS = 200
+
+
+def _sample_message() -> dict:
+    return {
+        "type": "customer_stamp_update",
+        "customer_id": str(uuid.uuid4()),
+        "customer_name": "Sample Customer",
+        "program_id": str(uuid.uuid4()),
+        "program_name": "Coffee Card",
+        "delta": 1,
+        "new_balance": 7,
+        "timestamp": "2025-01-01T12:00:00+00:00",
+        "seq": 1234,
+    }
+
+
+def _per_recipient(message: dict, recipients: int) -> None:
+    for _ in range(recipients):
+        json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def _encode_once(message: dict, recipients: int) -> None:
+    frame = dumps(message)
+    for _ in range(recipients):
+        _ = frame
+
+
+def _time(fn, message: dict, recipients: int) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn(message, recipients)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main() -> None:
+    message = _sample_message()
+    encoder = "orjson" if orjson is not None else "json"
+    print(f"Encoder: {encoder}, {ROUNDS} broadcasts per row")
+    print(f"{'recipients':>10} {'per-recipient (us)':>20} {'encode-once (us)':>18} {'speedup':>8}")
+    for recipients in RECIPIENT_COUNTS:
+        baseline = _time(_per_recipient, message, recipients)
+        once = _time(_encode_once, message, recipients)
+        print(
+            f"{recipients:>10} {baseline * 1e6:>20.1f} {once * 1e6:>18.1f} "
+            f"{baseline / once if once else float('inf'):>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
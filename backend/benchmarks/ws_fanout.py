@@ -0,0 +1,174 @@
+"""
+WebSocket scalability benchmark.
+
+Opens thousands of simulated customer and merchant sockets against the real
+``/api/v1/ws/customer/{id}`` and ``/api/v1/ws/merchant/{id}`` endpoints by
+driving the ASGI app in-process (no network, one event loop), then pushes
+stamp and redeem broadcasts through ``get_websocket_manager()`` and reports:
+
+- connect time and RSS growth per connection
+- end-to-end delivery latency (broadcast call -> frame handed to the socket)
+- delivered frames per second
+
+Run from the backend directory:
+
+    python -m benchmarks.ws_fanout --customers 5000 --merchants 250 --broadcasts 20000
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import statistics
+import time
+import uuid
+
+from app.api.v1.websocket import get_websocket_manager
+from app.main import app
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux; only a high-water mark, but better than nothing
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class SimulatedClient:
+    """Minimal ASGI WebSocket peer that records when each frame arrives."""
+
+    def __init__(self, path: str, latencies: list, counter: list):
+        self.path = path
+        self.latencies = latencies
+        self.counter = counter
+        self.inbound: asyncio.Queue = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def scope(self) -> dict:
+        return {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": self.path,
+            "raw_path": self.path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", random.randint(1024, 65535)),
+            "server": ("bench", 80),
+            "subprotocols": [],
+        }
+
+    async def receive(self) -> dict:
+        return await self.inbound.get()
+
+    async def send(self, event: dict) -> None:
+        kind = event["type"]
+        if kind == "websocket.accept":
+            self.accepted.set()
+        elif kind == "websocket.send":
+            now = time.perf_counter()
+            message = json.loads(event.get("text") or event.get("bytes"))
+            updates = message.get("updates") or [message]
+            for update in updates:
+                sent_at = update.get("bench_sent_at")
+                if sent_at is not None:
+                    self.latencies.append(now - sent_at)
+                    self.counter[0] += 1
+
+    async def open(self) -> None:
+        self.inbound.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.create_task(app(self.scope(), self.receive, self.send))
+        await self.accepted.wait()
+
+    async def close(self) -> None:
+        self.inbound.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        if self.task is not None:
+            await self.task
+
+
+async def run(args: argparse.Namespace) -> None:
+    manager = get_websocket_manager()
+    manager.bind_loop()
+    if args.coalesce_ms is not None:
+        manager.coalesce_window = args.coalesce_ms / 1000
+
+    latencies: list = []
+    delivered = [0]
+    customer_ids = [uuid.uuid4().hex for _ in range(args.customers)]
+    merchant_ids = [uuid.uuid4().hex for _ in range(args.merchants)]
+    clients = [SimulatedClient(f"/api/v1/ws/customer/{cid}", latencies, delivered) for cid in customer_ids]
+    clients += [SimulatedClient(f"/api/v1/ws/merchant/{mid}", latencies, delivered) for mid in merchant_ids]
+
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    for offset in range(0, len(clients), 500):
+        await asyncio.gather(*(client.open() for client in clients[offset:offset + 500]))
+    connect_seconds = time.perf_counter() - start
+    rss_after = _rss_bytes()
+
+    expected = 0
+    start = time.perf_counter()
+    for index in range(args.broadcasts):
+        customer_id = random.choice(customer_ids)
+        merchant_id = random.choice(merchant_ids)
+        program_id = uuid.uuid4().hex
+        sent_at = time.perf_counter()
+        if index % 5 == 4:
+            # Redeem flow: customer reward status plus the merchant's redeemed feed
+            reward = {"reward_id": uuid.uuid4().hex, "program_id": program_id, "status": "redeemed"}
+            await manager.broadcast_reward_status(customer_id, {**reward, "bench_sent_at": sent_at})
+            await manager.broadcast_merchant_reward_update(merchant_id, {**reward, "bench_sent_at": sent_at})
+        else:
+            # Stamp flow: customer balance plus the merchant's customer feed
+            await manager.broadcast_stamp_update(customer_id, program_id, index)
+            await manager.broadcast_merchant_customer_update(
+                merchant_id,
+                {"customer_id": customer_id, "program_id": program_id, "new_balance": index, "bench_sent_at": sent_at},
+            )
+        expected += 2 if index % 5 == 4 else 1
+        if index % 500 == 499:
+            # Let the writers run, as a real server would between requests
+            await asyncio.sleep(0)
+
+    deadline = time.perf_counter() + args.timeout
+    while delivered[0] < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    await asyncio.gather(*(client.close() for client in clients))
+    await manager.stop()
+
+    connections = len(clients)
+    print(f"connections:            {connections} ({args.customers} customers, {args.merchants} merchants)")
+    print(f"connect time:           {connect_seconds:.2f}s ({connections / connect_seconds:.0f}/s)")
+    print(f"RSS growth:             {(rss_after - rss_before) / 1024 / 1024:.1f} MiB "
+          f"(~{(rss_after - rss_before) / connections / 1024:.1f} KiB per connection)")
+    print(f"broadcast calls:        {args.broadcasts} (coalesce window {manager.coalesce_window * 1000:.0f} ms)")
+    print(f"timed frames delivered: {delivered[0]}/{expected} in {elapsed:.2f}s "
+          f"({delivered[0] / elapsed:.0f} frames/s)")
+    if latencies:
+        ordered = sorted(latencies)
+        pct = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+        print(f"latency ms:             p50={pct(0.50):.2f} p95={pct(0.95):.2f} p99={pct(0.99):.2f} "
+              f"max={ordered[-1] * 1000:.2f} mean={statistics.fmean(ordered) * 1000:.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--merchants", type=int, default=250)
+    parser.add_argument("--broadcasts", type=int, default=20000)
+    parser.add_argument("--coalesce-ms", type=float, default=None, help="override WS_COALESCE_WINDOW_MS")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for outstanding frames")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
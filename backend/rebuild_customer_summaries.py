@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Rebuild the merchant_customer_summary read model from memberships, ledger
+entries and rewards. Migration 034 backfills it; run this any time the
+summaries are suspected to have drifted:
+
+    python rebuild_customer_summaries.py [--merchant-id UUID]
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db.session import SessionLocal
+from app.services.customer_summary import rebuild_customer_summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--merchant-id", type=uuid.UUID, default=None, help="only rebuild this merchant")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        count = rebuild_customer_summaries(db, merchant_id=args.merchant_id)
+        print(f"Rebuilt {count} customer summaries in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Recompute the precomputed customer segments (lapsed, near_reward, regulars).
+Schedule nightly, e.g. from cron:
+
+    python recompute_segments.py [--merchant-id UUID]
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db.session import SessionLocal
+from app.services.segments import compute_segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--merchant-id", type=uuid.UUID, default=None, help="only recompute this merchant")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        count = compute_segments(db, merchant_id=args.merchant_id)
+        print(f"Recomputed {count} segments in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,36 @@
+import os
+import tempfile
+
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 from app.db.base import Base
-from app.db.session import get_db
+from app.db.session import get_async_db, get_async_database_url, get_db
 from app.main import app
 from app.core.config import settings
 
-# Test database URL
-TEST_DATABASE_URL = "sqlite:///:memory:"
+# Test database URL. A temp file rather than :memory: so the sync engine and
+# the aiosqlite engine used by the async endpoints see the same data.
+TEST_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="rudi-tests-"), "test.db")
+TEST_DATABASE_URL = f"sqlite:///{TEST_DB_PATH}"
 
 engine = create_engine(
     TEST_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: TestClient runs each request on its own event loop, so async
+# connections must not outlive the request that opened them.
+async_engine = create_async_engine(get_async_database_url(TEST_DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base.metadata.create_all(bind=engine)
 
 def override_get_db():
@@ -28,7 +40,12 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_database():
@@ -44,6 +61,11 @@ def db():
     finally:
         db.close()
 
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    from app.core.limiter import limiter
+    limiter.reset()
+
 @pytest.fixture
 def client():
     from fastapi.testclient import TestClient
@@ -1,3 +1,5 @@
+import time
+
 import pytest
 from sqlalchemy.orm import Session
 
@@ -79,4 +81,210 @@ def test_update_profile(client):
     )
     assert response.status_code == 200
     updated_user = response.json()
-    assert updated_user["name"] == "Updated Name"
\ No newline at end of file
+    assert updated_user["name"] == "Updated Name"
+
+
+def test_access_token_carries_principal_claims(client, db: Session):
+    import uuid
+
+    from jose import jwt
+
+    from app.core.config import settings
+    from app.core.security import ALGORITHM
+    from app.models.user import User
+    from app.schemas.user import UserUpdate
+    from app.services.auth import update_user
+    from app.services.principal_cache import principal_cache
+
+    response = client.post("/api/v1/auth/register", json={
+        "email": "principal@example.com",
+        "password": "password123",
+        "role": "merchant",
+    })
+    assert response.status_code == 200
+    token = response.json()["access_token"]
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    assert claims["sub"] == "principal@example.com"
+    assert claims["role"] == "merchant"
+    assert len(claims["merchant_ids"]) == 1
+
+    # Served from the principal cache warmed at registration
+    response = client.get("/api/v1/merchants/rewards/counts", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    principal = principal_cache.get(uuid.UUID(claims["uid"]))
+    assert principal is not None
+    assert [str(merchant_id) for merchant_id in principal.merchant_ids] == claims["merchant_ids"]
+
+    # A role change drops the cached principal, so the next request sees it
+    user = db.query(User).filter(User.email == "principal@example.com").first()
+    update_user(db, user, UserUpdate(email=user.email, role="customer"))
+    assert principal_cache.get(user.id) is None
+    response = client.post(
+        "/api/v1/qr/issue-join",
+        json={"program_id": claims["merchant_ids"][0]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 403
+
+
+def test_login_rehashes_password_with_current_rounds(client, db: Session):
+    from app.core.config import settings
+    from app.core.security import pwd_context
+    from app.models.user import User
+
+    user = create_user(
+        db,
+        UserCreate(email="rehash@example.com", password="password123"),
+        password_hash=pwd_context.hash("password123", rounds=1000),
+    )
+
+    response = client.post("/api/v1/auth/login", json={
+        "email": "rehash@example.com",
+        "password": "password123",
+    })
+    assert response.status_code == 200
+
+    db.expire_all()
+    stored = db.get(User, user.id).password_hash
+    assert f"${settings.PASSWORD_HASH_ROUNDS}$" in stored
+    assert pwd_context.verify("password123", stored)
+    assert not pwd_context.needs_update(stored)
+
+
+def test_login_buffers_last_login_and_provisions_merchant_in_background(client, db: Session):
+    from app.models.merchant import Merchant
+    from app.models.user import User
+    from app.services.last_login import last_login_buffer
+
+    user = create_user(db, UserCreate(email="legacy-merchant@example.com", password="password123", role="merchant"))
+    assert db.query(Merchant).filter(Merchant.owner_user_id == user.id).count() == 0
+
+    response = client.post("/api/v1/auth/login", json={
+        "email": "legacy-merchant@example.com",
+        "password": "password123",
+        "role": "merchant",
+    })
+    assert response.status_code == 200
+
+    # Provisioned by a background task after the response, exactly once
+    client.post("/api/v1/auth/login", json={
+        "email": "legacy-merchant@example.com",
+        "password": "password123",
+        "role": "merchant",
+    })
+    assert db.query(Merchant).filter(Merchant.owner_user_id == user.id).count() == 1
+
+    # The login itself wrote nothing; the timestamp lands on flush
+    db.expire_all()
+    assert db.get(User, user.id).last_login_at is None
+    assert last_login_buffer.flush(db.get_bind()) >= 1
+    db.expire_all()
+    assert db.get(User, user.id).last_login_at is not None
+
+
+def test_last_login_flush_skips_users_deleted_since_login(client, db: Session):
+    from app.models.user import User
+    from app.services.last_login import LastLoginBuffer
+
+    buffer = LastLoginBuffer()
+    kept = create_user(db, UserCreate(email="kept-login@example.com", password="password123"))
+    gone = create_user(db, UserCreate(email="gone-login@example.com", password="password123"))
+    buffer.record(kept.id)
+    buffer.record(gone.id)
+    db.delete(gone)
+    db.commit()
+
+    assert buffer.flush(db.get_bind()) == 2
+    assert buffer.pending() == 0
+    db.expire_all()
+    assert db.get(User, kept.id).last_login_at is not None
+
+    # Later flushes are not blocked by the missing user
+    buffer.record(kept.id)
+    assert buffer.flush(db.get_bind()) == 1
+
+
+def test_verified_token_cache_and_password_change_revocation(client, db: Session):
+    from app.core.security import create_access_token
+    from app.core.token_cache import token_cache
+    from app.schemas.user import UserUpdate
+    from app.services.auth import update_user
+
+    user = create_user(db, UserCreate(email="revoke@example.com", password="password123"))
+    token = create_access_token(subject=user.email)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/v1/customer/memberships", headers=headers).status_code == 200
+    assert token_cache.get(token)["sub"] == "revoke@example.com"
+
+    # Tokens issued before the change are rejected, cached or not
+    update_user(db, user, UserUpdate(email=user.email, password="new-password456"))
+    assert token_cache.get(token) is None
+    assert client.get("/api/v1/customer/memberships", headers=headers).status_code == 401
+
+    # A token issued right after the change, in the same second, still works
+    fresh = {"Authorization": f"Bearer {create_access_token(subject=user.email)}"}
+    assert client.get("/api/v1/customer/memberships", headers=fresh).status_code == 200
+
+
+def test_token_revocations_are_pruned_after_token_lifetime():
+    from app.core.token_cache import VerifiedTokenCache
+
+    cache = VerifiedTokenCache(max_entries=10, revocation_ttl=0.05)
+    cache.revoke_subject("old@example.com")
+    time.sleep(0.06)
+    cache.revoke_subject("new@example.com")
+    assert list(cache._revoked_before) == ["new@example.com"]
+
+
+def test_auth_routes_are_rate_limited_per_email(client):
+    from app.core.limiter import Budget, MemoryBuckets, limiter
+
+    budget = limiter.budgets["auth"]
+    attempt = {"email": "limited@example.com", "password": "wrong", "role": "customer"}
+    for _ in range(int(budget.capacity)):
+        assert client.post("/api/v1/auth/login", json=attempt).status_code == 401
+
+    response = client.post("/api/v1/auth/login", json=attempt)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Other accounts behind the same IP are unaffected
+    other = {**attempt, "email": "not-limited@example.com"}
+    assert client.post("/api/v1/auth/login", json=other).status_code == 401
+
+    # Buckets refill continuously
+    buckets = MemoryBuckets()
+    two_per_second = Budget(capacity=2, refill_per_second=2)
+    assert buckets.take_now([("k", two_per_second)], 0.0) == [0]
+    assert buckets.take_now([("k", two_per_second)], 0.0) == [0]
+    assert buckets.take_now([("k", two_per_second)], 0.0) == [0.5]
+    assert buckets.take_now([("k", two_per_second)], 0.5) == [0]
+
+    # A rejection charges none of the request's buckets
+    one_per_second = Budget(capacity=1, refill_per_second=1)
+    assert buckets.take_now([("a", one_per_second)], 1.0) == [0]
+    assert buckets.take_now([("b", one_per_second), ("a", one_per_second)], 1.0) == [0, 1]
+    assert buckets.take_now([("b", one_per_second)], 1.0) == [0]
+
+
+def test_rate_limit_ip_comes_from_trusted_proxies_only():
+    from starlette.requests import Request
+
+    from app.core.limiter import RateLimiter
+
+    def request(peer, **headers):
+        raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+        return Request({"type": "http", "headers": raw, "client": (peer, 1234)})
+
+    spoofed = {"x_forwarded_for": "1.1.1.1, 203.0.113.7"}
+    assert RateLimiter({}).client_ip(request("198.51.100.1", **spoofed)) == "198.51.100.1"
+
+    behind_proxy = RateLimiter({}, trusted_proxies="10.0.0.0/8")
+    assert behind_proxy.client_ip(request("10.0.0.2", **spoofed)) == "203.0.113.7"
+    assert behind_proxy.client_ip(request("10.0.0.2", x_forwarded_for="203.0.113.7, 10.0.0.9")) == "203.0.113.7"
+    assert behind_proxy.client_ip(request("198.51.100.1", **spoofed)) == "198.51.100.1"
+
+    fly = RateLimiter({}, trusted_proxies="*")
+    assert fly.client_ip(request("172.16.0.1", fly_client_ip="203.0.113.8", **spoofed)) == "203.0.113.8"
+    assert fly.client_ip(request("172.16.0.1", **spoofed)) == "203.0.113.7"
@@ -10,6 +10,8 @@ from app.models.customer_program_membership import CustomerProgramMembership
 from app.models.loyalty_program import LoyaltyProgram
 from app.models.ledger_entry import LedgerEntry, LedgerEntryType
 from app.models.reward import Reward, RewardStatus
+from app.services.customer_summary import rebuild_customer_summaries
+from app.services.membership import update_membership_balance
 
 
 def _create_user(db: Session, email: str, role: UserRole) -> User:
@@ -156,4 +158,459 @@ def test_get_customer_detail_zero_visits(client: TestClient, db: Session):
 
     # Check lifetime metrics handle zero visits
     assert data["lifetime_total_visits"] == 0
-    assert data["lifetime_avg_basket_size"] == 0.0
\ No newline at end of file
+    assert data["lifetime_avg_basket_size"] == 0.0
+
+def test_customer_list_is_keyset_paginated_and_sorted(client: TestClient, db: Session):
+    suffix = uuid.uuid4().hex[:6]
+    owner = _create_user(db, f"merchant_{suffix}@test.com", UserRole.MERCHANT)
+    merchant = _create_merchant(db, owner)
+    program = _create_program(db, merchant)
+
+    for index, stamps in enumerate([3, 7, 1]):
+        customer = _create_user(db, f"customer{index}_{suffix}@test.com", UserRole.CUSTOMER)
+        membership = _create_membership(db, customer, program)
+        for _ in range(stamps):
+            db.add(LedgerEntry(
+                membership_id=membership.id,
+                merchant_id=merchant.id,
+                program_id=program.id,
+                customer_id=customer.id,
+                entry_type=LedgerEntryType.EARN,
+                amount=1,
+            ))
+    db.commit()
+    # Rows written straight to the ledger bypass the summary hooks
+    rebuild_customer_summaries(db, merchant.id)
+
+    headers = {"Authorization": f"Bearer {create_access_token(subject=owner.email)}"}
+    first = client.get(
+        "/api/v1/merchants/customers",
+        params={"sort": "lifetime_stamps", "limit": 2},
+        headers=headers,
+    )
+    assert first.status_code == 200
+    assert [c["lifetime_stamps"] for c in first.json()] == [7, 3]
+    assert first.json()[0]["programs"][0]["id"] == str(program.id)
+
+    second = client.get(
+        "/api/v1/merchants/customers",
+        params={"sort": "lifetime_stamps", "limit": 2, "cursor": first.headers["X-Next-Cursor"]},
+        headers=headers,
+    )
+    assert [c["lifetime_stamps"] for c in second.json()] == [1]
+    assert "X-Next-Cursor" not in second.headers
+
+    filtered = client.get(
+        "/api/v1/merchants/customers",
+        params={"sort": "name", "min_lifetime_stamps": 2},
+        headers=headers,
+    )
+    assert [c["email"] for c in filtered.json()] == [f"customer0_{suffix}@test.com", f"customer1_{suffix}@test.com"]
+
+    # LIKE wildcards in q are matched literally
+    searched = client.get("/api/v1/merchants/customers", params={"q": f"1_{suffix}"}, headers=headers)
+    assert [c["email"] for c in searched.json()] == [f"customer1_{suffix}@test.com"]
+    wildcard = client.get("/api/v1/merchants/customers", params={"q": "%"}, headers=headers)
+    assert wildcard.json() == []
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/v1/merchants/customers", params=params, headers=headers)
+        seen += [c["id"] for c in page.json()]
+        cursor = page.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 3
+
+    bad = client.get("/api/v1/merchants/customers", params={"cursor": "nope"}, headers=headers)
+    assert bad.status_code == 400
+
+
+def test_customer_search_matches_name_email_and_phone(client: TestClient, db: Session):
+    from app.services.customer_search import customer_search_cache
+
+    suffix = uuid.uuid4().hex[:6]
+    owner = _create_user(db, f"merchant_{suffix}@test.com", UserRole.MERCHANT)
+    merchant = _create_merchant(db, owner)
+    program = _create_program(db, merchant)
+    people = [("Alice Walker", "555-0101"), ("Bob Alison", "555-0202"), ("Carol King", None)]
+    for index, (name, phone) in enumerate(people):
+        customer = _create_user(db, f"shopper{index}_{suffix}@test.com", UserRole.CUSTOMER)
+        customer.name = name
+        customer.phone = phone
+        _create_membership(db, customer, program)
+    db.commit()
+    rebuild_customer_summaries(db, merchant.id)
+    outsider = _create_user(db, f"alice_{suffix}@test.com", UserRole.CUSTOMER)
+    outsider.name = "Alice Elsewhere"
+    db.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token(subject=owner.email)}"}
+    # Cold: answered by the database, then the index is warmed in the background
+    cold = client.get("/api/v1/merchants/customers/search", params={"q": "alis"}, headers=headers)
+    assert cold.status_code == 200
+    assert [c["name"] for c in cold.json()] == ["Bob Alison"]
+    assert customer_search_cache.get(merchant.id) is not None
+
+    def names(q):
+        response = client.get("/api/v1/merchants/customers/search", params={"q": q}, headers=headers)
+        return sorted(c["name"] for c in response.json())
+
+    assert names("ali") == ["Alice Walker", "Bob Alison"]
+    assert names("king") == ["Carol King"]
+    assert names("0202") == ["Bob Alison"]
+    assert names("555 0101") == ["Alice Walker"]
+    # Digits inside a mixed query are not matched against phone numbers
+    assert names(f"shopper1_{suffix[:2]}") == ["Bob Alison"]
+    assert names("walker5") == []
+    assert names(f"shopper2_{suffix}") == ["Carol King"]
+    assert names("zzz") == []
+
+
+def test_customer_ledger_timeline_is_keyset_paginated(client: TestClient, db: Session):
+    from datetime import datetime, timedelta
+
+    suffix = uuid.uuid4().hex[:6]
+    owner = _create_user(db, f"merchant_{suffix}@test.com", UserRole.MERCHANT)
+    merchant = _create_merchant(db, owner)
+    program = _create_program(db, merchant)
+    customer = _create_user(db, f"regular_{suffix}@test.com", UserRole.CUSTOMER)
+    membership = _create_membership(db, customer, program)
+    start = datetime(2026, 1, 1)
+    for index in range(30):
+        db.add(LedgerEntry(
+            membership_id=membership.id,
+            merchant_id=merchant.id,
+            program_id=program.id,
+            customer_id=customer.id,
+            entry_type=LedgerEntryType.EARN,
+            amount=1,
+            # Pairs share a timestamp so the id tie-break is exercised
+            created_at=start + timedelta(hours=index // 2),
+        ))
+    db.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token(subject=owner.email)}"}
+    detail = client.get(f"/api/v1/merchants/customers/{customer.id}", headers=headers).json()
+    assert len(detail["recent_activity"]) == 25
+    assert detail["recent_activity"][0]["program_name"] == program.name
+    assert detail["recent_activity_next_cursor"]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 7, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/api/v1/merchants/customers/{customer.id}/ledger", params=params, headers=headers)
+        assert page.status_code == 200
+        seen += page.json()
+        cursor = page.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len({entry["id"] for entry in seen}) == 30
+    timestamps = [entry["timestamp"] for entry in seen]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+    rest = client.get(
+        f"/api/v1/merchants/customers/{customer.id}/ledger",
+        params={"cursor": detail["recent_activity_next_cursor"]},
+        headers=headers,
+    )
+    assert len(rest.json()) == 5
+
+    bad = client.get(f"/api/v1/merchants/customers/{customer.id}/ledger", params={"cursor": "x"}, headers=headers)
+    assert bad.status_code == 400
+
+
+def test_exports_stream_csv_ndjson_and_gzip(client: TestClient, db: Session):
+    import csv
+    import gzip
+    import io
+    import json
+    from datetime import datetime
+
+    suffix = uuid.uuid4().hex[:6]
+    owner = _create_user(db, f"merchant_{suffix}@test.com", UserRole.MERCHANT)
+    merchant = _create_merchant(db, owner)
+    program = _create_program(db, merchant)
+    customers = []
+    for index in range(3):
+        customer = _create_user(db, f"export{index}_{suffix}@test.com", UserRole.CUSTOMER)
+        membership = _create_membership(db, customer, program)
+        db.add(LedgerEntry(
+            membership_id=membership.id,
+            merchant_id=merchant.id,
+            program_id=program.id,
+            customer_id=customer.id,
+            entry_type=LedgerEntryType.EARN,
+            amount=index + 1,
+            created_at=datetime(2026, 3, 1 + index),
+        ))
+        db.add(Reward(
+            id=uuid.uuid4(),
+            customer_id=customer.id,
+            program_id=program.id,
+            merchant_id=merchant.id,
+            enrollment_id=membership.id,
+            status=RewardStatus.REDEEMED if index else RewardStatus.REDEEMABLE,
+            cycle=1,
+            reached_at=datetime(2026, 3, 1 + index),
+        ))
+        customers.append(customer)
+    db.commit()
+    rebuild_customer_summaries(db, merchant.id)
+    headers = {"Authorization": f"Bearer {create_access_token(subject=owner.email)}"}
+
+    response = client.get("/api/v1/merchants/customers/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="customers.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert sorted(row["email"] for row in rows) == sorted(c.email for c in customers)
+    assert {row["lifetime_stamps"] for row in rows} == {"1", "2", "3"}
+
+    response = client.get("/api/v1/merchants/ledger/export", params={"format": "ndjson", "gzip": True}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    lines = gzip.decompress(response.content).decode().splitlines()
+    entries = [json.loads(line) for line in lines]
+    assert [entry["amount"] for entry in entries] == [1, 2, 3]
+    assert entries[0]["program_name"] == program.name
+
+    response = client.get(
+        "/api/v1/merchants/rewards/export", params={"status": "redeemed"}, headers=headers
+    )
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["status"] for row in rows] == ["redeemed", "redeemed"]
+    assert rows[0]["customer_email"] == customers[2].email
+
+
+def test_delete_customer_soft_deletes_then_purges_in_chunks(client: TestClient, db: Session):
+    from app.models.purge_job import PurgeJob, PurgeJobStatus
+    from app.models.stamp import Stamp
+    from app.services.purge import run_purge_job, soft_delete_memberships
+
+    suffix = uuid.uuid4().hex[:6]
+    owner = _create_user(db, f"merchant_{suffix}@test.com", UserRole.MERCHANT)
+    merchant = _create_merchant(db, owner)
+    program = _create_program(db, merchant)
+    customer = _create_user(db, f"leaver_{suffix}@test.com", UserRole.CUSTOMER)
+    membership = _create_membership(db, customer, program)
+    for index in range(7):
+        db.add(LedgerEntry(
+            membership_id=membership.id,
+            merchant_id=merchant.id,
+            program_id=program.id,
+            customer_id=customer.id,
+            entry_type=LedgerEntryType.EARN,
+            amount=1,
+        ))
+        db.add(Stamp(
+            enrollment_id=membership.id,
+            program_id=program.id,
+            merchant_id=merchant.id,
+            customer_id=customer.id,
+            tx_id=f"tx-{suffix}-{index}",
+        ))
+    db.commit()
+
+    # Soft delete alone hides the membership and lets the customer rejoin
+    membership_id = membership.id
+    job = soft_delete_memberships(db, [membership], merchant.id, customer.id)
+    db.commit()
+    assert db.query(CustomerProgramMembership).filter_by(customer_user_id=customer.id).count() == 0
+    hidden = db.query(CustomerProgramMembership).execution_options(include_deleted=True)
+    assert hidden.filter_by(customer_user_id=customer.id).one().id == membership_id
+    rejoined = _create_membership(db, customer, program)
+    assert job.status == PurgeJobStatus.PENDING
+
+    run_purge_job(db.get_bind(), job.id, chunk_size=3, pause_ms=0)
+    db.expire_all()
+    job = db.get(PurgeJob, job.id)
+    assert job.status == PurgeJobStatus.DONE
+    assert job.progress == {"stamps": 7, "ledger_entries": 7, "memberships": 1}
+    assert db.query(LedgerEntry).filter_by(membership_id=membership_id).count() == 0
+    assert db.query(CustomerProgramMembership).filter_by(customer_user_id=customer.id).one().id == rejoined.id
+
+    # Through the API the purge runs as a background task after the response
+    headers = {"Authorization": f"Bearer {create_access_token(subject=owner.email)}"}
+    response = client.delete(f"/api/v1/merchants/customers/{customer.id}", headers=headers)
+    assert response.status_code == 200
+    job_id = response.json()["purge_job_id"]
+    status = client.get(f"/api/v1/merchants/purge-jobs/{job_id}", headers=headers).json()
+    assert status["status"] == "done"
+    assert status["progress"]["memberships"] == 1
+    assert db.query(CustomerProgramMembership).filter_by(customer_user_id=customer.id).count() == 0
+
+
+def test_rewards_list_is_keyset_paginated_filtered_and_counted(client: TestClient, db: Session):
+    from datetime import datetime, timedelta
+
+    suffix = uuid.uuid4().hex[:6]
+    owner = _create_user(db, f"merchant_{suffix}@test.com", UserRole.MERCHANT)
+    merchant = _create_merchant(db, owner)
+    program = _create_program(db, merchant)
+    start = datetime(2026, 5, 1)
+    statuses = [RewardStatus.REDEEMED] * 3 + [RewardStatus.REDEEMABLE] * 2 + [RewardStatus.EXPIRED, RewardStatus.INACTIVE]
+    for index, reward_status in enumerate(statuses):
+        customer = _create_user(db, f"rewarded{index}_{suffix}@test.com", UserRole.CUSTOMER)
+        membership = _create_membership(db, customer, program)
+        db.add(Reward(
+            id=uuid.uuid4(),
+            customer_id=customer.id,
+            program_id=program.id,
+            merchant_id=merchant.id,
+            enrollment_id=membership.id,
+            status=reward_status,
+            cycle=1,
+            reached_at=start + timedelta(days=index),
+            redeemed_at=start + timedelta(days=10 - index) if reward_status == RewardStatus.REDEEMED else None,
+        ))
+    db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token(subject=owner.email)}"}
+
+    counts = client.get("/api/v1/merchants/rewards/counts", headers=headers).json()
+    assert counts == {"redeemable": 2, "redeemed": 3, "expired": 1}
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/v1/merchants/rewards", params=params, headers=headers)
+        assert page.status_code == 200
+        seen += page.json()
+        cursor = page.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len({reward["id"] for reward in seen}) == 6
+    assert [reward["status"] for reward in seen[:2]] == ["expired", "redeemable"]
+
+    redeemed = client.get(
+        "/api/v1/merchants/rewards", params={"status": "redeemed", "sort": "redeemed_at"}, headers=headers
+    ).json()
+    assert [reward["customer"] for reward in redeemed] == [f"rewarded{i}_{suffix}" for i in range(3)]
+    assert all(reward["program_id"] == str(program.id) for reward in redeemed)
+
+    bad = client.get("/api/v1/merchants/rewards", params={"cursor": "nope"}, headers=headers)
+    assert bad.status_code == 400
+
+
+def test_customer_segments_are_precomputed_and_refreshed_when_stale(client: TestClient, db: Session):
+    from datetime import datetime, timedelta
+    from app.models.customer_segment import CustomerSegment
+    from app.services.segments import mark_segments_stale
+
+    suffix = uuid.uuid4().hex[:6]
+    owner = _create_user(db, f"merchant_{suffix}@test.com", UserRole.MERCHANT)
+    merchant = _create_merchant(db, owner)
+    program = _create_program(db, merchant)
+    now = datetime.utcnow()
+    customers = {}
+    for key, balance, visit_ages in [
+        ("lapsed", 2, [60]),
+        ("near", 9, [20]),
+        ("regular", 3, [1, 2, 3, 4, 5]),
+        ("casual", 4, [10]),
+    ]:
+        customer = _create_user(db, f"{key}_{suffix}@test.com", UserRole.CUSTOMER)
+        membership = _create_membership(db, customer, program)
+        membership.current_balance = balance
+        for age in visit_ages:
+            db.add(LedgerEntry(
+                membership_id=membership.id,
+                merchant_id=merchant.id,
+                program_id=program.id,
+                customer_id=customer.id,
+                entry_type=LedgerEntryType.EARN,
+                amount=1,
+                created_at=now - timedelta(days=age),
+            ))
+        customers[key] = customer
+    db.commit()
+    rebuild_customer_summaries(db, merchant.id)
+    headers = {"Authorization": f"Bearer {create_access_token(subject=owner.email)}"}
+
+    segments = client.get("/api/v1/merchants/segments", headers=headers).json()
+    assert {segment["name"]: segment["count"] for segment in segments} == {
+        "lapsed": 1,
+        "near_reward": 1,
+        "regulars": 1,
+    }
+    for name, key in [("lapsed", "lapsed"), ("near_reward", "near"), ("regulars", "regular")]:
+        members = client.get(f"/api/v1/merchants/segments/{name}/customers", headers=headers).json()
+        assert [member["email"] for member in members] == [customers[key].email]
+
+    # Served from the stored arrays until marked stale and past the refresh interval
+    membership = db.query(CustomerProgramMembership).filter_by(customer_user_id=customers["casual"].id).one()
+    membership.current_balance = 9
+    db.commit()
+    assert client.get("/api/v1/merchants/segments", headers=headers).json()[1]["count"] == 1
+    mark_segments_stale(db, merchant.id)
+    db.query(CustomerSegment).filter_by(merchant_id=merchant.id).update(
+        {"computed_at": now - timedelta(hours=1)}
+    )
+    db.commit()
+    page = client.get("/api/v1/merchants/segments/near_reward/customers", params={"limit": 1}, headers=headers)
+    assert len(page.json()) == 1
+    rest = client.get(
+        "/api/v1/merchants/segments/near_reward/customers",
+        params={"cursor": page.headers["X-Next-Cursor"]},
+        headers=headers,
+    )
+    assert {member["email"] for member in page.json() + rest.json()} == {
+        customers["near"].email,
+        customers["casual"].email,
+    }
+
+    assert client.get("/api/v1/merchants/segments/unknown/customers", headers=headers).status_code == 404
+
+
+def test_customer_redeem_updates_merchant_customer_list(client: TestClient, db: Session):
+    suffix = uuid.uuid4().hex[:6]
+    owner = _create_user(db, f"merchant_{suffix}@test.com", UserRole.MERCHANT)
+    merchant = _create_merchant(db, owner)
+    program = _create_program(db, merchant)
+    customer = _create_user(db, f"customer_{suffix}@test.com", UserRole.CUSTOMER)
+    membership = _create_membership(db, customer, program)
+    membership.current_balance = 12
+    db.commit()
+    rebuild_customer_summaries(db, merchant.id)
+
+    redeemed = client.post(
+        f"/api/v1/programs/{program.id}/redeem",
+        json={"amount": 10},
+        headers={"Authorization": f"Bearer {create_access_token(subject=customer.email)}"},
+    )
+    assert redeemed.status_code == 200
+
+    listed = client.get(
+        "/api/v1/merchants/customers",
+        headers={"Authorization": f"Bearer {create_access_token(subject=owner.email)}"},
+    )
+    assert listed.status_code == 200
+    [row] = listed.json()
+    assert row["totalStamps"] == 2
+    assert row["programs"][0]["progress"] == 2
+
+    # A redeem that fails part way (this cycle already has a reward row)
+    # leaves the balance and the list in agreement
+    update_membership_balance(db, membership.id, 12)
+    db.add(Reward(
+        enrollment_id=membership.id,
+        program_id=program.id,
+        merchant_id=merchant.id,
+        customer_id=customer.id,
+        cycle=2,
+    ))
+    db.commit()
+    failed = client.post(
+        f"/api/v1/programs/{program.id}/redeem",
+        json={"amount": 10},
+        headers={"Authorization": f"Bearer {create_access_token(subject=customer.email)}"},
+    )
+    assert failed.status_code == 400
+    db.expire_all()
+    assert db.get(CustomerProgramMembership, membership.id).current_balance == 12
+    listed = client.get(
+        "/api/v1/merchants/customers",
+        headers={"Authorization": f"Bearer {create_access_token(subject=owner.email)}"},
+    )
+    assert listed.json()[0]["totalStamps"] == 12
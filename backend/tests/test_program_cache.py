@@ -0,0 +1,71 @@
+import uuid
+
+from app.schemas.location import LocationCreate, LocationUpdate
+from app.schemas.loyalty_program import LoyaltyProgramCreate, LoyaltyProgramUpdate
+from app.schemas.merchant import MerchantCreate
+from app.schemas.user import UserCreate
+from app.services.auth import create_user
+from app.services.loyalty_program import create_loyalty_program, update_loyalty_program
+from app.services.merchant import create_location, create_merchant, update_location
+from app.services.program_cache import get_cached_program, program_cache
+
+
+def _setup_program(db):
+    owner = create_user(
+        db,
+        UserCreate(email=f"cache_{uuid.uuid4().hex[:6]}@test.com", password="pass", role="merchant"),
+    )
+    merchant = create_merchant(db, MerchantCreate(display_name="Cache Merchant"), owner_user_id=owner.id)
+    location = create_location(
+        db,
+        LocationCreate(name="Front", address="1 Cache St", lat=1.0, lng=2.0),
+        merchant_id=merchant.id,
+    )
+    program = create_loyalty_program(
+        db,
+        LoyaltyProgramCreate(
+            name="Cache Card",
+            logic_type="punch_card",
+            earn_rule={},
+            redeem_rule={},
+        ),
+        merchant_id=merchant.id,
+    )
+    return owner, merchant, location, program
+
+
+def test_cached_program_is_reused_until_invalidated(db):
+    owner, merchant, location, program = _setup_program(db)
+
+    first = get_cached_program(db, program.id)
+    assert first.merchant.owner_user_id == owner.id
+    assert first.merchant.locations[0].lat == 1.0
+    assert get_cached_program(db, program.id) is first
+
+    update_loyalty_program(db, program.id, LoyaltyProgramUpdate(name="Renamed", logic_type="punch_card"))
+    renamed = get_cached_program(db, program.id)
+    assert renamed is not first
+    assert renamed.name == "Renamed"
+
+    update_location(db, location.id, LocationUpdate(name="Front", address="1 Cache St", lat=5.0, lng=2.0))
+    assert get_cached_program(db, program.id).merchant.locations[0].lat == 5.0
+
+
+def test_stale_fill_is_discarded_after_invalidation(db):
+    _, _, _, program = _setup_program(db)
+    program_cache.invalidate_program(program.id)
+
+    version = program_cache.version
+    snapshot = get_cached_program(db, program.id)
+    program_cache.invalidate_program(program.id)
+    program_cache.put(snapshot, version)
+
+    assert program_cache.get(program.id) is None
+
+
+def test_active_only_hides_inactive_programs(db):
+    _, _, _, program = _setup_program(db)
+    update_loyalty_program(db, program.id, LoyaltyProgramUpdate(name="Cache Card", logic_type="punch_card", is_active=False))
+
+    assert get_cached_program(db, program.id, active_only=True) is None
+    assert get_cached_program(db, program.id) is not None
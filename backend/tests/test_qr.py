@@ -8,6 +8,7 @@ from app.schemas.user import UserCreate
 from app.schemas.merchant import MerchantCreate
 from app.schemas.location import LocationCreate
 from app.schemas.loyalty_program import LoyaltyProgramCreate
+from app.core.config import settings
 
 
 @pytest.fixture
@@ -99,6 +100,43 @@ def test_scan_stamp(client, merchant_token, customer_token):
     assert data["new_balance"] == 1
 
 
+def test_scan_reports_stage_timings(client, merchant_token, customer_token, monkeypatch):
+    headers_merchant = {"Authorization": f"Bearer {merchant_token['token']}"}
+    headers_customer = {"Authorization": f"Bearer {customer_token}"}
+    join_token = client.post("/api/v1/qr/issue-join", json={"program_id": str(merchant_token['program_id'])}, headers=headers_merchant).json()["token"]
+    client.post("/api/v1/qr/scan-join", json={"token": join_token}, headers=headers_customer)
+
+    stamp_token = client.post("/api/v1/qr/issue-stamp", json={"program_id": str(merchant_token['program_id'])}, headers=headers_merchant).json()["token"]
+    response = client.post("/api/v1/qr/scan", json={"token": stamp_token, "lat": 40.0, "lng": -74.0}, headers=headers_customer)
+    assert response.status_code == 200
+
+    stages = [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")]
+    assert stages[:5] == ["token_verify", "redis_check", "nonce_claim", "program_load", "geofence"]
+    assert {"membership_lookup", "issue_stamp", "broadcast"} <= set(stages)
+
+    # A replayed token is rejected, and the error still reports its timings
+    replayed = client.post("/api/v1/qr/scan", json={"token": stamp_token, "lat": 40.0, "lng": -74.0}, headers=headers_customer)
+    assert replayed.status_code >= 400
+    assert replayed.headers["Server-Timing"].startswith("token_verify;dur=")
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    metrics = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert 'rudi_scan_stage_duration_seconds_count{stage="issue_stamp"}' in metrics.text
+
+
+def test_metrics_scrape_needs_the_configured_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 404
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 404
+    metrics = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert "# TYPE rudi_scan_stage_duration_seconds histogram" in metrics.text
+
+
 def test_scan_redeem(client, merchant_token, customer_token):
     # Join and earn stamps
     headers_merchant = {"Authorization": f"Bearer {merchant_token['token']}"}
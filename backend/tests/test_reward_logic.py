@@ -218,3 +218,84 @@ def test_reward_expire_blocks_redeem(client, reward_env, db: Session):
         headers=merchant_headers,
     )
     assert redeem_attempt.status_code == 409 or redeem_attempt.status_code == 410
+
+
+def test_customer_redemptions_are_listed_in_one_request(client, reward_env):
+    enrollment_id, merchant_headers, customer_headers = _enroll_customer(client, reward_env)
+    for idx in range(reward_env["program"].stamps_required):
+        client.post(
+            f"/api/v1/enrollments/{enrollment_id}/stamps",
+            json={"tx_id": f"tx-list-{idx}"},
+            headers=merchant_headers,
+        )
+
+    program_id = str(reward_env["program"].id)
+    batched = client.get("/api/v1/customer/redemptions", headers=customer_headers)
+    assert batched.status_code == 200
+    assert [(r["program_id"], r["status"]) for r in batched.json()] == [(program_id, "claimed")]
+
+    per_program = client.get(f"/api/v1/programs/{program_id}/redemptions", headers=customer_headers)
+    assert per_program.json() == batched.json()
+
+    redeemed = client.get(
+        "/api/v1/customer/redemptions",
+        params={"status": "redeemed"},
+        headers=customer_headers,
+    )
+    assert redeemed.json() == []
+
+
+def test_customer_summary_tracks_stamps_redeem_and_leave(client, reward_env, db: Session):
+    from app.models import MerchantCustomerSummary
+    from app.services.customer_summary import rebuild_customer_summaries
+
+    enrollment_id, merchant_headers, customer_headers = _enroll_customer(client, reward_env)
+    for idx in range(reward_env["program"].stamps_required):
+        client.post(
+            f"/api/v1/enrollments/{enrollment_id}/stamps",
+            json={"tx_id": f"tx-summary-{idx}"},
+            headers=merchant_headers,
+        )
+    reward = client.get(f"/api/v1/enrollments/{enrollment_id}/reward", headers=customer_headers).json()["reward"]
+    client.post(
+        f"/api/v1/rewards/{reward['id']}/redeem",
+        json={"voucher_code": reward["voucher_code"]},
+        headers=merchant_headers,
+    )
+
+    key = (reward_env["merchant"].id, reward_env["customer_id"])
+    db.expire_all()
+    summary = db.get(MerchantCustomerSummary, key)
+    incremental = (summary.lifetime_stamps, summary.visits, summary.redemptions, summary.programs)
+    assert incremental[:3] == (2, 2, 1)
+
+    rebuild_customer_summaries(db, reward_env["merchant"].id)
+    rebuilt = db.get(MerchantCustomerSummary, key)
+    assert (rebuilt.lifetime_stamps, rebuilt.visits, rebuilt.redemptions, rebuilt.programs) == incremental
+
+    left = client.delete(f"/api/v1/customer/memberships/{reward_env['program'].id}", headers=customer_headers)
+    assert left.status_code == 200
+    db.expire_all()
+    assert db.get(MerchantCustomerSummary, key) is None
+
+
+def test_customer_summary_progress_is_read_from_memberships(client, reward_env, db: Session):
+    from app.models import MerchantCustomerSummary
+
+    enrollment_id, merchant_headers, _ = _enroll_customer(client, reward_env)
+    key = (reward_env["merchant"].id, reward_env["customer_id"])
+    # A writer that lost a race left a stale copy of the programs column
+    summary = db.get(MerchantCustomerSummary, key)
+    summary.programs = {str(reward_env["program"].id): 40, str(uuid.uuid4()): 7}
+    summary.current_stamps = 47
+    db.commit()
+
+    client.post(
+        f"/api/v1/enrollments/{enrollment_id}/stamps",
+        json={"tx_id": "tx-progress"},
+        headers=merchant_headers,
+    )
+    db.expire_all()
+    summary = db.get(MerchantCustomerSummary, key)
+    assert summary.programs == {str(reward_env["program"].id): 1}
+    assert summary.current_stamps == 1
@@ -0,0 +1,374 @@
+import asyncio
+import json
+import time
+
+from app.api.v1.websocket import ConnectionManager, get_websocket_manager
+from app.services.pubsub import LoopbackBroker, RedisBroker
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.accepted = False
+        self.frames = []
+        self.sent = []
+
+    async def accept(self):
+        self.accepted = True
+
+    async def send_text(self, frame):
+        self.frames.append(frame)
+        self.sent.append(json.loads(frame))
+
+
+class BrokenWebSocket(FakeWebSocket):
+    async def send_text(self, frame):
+        raise RuntimeError("socket closed")
+
+
+class StalledWebSocket(FakeWebSocket):
+    def __init__(self):
+        super().__init__()
+        self.close_code = None
+
+    async def send_text(self, frame):
+        await asyncio.sleep(3600)
+
+    async def close(self, code=1000, reason=None):
+        self.close_code = code
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_broadcast_reaches_connection_held_by_another_worker():
+    async def scenario():
+        broker = LoopbackBroker()
+        worker_a = ConnectionManager(broker, coalesce_window=0)
+        worker_b = ConnectionManager(broker, coalesce_window=0)
+        socket = FakeWebSocket()
+        await worker_b.connect("customer_42", socket)
+
+        await worker_a.broadcast_stamp_update("42", "program-1", 3)
+        await _settle()
+        return socket
+
+    socket = asyncio.run(scenario())
+    assert socket.accepted
+    assert socket.sent == [
+        {"type": "stamp_update", "program_id": "program-1", "new_balance": 3, "timestamp": "now", "seq": 1}
+    ]
+
+
+def test_redis_broker_numbers_local_fallback_frames():
+    async def scenario():
+        # Nothing listens on port 1, so every publish falls back to local delivery
+        broker = RedisBroker("redis://127.0.0.1:1")
+        received = []
+
+        async def handler(channel, message):
+            received.append(message["seq"])
+
+        await broker.subscribe("customer_42", handler)
+        broker._last_seq["customer_42"] = 7
+        await broker.publish("customer_42", {"type": "stamp_update"})
+        await broker.publish("customer_42", {"type": "stamp_update"})
+        await broker.close()
+        return received
+
+    assert asyncio.run(scenario()) == [8, 9]
+
+
+def test_channels_unsubscribe_when_last_connection_leaves():
+    async def scenario():
+        broker = LoopbackBroker()
+        manager = ConnectionManager(broker, coalesce_window=0, resume_grace=0)
+        first, second = FakeWebSocket(), FakeWebSocket()
+        await manager.connect("merchant_7", first)
+        await manager.connect("merchant_7", second)
+        subscribed = "merchant_7" in broker._handlers
+
+        await manager.disconnect("merchant_7", first)
+        still_subscribed = "merchant_7" in broker._handlers
+        await manager.disconnect("merchant_7", second)
+        return subscribed, still_subscribed, "merchant_7" in broker._handlers
+
+    assert asyncio.run(scenario()) == (True, True, False)
+
+
+def test_broken_connection_is_dropped_on_send():
+    async def scenario():
+        broker = LoopbackBroker()
+        manager = ConnectionManager(broker, coalesce_window=0)
+        healthy, broken = FakeWebSocket(), BrokenWebSocket()
+        await manager.connect("customer_9", healthy)
+        await manager.connect("customer_9", broken)
+
+        await manager.broadcast_notification("9", {"title": "hi"})
+        await _settle()
+        return manager, healthy
+
+    manager, healthy = asyncio.run(scenario())
+    assert [c.websocket for c in manager.active_connections["customer_9"]] == [healthy]
+    assert healthy.sent == [{"type": "notification", "data": {"title": "hi"}, "seq": 1}]
+
+
+def test_sync_broadcast_from_worker_thread_is_sent_on_server_loop():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), coalesce_window=0)
+        socket = FakeWebSocket()
+        await manager.connect("customer_5", socket)
+
+        await asyncio.to_thread(manager.broadcast_stamp_update_sync, "5", "program-1", 4)
+        await _settle()
+        await manager.stop()
+        return socket
+
+    socket = asyncio.run(scenario())
+    assert [m["new_balance"] for m in socket.sent] == [4]
+
+
+def test_queued_updates_for_same_key_are_coalesced():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), coalesce_window=0)
+        socket = FakeWebSocket()
+        await manager.connect("customer_5", socket)
+
+        for balance in (1, 2, 3):
+            manager.broadcast_stamp_update_sync("5", "program-1", balance)
+        manager.broadcast_stamp_update_sync("5", "program-2", 9)
+        await _settle()
+        await manager.stop()
+        return socket
+
+    socket = asyncio.run(scenario())
+    assert [(m["program_id"], m["new_balance"]) for m in socket.sent] == [("program-1", 3), ("program-2", 9)]
+
+
+def test_full_outbox_drops_oldest_message():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), outbox_capacity=2, coalesce_window=0)
+        socket = FakeWebSocket()
+        await manager.connect("customer_5", socket)
+
+        for index in range(3):
+            manager.enqueue("customer_5", {"type": "notification", "data": {"n": index}})
+        await _settle()
+        await manager.stop()
+        return socket
+
+    socket = asyncio.run(scenario())
+    assert [m["data"]["n"] for m in socket.sent] == [1, 2]
+
+
+def test_stalled_client_is_evicted_without_delaying_others():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), send_timeout=0.05, coalesce_window=0)
+        healthy, stalled = FakeWebSocket(), StalledWebSocket()
+        await manager.connect("merchant_3", stalled)
+        await manager.connect("merchant_3", healthy)
+
+        await manager.broadcast_merchant_reward_update("3", {"reward_id": "r1"})
+        await _settle()
+        delivered_before_timeout = list(healthy.sent)
+        await asyncio.sleep(0.1)
+        await _settle()
+        return manager, healthy, stalled, delivered_before_timeout
+
+    manager, healthy, stalled, delivered = asyncio.run(scenario())
+    assert [m["reward_id"] for m in delivered] == ["r1"]
+    assert stalled.close_code == 1013
+    assert [c.websocket for c in manager.active_connections["merchant_3"]] == [healthy]
+
+
+def test_client_with_full_outbox_is_evicted():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), connection_outbox_size=2, coalesce_window=0)
+        stalled = StalledWebSocket()
+        await manager.connect("customer_8", stalled)
+
+        for balance in range(4):
+            await manager.broadcast_stamp_update("8", "program-1", balance)
+        await _settle()
+        return manager, stalled
+
+    manager, stalled = asyncio.run(scenario())
+    assert stalled.close_code == 1013
+    assert "customer_8" not in manager.active_connections
+
+
+def test_debounce_window_sends_latest_state_per_key():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), coalesce_window=0.02)
+        socket = FakeWebSocket()
+        await manager.connect("customer_5", socket)
+
+        for balance in (1, 2, 3):
+            await manager.broadcast_stamp_update("5", "program-1", balance)
+        await manager.broadcast_reward_status("5", {"reward_id": "r1", "status": "redeemable"})
+        await _settle()
+        held = list(socket.sent)
+        await asyncio.sleep(0.05)
+        await _settle()
+        return held, socket
+
+    held, socket = asyncio.run(scenario())
+    assert held == []
+    assert [(m["type"], m.get("new_balance")) for m in socket.sent] == [("stamp_update", 3), ("reward_status", None)]
+
+
+def test_uncoalesced_frame_is_not_overtaken_by_held_updates():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), coalesce_window=0.02)
+        socket = FakeWebSocket()
+        await manager.connect("customer_6", socket)
+
+        await manager.broadcast_stamp_update("6", "program-1", 4)
+        await manager.broadcast_membership_left("6", {"program_id": "program-1"})
+        await _settle()
+        await asyncio.sleep(0.05)
+        await _settle()
+        return socket
+
+    socket = asyncio.run(scenario())
+    assert [m["type"] for m in socket.sent] == ["stamp_update", "membership_left"]
+    assert [m["seq"] for m in socket.sent] == [1, 2]
+
+
+def test_queued_update_does_not_jump_ahead_of_later_frame():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), coalesce_window=0)
+        socket = FakeWebSocket()
+        await manager.connect("customer_6", socket)
+        manager.bind_loop()
+
+        manager.broadcast_stamp_update_sync("6", "program-1", 1)
+        manager.broadcast_membership_left_sync("6", {"program_id": "program-1"})
+        manager.broadcast_stamp_update_sync("6", "program-1", 0)
+        await asyncio.sleep(0.05)
+        await manager.stop()
+        return socket
+
+    socket = asyncio.run(scenario())
+    assert [(m["type"], m.get("new_balance")) for m in socket.sent] == [
+        ("stamp_update", 1),
+        ("membership_left", None),
+        ("stamp_update", 0),
+    ]
+
+
+def test_merchant_rush_is_sent_as_one_batch_frame():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), coalesce_window=0.02)
+        socket = FakeWebSocket()
+        await manager.connect("merchant_1", socket)
+
+        for customer_id in ("c1", "c2"):
+            for _ in range(2):
+                await manager.broadcast_merchant_customer_update(
+                    "1", {"customer_id": customer_id, "program_id": "p1", "delta": 1, "new_balance": 5}
+                )
+        await asyncio.sleep(0.05)
+        await _settle()
+        return socket
+
+    socket = asyncio.run(scenario())
+    assert len(socket.sent) == 1
+    batch = socket.sent[0]
+    assert batch["type"] == "customer_stamp_batch"
+    assert [(u["customer_id"], u["delta"]) for u in batch["updates"]] == [("c1", 2), ("c2", 2)]
+
+
+def test_reconnect_with_last_seq_replays_missed_frames():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), coalesce_window=0)
+        first = FakeWebSocket()
+        await manager.connect("customer_4", first)
+        await manager.broadcast_stamp_update("4", "program-1", 1)
+        await _settle()
+        await manager.disconnect("customer_4", first)
+
+        await manager.broadcast_stamp_update("4", "program-1", 2)
+        await manager.broadcast_stamp_update("4", "program-1", 3)
+        second = FakeWebSocket()
+        await manager.connect("customer_4", second, last_seq=first.sent[-1]["seq"])
+        await _settle()
+        await manager.stop()
+        return second
+
+    second = asyncio.run(scenario())
+    assert [(m["seq"], m["new_balance"]) for m in second.sent] == [(2, 2), (3, 3)]
+
+
+def test_gap_larger_than_buffer_requires_resync():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), coalesce_window=0, replay_size=2)
+        first = FakeWebSocket()
+        await manager.connect("customer_4", first)
+        await manager.disconnect("customer_4", first)
+        for balance in range(1, 6):
+            await manager.broadcast_stamp_update("4", "program-1", balance)
+
+        second = FakeWebSocket()
+        await manager.connect("customer_4", second, last_seq=1)
+        stale = FakeWebSocket()
+        fresh_worker = ConnectionManager(LoopbackBroker(), coalesce_window=0)
+        await fresh_worker.connect("customer_4", stale, last_seq=1)
+        await _settle()
+        await manager.stop()
+        await fresh_worker.stop()
+        return second, stale
+
+    second, stale = asyncio.run(scenario())
+    assert second.sent == [{"type": "resync_required", "last_seq": 5}]
+    assert stale.sent == [{"type": "resync_required", "last_seq": None}]
+
+
+def test_heartbeat_pings_live_sockets_and_reaps_idle_ones():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), coalesce_window=0, resume_grace=0, idle_timeout=30)
+        live, idle = FakeWebSocket(), StalledWebSocket()
+        await manager.connect("customer_6", live)
+        idle_connection = await manager.connect("customer_6", idle)
+        idle_connection.last_seen -= 60
+
+        manager.sweep()
+        await _settle()
+        await manager.stop()
+        return manager, live, idle
+
+    manager, live, idle = asyncio.run(scenario())
+    assert [m["type"] for m in live.sent] == ["ping"]
+    assert idle.close_code == 1001
+    assert [c.websocket for c in manager.active_connections["customer_6"]] == [live]
+
+
+def test_customer_socket_endpoint_tracks_client_frames(client):
+    manager = get_websocket_manager()
+    with client.websocket_connect("/api/v1/ws/customer/endpoint-user") as ws:
+        ws.send_text('{"type": "pong"}')
+        for _ in range(100):
+            if "customer_endpoint-user" in manager.active_connections:
+                break
+            time.sleep(0.01)
+        connections = manager.active_connections["customer_endpoint-user"]
+        assert len(connections) == 1
+        assert connections[0].last_seen > 0
+
+
+def test_broadcast_is_encoded_once_for_all_recipients():
+    async def scenario():
+        manager = ConnectionManager(LoopbackBroker(), coalesce_window=0)
+        phone, tablet = FakeWebSocket(), FakeWebSocket()
+        await manager.connect("customer_2", phone)
+        await manager.connect("customer_2", tablet)
+
+        await manager.broadcast_stamp_update("2", "program-1", 7)
+        await _settle()
+        await manager.stop()
+        return manager, phone, tablet
+
+    manager, phone, tablet = asyncio.run(scenario())
+    assert phone.frames[0] is tablet.frames[0]
+    assert phone.sent[0]["new_balance"] == 7
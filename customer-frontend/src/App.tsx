@@ -1,7 +1,8 @@
 import { BrowserRouter, useNavigate, useLocation } from 'react-router-dom';
 import { useOnline } from './hooks/useOnline';
 import { useAuth } from './contexts/AuthContext';
-import { useEffect, useRef } from 'react';
+import { useWebSocket } from './contexts/WebSocketContext';
+import { useCallback, useEffect, useRef } from 'react';
 import axios from 'axios';
 import AppRoutes from './app/routes';
 
@@ -10,53 +11,60 @@ function AppContent() {
   const { user } = useAuth();
   const navigate = useNavigate();
   const location = useLocation();
+  const { lastMessage } = useWebSocket();
+  // Last known status per redemption id, used to spot claimed -> redeemed
   const lastCheckedRef = useRef<Record<string, string>>({});
 
-  useEffect(() => {
-    if (!user) return;
-
-    const checkRedemptions = async () => {
-      try {
-        // Get all memberships
-        const membershipsResponse = await axios.get('/api/v1/customer/memberships');
-        const memberships = membershipsResponse.data;
-
-        // Check redemptions for each program
-        for (const membership of memberships) {
-          const programId = membership.program_id;
-          const response = await axios.get(`/api/v1/programs/${programId}/redemptions`);
-          const redemptions = response.data;
-
-          for (const redemption of redemptions) {
-            const key = `${programId}-${redemption.id}`;
-            const lastStatus = lastCheckedRef.current[key];
+  const pathnameRef = useRef(location.pathname);
+  pathnameRef.current = location.pathname;
 
-            // If this redemption was claimed and is now redeemed, redirect
-            if (lastStatus === 'claimed' && redemption.status === 'redeemed') {
-              // Only redirect if not already on dashboard
-              if (location.pathname !== '/dashboard') {
-                navigate('/dashboard');
-                return; // Stop checking after first redirect
-              }
-            }
+  const leaveForDashboard = useCallback(() => {
+    const pathname = pathnameRef.current;
+    // ProgramDetail runs its own celebration before navigating
+    if (pathname !== '/dashboard' && !pathname.startsWith('/program/')) {
+      navigate('/dashboard');
+    }
+  }, [navigate]);
 
-            // Update last known status
-            lastCheckedRef.current[key] = redemption.status;
-          }
+  const syncRedemptions = useCallback(async () => {
+    try {
+      // One batched request for every programme instead of one per membership
+      const response = await axios.get('/api/v1/customer/redemptions');
+      let redeemedSinceLastSync = false;
+      for (const redemption of response.data) {
+        if (lastCheckedRef.current[redemption.id] === 'claimed' && redemption.status === 'redeemed') {
+          redeemedSinceLastSync = true;
         }
-      } catch (error) {
-        console.error('Failed to check redemptions:', error);
+        lastCheckedRef.current[redemption.id] = redemption.status;
       }
-    };
+      if (redeemedSinceLastSync) leaveForDashboard();
+    } catch (error) {
+      console.error('Failed to check redemptions:', error);
+    }
+  }, [leaveForDashboard]);
 
-    // Initial check
-    checkRedemptions();
+  useEffect(() => {
+    if (!user) return;
+    syncRedemptions();
+  }, [user, syncRedemptions]);
+
+  // Status changes arrive over the customer WebSocket; no polling
+  useEffect(() => {
+    if (!user || !lastMessage) return;
 
-    // Poll every 3 seconds
-    const interval = setInterval(checkRedemptions, 3000);
+    if (lastMessage.type === 'resync_required') {
+      // Frames were lost while disconnected; diff against a fresh snapshot
+      syncRedemptions();
+      return;
+    }
+    if (lastMessage.type !== 'reward_status' || !lastMessage.reward_id) return;
 
-    return () => clearInterval(interval);
-  }, [user, navigate, location.pathname]);
+    const status = lastMessage.status === 'redeemable' ? 'claimed' : lastMessage.status;
+    lastCheckedRef.current[lastMessage.reward_id] = status;
+    if (status === 'redeemed') {
+      leaveForDashboard();
+    }
+  }, [user, lastMessage, syncRedemptions, leaveForDashboard]);
 
   return (
     <div className="min-h-screen bg-rudi-sand text-rudi-maroon font-body">
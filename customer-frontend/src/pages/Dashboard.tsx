@@ -226,6 +226,13 @@ const Dashboard = () => {
               : membership
           )
         );
+      } else if (lastMessage.type === 'resync_required') {
+        // Missed too many live updates while offline: reload balances
+        axios
+          .get<Membership[]>('/api/v1/customer/memberships')
+          .then((response) => setMemberships(response.data))
+          .catch((error) => console.error('Failed to resync memberships:', error));
+        fetchNotifications();
       } else if (lastMessage.type === 'notification') {
         // Refresh notifications
         fetchNotifications();
@@ -111,7 +111,6 @@ const ProgramDetail = () => {
   const prevBalanceRef = useRef<number>(
     initialMembership?.current_balance ?? 0
   );
-  const pollRef = useRef<ReturnType<typeof setInterval> | null>(null);
 
   const fetchRewardState = useCallback(async (enrollmentId: string) => {
     try {
@@ -151,7 +150,8 @@ const ProgramDetail = () => {
     if (!id) return;
     try {
       const response = await axios.get<RedemptionHistoryItem[]>(
-        `/api/v1/programs/${id}/redemptions`
+        '/api/v1/customer/redemptions',
+        { params: { program_id: id } }
       );
       setRedemptions(response.data);
       if (redeemCode) {
@@ -163,19 +163,11 @@ const ProgramDetail = () => {
             setShowConfetti(true);
             setRedeemCode(null);
             setTimeLeft(0);
-            if (pollRef.current) {
-              clearInterval(pollRef.current);
-              pollRef.current = null;
-            }
             await refreshMembership();
             setTimeout(() => navigate('/dashboard'), 800);
           } else if (current.status === 'expired') {
             setRedeemCode(null);
             setTimeLeft(0);
-            if (pollRef.current) {
-              clearInterval(pollRef.current);
-              pollRef.current = null;
-            }
           }
         }
       }
@@ -209,10 +201,6 @@ const ProgramDetail = () => {
         setRedeemCode(null);
         setTimeLeft(0);
         setRedeemQrCode('');
-        if (pollRef.current) {
-          clearInterval(pollRef.current);
-          pollRef.current = null;
-        }
         setTimeout(
           () =>
             navigate('/dashboard', {
@@ -230,6 +218,14 @@ const ProgramDetail = () => {
     void handleRewardStatus();
   }, [lastMessage, membershipProgramId, refreshMembership, fetchRedemptions, navigate]);
 
+  useEffect(() => {
+    if (!lastMessage || typeof lastMessage !== 'object') return;
+    if ((lastMessage as { type?: string }).type !== 'resync_required') return;
+    // Missed frames while offline: reload instead of waiting for the next update
+    void refreshMembership();
+    void fetchRedemptions();
+  }, [lastMessage, refreshMembership, fetchRedemptions]);
+
   useEffect(() => {
     if (!lastMessage || typeof lastMessage !== 'object') return;
     if ((lastMessage as { type?: string }).type !== 'membership_left') return;
@@ -280,10 +276,6 @@ const ProgramDetail = () => {
     if (!redeemCode) {
       setTimeLeft(0);
       setRedeemQrCode('');
-      if (pollRef.current) {
-        clearInterval(pollRef.current);
-        pollRef.current = null;
-      }
       return;
     }
 
@@ -305,18 +297,11 @@ const ProgramDetail = () => {
 
     updateTime();
     const countdown = setInterval(updateTime, 1000);
+    // Status changes arrive as reward_status frames; this only catches up once
     fetchRedemptions();
-    if (pollRef.current) {
-      clearInterval(pollRef.current);
-    }
-    pollRef.current = setInterval(fetchRedemptions, 4000);
 
     return () => {
       clearInterval(countdown);
-      if (pollRef.current) {
-        clearInterval(pollRef.current);
-        pollRef.current = null;
-      }
     };
   }, [redeemCode]);
 
@@ -40,6 +40,8 @@ export const WebSocketProvider: React.FC<WebSocketProviderProps> = ({ children }
   const wsRef = useRef<WebSocket | null>(null)
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null)
   const reconnectAttempts = useRef(0)
+  // Highest frame seq seen; sent on reconnect so the server replays only what we missed
+  const lastSeqRef = useRef<number | null>(null)
   const maxReconnectAttempts = 5
 
   const buildWebSocketUrl = (userId: string): string | null => {
@@ -53,7 +55,8 @@ export const WebSocketProvider: React.FC<WebSocketProviderProps> = ({ children }
     try {
       const url = new URL(base)
       const wsProtocol = url.protocol === 'https:' ? 'wss:' : 'ws:'
-      return `${wsProtocol}//${url.host}/api/v1/ws/merchant/${userId}`
+      const resume = lastSeqRef.current !== null ? `?last_seq=${lastSeqRef.current}` : ''
+      return `${wsProtocol}//${url.host}/api/v1/ws/merchant/${userId}${resume}`
     } catch {
       return null
     }
@@ -86,7 +89,18 @@ export const WebSocketProvider: React.FC<WebSocketProviderProps> = ({ children }
       wsRef.current.onmessage = (event) => {
         try {
           const message = JSON.parse(event.data)
+          if (message.type === 'ping') {
+            // Server heartbeat: answer so the socket is not reaped as idle
+            wsRef.current?.send(JSON.stringify({ type: 'pong' }))
+            return
+          }
           console.log('Merchant WebSocket message received:', message)
+          if (typeof message.seq === 'number') {
+            lastSeqRef.current = message.seq
+          } else if (message.type === 'resync_required') {
+            // Gap too large to replay: pages refetch, and the next frame restarts tracking
+            lastSeqRef.current = null
+          }
           setLastMessage(message)
 
           if (message.type === 'redeem_request') {
@@ -141,6 +155,7 @@ export const WebSocketProvider: React.FC<WebSocketProviderProps> = ({ children }
       wsRef.current.close(1000, 'Component unmounting')
       wsRef.current = null
     }
+    lastSeqRef.current = null
 
     setIsConnected(false)
   }
@@ -34,6 +34,9 @@ type CustomerRecord = {
   lifetime_total_revenue: number
   lifetime_rewards_redeemed: number
   lifetime_avg_basket_size: number
+  phone?: string | null
+  // Returned by /customers/search, which carries no stamp or visit stats
+  searchHit?: boolean
 }
 
 type RedemptionEvent = {
@@ -76,6 +79,8 @@ type CustomerInsights = {
 type CustomerDetail = CustomerRecord & {
   redemptionHistory: RedemptionEvent[]
   recentActivity: ActivityEvent[]
+  // Cursor for older ledger entries; null once the whole timeline is loaded
+  activityNextCursor?: string | null
   rewardSummary: RewardSummary
   insights: CustomerInsights
   lifetime_total_visits: number
@@ -84,18 +89,43 @@ type CustomerDetail = CustomerRecord & {
   lifetime_avg_basket_size: number
 }
 
+const toActivityEvent = (activity: any): ActivityEvent => ({
+  id: activity.id ?? crypto.randomUUID(),
+  programId: activity.program_id ?? activity.programId ?? crypto.randomUUID(),
+  programName: activity.program_name ?? activity.programName ?? null,
+  entryType: (activity.entry_type ?? activity.entryType ?? 'EARN').toString(),
+  change:
+    typeof activity.change === 'number'
+      ? activity.change
+      : typeof activity.amount === 'number'
+      ? activity.amount
+      : 0,
+  timestamp: activity.timestamp ?? activity.created_at ?? activity.createdAt ?? null,
+  notes: activity.notes ?? null,
+})
+
+// Wait for a pause in typing before asking the server to search
+const SEARCH_DEBOUNCE_MS = 250
+
 const Customers = () => {
   const [customers, setCustomers] = useState<CustomerRecord[]>([])
   const [query, setQuery] = useState('')
+  // Server-side matches for the current query; null falls back to filtering the loaded pages
+  const [searchHits, setSearchHits] = useState<CustomerRecord[] | null>(null)
   const [selectedCustomer, setSelectedCustomer] = useState<CustomerRecord | null>(null)
   const [confirmDelete, setConfirmDelete] = useState(false)
   const [toast, setToast] = useState<{ type: 'success' | 'info'; message: string } | null>(null)
   const [loading, setLoading] = useState(true)
+  // Keyset cursor for the next page of customers; null once everything is loaded
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [error, setError] = useState<string | null>(null)
   const [customerDetail, setCustomerDetail] = useState<CustomerDetail | null>(null)
   const [detailLoading, setDetailLoading] = useState(false)
+  const [loadingActivity, setLoadingActivity] = useState(false)
   const { lastMessage } = useWebSocket()
   const selectedCustomerIdRef = useRef<string | null>(null)
+  const searchRequestRef = useRef(0)
   const detailCacheRef = useRef<Record<string, CustomerDetail>>({})
 
   const apiBaseUrl =
@@ -192,6 +222,7 @@ const Customers = () => {
         lifetimeStamps,
         averageStampsPerProgram,
         avatar: resolveAvatarUrl(item.avatar),
+        phone: item.phone ?? null,
         lastVisit: formattedLastVisit,
         programs,
         lifetime_total_visits: Number(item.lifetime_total_visits ?? item.lifetimeTotalVisits ?? 0),
@@ -210,6 +241,7 @@ const Customers = () => {
       const response = await axios.get('/api/v1/merchants/customers')
       if (Array.isArray(response.data)) {
         setCustomers(transformCustomerPayload(response.data))
+        setNextCursor(response.headers['x-next-cursor'] ?? null)
       }
      } catch (error) {
        console.error('Failed to fetch customers', error)
@@ -220,10 +252,74 @@ const Customers = () => {
      }
   }
 
+  // Live updates re-read the first page and merge it into the loaded rows,
+  // so customers already paged in stay on screen
+  const refreshCustomers = async (): Promise<CustomerRecord[]> => {
+    if (!customers.length) {
+      await fetchCustomers()
+      return []
+    }
+    try {
+      const response = await axios.get('/api/v1/merchants/customers')
+      if (!Array.isArray(response.data)) return []
+      const fresh = transformCustomerPayload(response.data)
+      const freshIds = new Set(fresh.map((customer) => customer.id))
+      setCustomers((prev) => [...fresh, ...prev.filter((customer) => !freshIds.has(customer.id))])
+      return fresh
+    } catch (error) {
+      console.error('Failed to refresh customers', error)
+      return []
+    }
+  }
+
+  const loadMoreCustomers = async () => {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    try {
+      const response = await axios.get('/api/v1/merchants/customers', {
+        params: { cursor: nextCursor },
+      })
+      if (Array.isArray(response.data)) {
+        const page = transformCustomerPayload(response.data)
+        setCustomers((prev) => {
+          const known = new Set(prev.map((customer) => customer.id))
+          return [...prev, ...page.filter((customer) => !known.has(customer.id))]
+        })
+        setNextCursor(response.headers['x-next-cursor'] ?? null)
+      }
+    } catch (error) {
+      console.error('Failed to load more customers', error)
+      showToast('info', 'Could not load more customers right now.')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   useEffect(() => {
     fetchCustomers()
   }, [])
 
+  useEffect(() => {
+    const term = query.trim()
+    const requestId = ++searchRequestRef.current
+    setSearchHits(null)
+    if (!term) return
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get('/api/v1/merchants/customers/search', {
+          params: { q: term, limit: 50 },
+        })
+        if (requestId !== searchRequestRef.current || !Array.isArray(response.data)) return
+        setSearchHits(
+          transformCustomerPayload(response.data).map((hit) => ({ ...hit, searchHit: true }))
+        )
+      } catch (error) {
+        console.error('Customer search failed', error)
+      }
+    }, SEARCH_DEBOUNCE_MS)
+    return () => clearTimeout(timer)
+  }, [query])
+
   useEffect(() => {
     selectedCustomerIdRef.current = selectedCustomer?.id ?? null
   }, [selectedCustomer])
@@ -238,6 +334,20 @@ const Customers = () => {
 
   useEffect(() => {
     if (!lastMessage || typeof lastMessage !== 'object') return
+    if ((lastMessage as { type?: string }).type === 'resync_required') {
+      void refreshCustomers()
+      return
+    }
+    if ((lastMessage as { type?: string }).type === 'customer_stamp_batch') {
+      // Rush-hour batch: refresh once instead of replaying every update
+      const updates = (lastMessage as { updates?: Array<Record<string, any>> }).updates ?? []
+      void refreshCustomers()
+      const selectedId = selectedCustomerIdRef.current
+      if (selectedId && updates.some((update) => update.customer_id === selectedId)) {
+        void loadCustomerDetail(selectedId, true)
+      }
+      return
+    }
     if ((lastMessage as { type?: string }).type !== 'customer_stamp_update') return
     const { customer_id, program_id, new_balance, delta, timestamp, program_name, removed } = lastMessage as Record<string, any>
     if (!customer_id || !program_id) return
@@ -348,7 +458,7 @@ const Customers = () => {
     )
 
     if (!updatedCustomerFound) {
-      void fetchCustomers()
+      void refreshCustomers()
       return
     }
 
@@ -382,13 +492,18 @@ const Customers = () => {
   }, [lastMessage])
 
   const filteredCustomers = useMemo(() => {
+    if (searchHits) {
+      // Prefer the loaded row, which has the stats the search hit lacks
+      const loaded = new Map(customers.map((customer) => [customer.id, customer]))
+      return searchHits.map((hit) => loaded.get(hit.id) ?? hit)
+    }
     if (!query) return customers
     return customers.filter(
       (customer) =>
         customer.name.toLowerCase().includes(query.toLowerCase()) ||
         customer.email.toLowerCase().includes(query.toLowerCase())
     )
-  }, [customers, query])
+  }, [customers, query, searchHits])
 
   const detailSource = customerDetail ?? selectedCustomer
 
@@ -397,6 +512,30 @@ const Customers = () => {
     setTimeout(() => setToast(null), 2400)
   }
 
+  const loadOlderActivity = async () => {
+    const detail = customerDetail
+    if (!detail?.activityNextCursor) return
+    setLoadingActivity(true)
+    try {
+      const response = await axios.get(`/api/v1/merchants/customers/${detail.id}/ledger`, {
+        params: { cursor: detail.activityNextCursor },
+      })
+      const older: ActivityEvent[] = Array.isArray(response.data) ? response.data.map(toActivityEvent) : []
+      const updated: CustomerDetail = {
+        ...detail,
+        recentActivity: [...detail.recentActivity, ...older],
+        activityNextCursor: response.headers['x-next-cursor'] ?? null,
+      }
+      detailCacheRef.current[detail.id] = updated
+      setCustomerDetail((current) => (current?.id === detail.id ? updated : current))
+    } catch (error) {
+      console.error('Failed to load older activity', error)
+      showToast('info', 'Could not load older activity right now.')
+    } finally {
+      setLoadingActivity(false)
+    }
+  }
+
   const loadCustomerDetail = async (customerId: string, forceRefresh = false) => {
     if (!customerId) return
     if (!forceRefresh) {
@@ -439,20 +578,7 @@ const Customers = () => {
 
       const recentActivity: ActivityEvent[] = (
         payload.recent_activity ?? payload.recentActivity ?? []
-      ).map((activity: any) => ({
-        id: activity.id ?? crypto.randomUUID(),
-        programId: activity.program_id ?? activity.programId ?? crypto.randomUUID(),
-        programName: activity.program_name ?? activity.programName ?? null,
-        entryType: (activity.entry_type ?? activity.entryType ?? 'EARN').toString(),
-        change:
-          typeof activity.change === 'number'
-            ? activity.change
-            : typeof activity.amount === 'number'
-            ? activity.amount
-            : 0,
-        timestamp: activity.timestamp ?? activity.created_at ?? activity.createdAt ?? null,
-        notes: activity.notes ?? null,
-      }))
+      ).map(toActivityEvent)
 
       const rewardSummary: RewardSummary =
         payload.reward_summary ?? payload.rewardSummary ?? {
@@ -518,6 +644,7 @@ const Customers = () => {
         programs: programs.length ? programs : selectedCustomer?.programs ?? [],
         redemptionHistory,
         recentActivity,
+        activityNextCursor: payload.recent_activity_next_cursor ?? null,
         rewardSummary,
         insights,
         lifetime_total_visits: Number(payload.lifetime_total_visits ?? 0),
@@ -552,11 +679,13 @@ const Customers = () => {
   }
 
   const handleManualAction = async (action: 'add' | 'revoke') => {
-    if (!selectedCustomer || selectedCustomer.programs.length === 0) return
+    // A search hit only gets its programs once the detail has loaded
+    const programs = customerDetail?.programs ?? selectedCustomer?.programs ?? []
+    if (!selectedCustomer || programs.length === 0) return
 
     const currentCustomerId = selectedCustomer.id
 
-    const programId = selectedCustomer.programs[0].id
+    const programId = programs[0].id
     const url = `/api/v1/merchants/customers/${selectedCustomer.id}/${action === 'add' ? 'add-stamp' : 'revoke-stamp'}`
 
     const formData = new FormData()
@@ -566,75 +695,71 @@ const Customers = () => {
       await axios.post(url, formData)
       showToast('success', action === 'add' ? 'Stamp added - let the celebration begin!' : 'Stamp revoked - balance back in harmony.')
       // Refetch customers to update stamps
-      const response = await axios.get('/api/v1/merchants/customers')
-      if (Array.isArray(response.data)) {
-        const updatedCustomers = transformCustomerPayload(response.data)
-        setCustomers(updatedCustomers)
-        // Update selectedCustomer with new data
-        const updatedSelected = updatedCustomers.find(c => c.id === selectedCustomer.id)
-        setSelectedCustomer(updatedSelected || null)
-        if (updatedSelected) {
-          detailCacheRef.current[updatedSelected.id] = {
-            ...(detailCacheRef.current[updatedSelected.id] ?? updatedSelected),
-            id: updatedSelected.id,
-            name: updatedSelected.name,
-            email: updatedSelected.email,
-            avatar: updatedSelected.avatar,
-            programs: updatedSelected.programs,
-            totalStamps: updatedSelected.totalStamps,
-            lastVisit: updatedSelected.lastVisit,
-             lifetimeStamps: updatedSelected.lifetimeStamps ?? detailCacheRef.current[updatedSelected.id]?.lifetimeStamps ?? updatedSelected.totalStamps,
-             averageStampsPerProgram:
-               updatedSelected.averageStampsPerProgram ??
-               detailCacheRef.current[updatedSelected.id]?.averageStampsPerProgram ??
-               (updatedSelected.programs.length
-                 ? Number(
-                     (
-                       updatedSelected.programs.reduce(
-                         (sum, p) => sum + (p.progress ?? 0),
-                         0
-                       ) / updatedSelected.programs.length
-                     ).toFixed(2)
-                   )
-                 : 0),
-            redemptionHistory: detailCacheRef.current[updatedSelected.id]?.redemptionHistory ?? [],
-            recentActivity: detailCacheRef.current[updatedSelected.id]?.recentActivity ?? [],
-            rewardSummary: detailCacheRef.current[updatedSelected.id]?.rewardSummary ?? {
-              redeemed: 0,
-              redeemable: 0,
-              expired: 0,
-            },
-            insights: (() => {
-              const existing = detailCacheRef.current[updatedSelected.id]?.insights
-              if (existing) {
-                return existing
-              }
-              const programCount = updatedSelected.programs.length
-              const average =
-                programCount > 0
-                  ? Number(
-                      (
-                        updatedSelected.programs.reduce(
-                          (sum, p) => sum + (p.progress ?? 0),
-                          0
-                        ) / programCount
-                      ).toFixed(2)
-                    )
-                  : 0
-              return {
-                totalPrograms: programCount,
-                lifetimeVisits: 0,
-                visitsLast30Days: 0,
-                rewardsRedeemed: 0,
-                rewardsPending: 0,
-                rewardsExpired: 0,
-                averageStampsPerProgram: average,
-              }
-            })(),
-          }
+      const updatedCustomers = await refreshCustomers()
+      // Update selectedCustomer with new data; it may live on a later page
+      const updatedSelected = updatedCustomers.find(c => c.id === selectedCustomer.id)
+      if (updatedSelected) {
+        setSelectedCustomer(updatedSelected)
+        detailCacheRef.current[updatedSelected.id] = {
+          ...(detailCacheRef.current[updatedSelected.id] ?? updatedSelected),
+          id: updatedSelected.id,
+          name: updatedSelected.name,
+          email: updatedSelected.email,
+          avatar: updatedSelected.avatar,
+          programs: updatedSelected.programs,
+          totalStamps: updatedSelected.totalStamps,
+          lastVisit: updatedSelected.lastVisit,
+           lifetimeStamps: updatedSelected.lifetimeStamps ?? detailCacheRef.current[updatedSelected.id]?.lifetimeStamps ?? updatedSelected.totalStamps,
+           averageStampsPerProgram:
+             updatedSelected.averageStampsPerProgram ??
+             detailCacheRef.current[updatedSelected.id]?.averageStampsPerProgram ??
+             (updatedSelected.programs.length
+               ? Number(
+                   (
+                     updatedSelected.programs.reduce(
+                       (sum, p) => sum + (p.progress ?? 0),
+                       0
+                     ) / updatedSelected.programs.length
+                   ).toFixed(2)
+                 )
+               : 0),
+          redemptionHistory: detailCacheRef.current[updatedSelected.id]?.redemptionHistory ?? [],
+          recentActivity: detailCacheRef.current[updatedSelected.id]?.recentActivity ?? [],
+          rewardSummary: detailCacheRef.current[updatedSelected.id]?.rewardSummary ?? {
+            redeemed: 0,
+            redeemable: 0,
+            expired: 0,
+          },
+          insights: (() => {
+            const existing = detailCacheRef.current[updatedSelected.id]?.insights
+            if (existing) {
+              return existing
+            }
+            const programCount = updatedSelected.programs.length
+            const average =
+              programCount > 0
+                ? Number(
+                    (
+                      updatedSelected.programs.reduce(
+                        (sum, p) => sum + (p.progress ?? 0),
+                        0
+                      ) / programCount
+                    ).toFixed(2)
+                  )
+                : 0
+            return {
+              totalPrograms: programCount,
+              lifetimeVisits: 0,
+              visitsLast30Days: 0,
+              rewardsRedeemed: 0,
+              rewardsPending: 0,
+              rewardsExpired: 0,
+              averageStampsPerProgram: average,
+            }
+          })(),
         }
-        await loadCustomerDetail(currentCustomerId, true)
       }
+      await loadCustomerDetail(currentCustomerId, true)
     } catch (error) {
       showToast('info', 'Action failed - please try again.')
     }
@@ -670,7 +795,7 @@ const Customers = () => {
           <TextInput
             value={query}
             onChange={(event) => setQuery(event.target.value)}
-            placeholder="Search by name or email"
+            placeholder="Search by name, email or phone"
             style={{ width: 300 }}
           />
           <Button
@@ -714,26 +839,39 @@ const Customers = () => {
                 <p className="text-sm text-muted-foreground">{customer.email}</p>
               </div>
             </div>
-            <div className="hidden flex-col text-right text-sm text-muted-foreground sm:flex">
-              <span>
-                Current stamps:{' '}
-                <strong className="text-foreground">{customer.totalStamps}</strong>
-              </span>
-              <span>
-                Avg / program:{' '}
-                <strong className="text-foreground">
-                  {customer.averageStampsPerProgram.toFixed(2)}
-                </strong>
-              </span>
-              <span>Lifetime visits: {customer.lifetime_total_visits ?? 0}</span>
-              <span>Last visit: {customer.lastVisit ?? 'Never'}</span>
-            </div>
+            {customer.searchHit ? (
+              <div className="hidden flex-col text-right text-sm text-muted-foreground sm:flex">
+                {customer.phone && <span>{customer.phone}</span>}
+                <span>Open for stamps and visits</span>
+              </div>
+            ) : (
+              <div className="hidden flex-col text-right text-sm text-muted-foreground sm:flex">
+                <span>
+                  Current stamps:{' '}
+                  <strong className="text-foreground">{customer.totalStamps}</strong>
+                </span>
+                <span>
+                  Avg / program:{' '}
+                  <strong className="text-foreground">
+                    {customer.averageStampsPerProgram.toFixed(2)}
+                  </strong>
+                </span>
+                <span>Lifetime visits: {customer.lifetime_total_visits ?? 0}</span>
+                <span>Last visit: {customer.lastVisit ?? 'Never'}</span>
+              </div>
+            )}
             <Button variant="outline" color="blue" onClick={() => setSelectedCustomer(customer)}>
               View
             </Button>
           </div>
         ))}
 
+        {nextCursor && !searchHits && (
+          <Button variant="light" color="blue" onClick={loadMoreCustomers} loading={loadingMore}>
+            Load more customers
+          </Button>
+        )}
+
         {!filteredCustomers.length && (
           <div className="rounded-3xl bg-card p-10 text-center shadow-lg">
             <h3 className="font-heading text-lg text-foreground">No matches yet</h3>
@@ -965,6 +1103,11 @@ const Customers = () => {
                 No recent visits logged yet.
               </div>
             )}
+            {customerDetail?.activityNextCursor && (
+              <Button variant="subtle" size="xs" onClick={loadOlderActivity} loading={loadingActivity}>
+                Load older activity
+              </Button>
+            )}
           </div>
 
           <div className="text-xs text-muted-foreground text-center">
@@ -227,7 +227,13 @@ const Dashboard = () => {
 
   // Handle WebSocket messages for real-time activity updates
   useEffect(() => {
-    if (lastMessage && (lastMessage.type === 'customer_stamp_update' || lastMessage.type === 'reward_redeemed')) {
+    if (
+      lastMessage &&
+      (lastMessage.type === 'customer_stamp_update' ||
+        lastMessage.type === 'customer_stamp_batch' ||
+        lastMessage.type === 'resync_required' ||
+        lastMessage.type === 'reward_redeemed')
+    ) {
       // Refetch recent activity when stamp or reward updates occur
       const fetchActivity = async () => {
         try {
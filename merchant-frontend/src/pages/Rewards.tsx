@@ -26,8 +26,28 @@ const pillStyles: Record<RewardStatus, string> = {
   inactive: 'bg-rudi-teal/10 text-rudi-maroon/70',
 };
 
+type ListedStatus = 'redeemable' | 'redeemed' | 'expired';
+
+const statusFilters: ListedStatus[] = ['redeemable', 'redeemed', 'expired'];
+
+const toRewardRecord = (reward: Record<string, any>): RewardRecord => ({
+  id: String(reward.id ?? crypto.randomUUID()),
+  program: String(reward.program ?? 'Program name'),
+  customer: String(reward.customer ?? 'Guest'),
+  date: reward.created_at ?? reward.date ?? null,
+  status: (reward.status ?? 'claimed') as RewardStatus,
+  amount: reward.amount,
+  code: reward.code ? String(reward.code) : undefined,
+  expiresAt: reward.expires_at ? String(reward.expires_at) : undefined,
+});
+
 const Rewards = () => {
   const [rewards, setRewards] = useState<RewardRecord[]>([]);
+  const [statusFilter, setStatusFilter] = useState<ListedStatus | null>(null);
+  const [counts, setCounts] = useState<Record<ListedStatus, number> | null>(null);
+  // Keyset cursor for the next page of rewards; null once everything is loaded
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loadingCode, setLoadingCode] = useState<string | null>(null);
   const [scanning, setScanning] = useState(false);
   const [scanError, setScanError] = useState<string | null>(null);
@@ -39,24 +59,43 @@ const Rewards = () => {
 
   const fetchRewards = async () => {
     try {
-      const response = await axios.get('/api/v1/merchants/rewards');
+      const [response, countsResponse] = await Promise.all([
+        axios.get('/api/v1/merchants/rewards', {
+          params: statusFilter ? { status: statusFilter } : undefined,
+        }),
+        axios.get('/api/v1/merchants/rewards/counts'),
+      ]);
       if (Array.isArray(response.data)) {
-        setRewards(
-          response.data.map((reward: Record<string, unknown>) => ({
-            id: String(reward.id ?? crypto.randomUUID()),
-            program: String(reward.program ?? 'Program name'),
-            customer: String(reward.customer ?? 'Guest'),
-            date: reward.created_at ?? reward.date ?? null,
-            status: (reward.status ?? 'claimed') as RewardStatus,
-            amount: reward.amount,
-            code: reward.code ? String(reward.code) : undefined,
-            expiresAt: reward.expires_at ? String(reward.expires_at) : undefined,
-          }))
-        );
+        setRewards(response.data.map(toRewardRecord));
+        setNextCursor(response.headers['x-next-cursor'] ?? null);
       }
+      setCounts(countsResponse.data ?? null);
     } catch (error) {
       console.error('Failed to fetch rewards', error);
       setRewards([]);
+      setNextCursor(null);
+    }
+  };
+
+  const loadMoreRewards = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get('/api/v1/merchants/rewards', {
+        params: { cursor: nextCursor, ...(statusFilter ? { status: statusFilter } : {}) },
+      });
+      if (Array.isArray(response.data)) {
+        const page = response.data.map(toRewardRecord);
+        setRewards((prev) => {
+          const known = new Set(prev.map((reward) => reward.id));
+          return [...prev, ...page.filter((reward) => !known.has(reward.id))];
+        });
+        setNextCursor(response.headers['x-next-cursor'] ?? null);
+      }
+    } catch (error) {
+      console.error('Failed to load more rewards', error);
+    } finally {
+      setLoadingMore(false);
     }
   };
 
@@ -67,7 +106,7 @@ const Rewards = () => {
 
   useEffect(() => {
     fetchRewards();
-  }, []);
+  }, [statusFilter]);
 
   useEffect(() => {
     if (!lastMessage || typeof lastMessage !== 'object') return;
@@ -263,6 +302,25 @@ const Rewards = () => {
         </div>
       )}
 
+      <div className="flex flex-wrap justify-center gap-2">
+        <Button
+          className={`h-8 px-3 text-xs ${statusFilter === null ? 'btn-primary' : 'btn-secondary'}`}
+          onClick={() => setStatusFilter(null)}
+        >
+          All
+        </Button>
+        {statusFilters.map((status) => (
+          <Button
+            key={status}
+            className={`h-8 px-3 text-xs ${statusFilter === status ? 'btn-primary' : 'btn-secondary'}`}
+            onClick={() => setStatusFilter(status)}
+          >
+            {status.charAt(0).toUpperCase() + status.slice(1)}
+            {counts ? ` (${counts[status] ?? 0})` : ''}
+          </Button>
+        ))}
+      </div>
+
       {rewards.length === 0 ? (
         <div className="flex flex-col items-center gap-4 rounded-3xl bg-white p-10 text-center shadow-rudi-card">
           <div className="h-20 w-20 rounded-full bg-rudi-yellow/30" />
@@ -338,6 +396,13 @@ const Rewards = () => {
               </div>
             ))}
           </div>
+          {nextCursor && (
+            <div className="flex justify-center border-t border-rudi-teal/10 px-6 py-4">
+              <Button className="btn-secondary h-8 px-3 text-xs" onClick={loadMoreRewards} disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more rewards'}
+              </Button>
+            </div>
+          )}
         </div>
       )}
       <StaffRedeemModal